@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+""" Benchmarks for model parsing, table rendering and command latency
+
+Runs each benchmark against synthetic ME4084 sized (84 drive) and
+multi-enclosure sized (336 drive) arrays, served from memory by
+me4storage.testing.synthetic, and reports the time taken and the peak
+memory allocated. No array or network access is needed.
+
+    $ python benchmarks/run.py
+    $ python benchmarks/run.py --filter model --repeat 50
+
+Results can be saved, and later runs compared against them to detect
+regressions:
+
+    $ python benchmarks/run.py --save baseline.json
+    $ python benchmarks/run.py --compare baseline.json --threshold 1.25
+"""
+
+import argparse
+import contextlib
+import copy
+import io
+import json
+import statistics
+import sys
+import time
+import tracemalloc
+
+from me4storage.testing.synthetic import SyntheticArray
+from me4storage.models.disk import Disk
+from me4storage.models.disk_group import DiskGroup
+from me4storage.models.pool import Pool
+from me4storage.models.system import System
+from me4storage.common import tables
+import me4storage.commands.show
+import me4storage.commands.check
+
+# Array sizes to benchmark, as name -> number of 84-drive enclosures
+SIZES = {
+    'me4084': 1,
+    'me4084x4': 4,
+    }
+
+# Differences in time smaller than this are treated as noise when comparing
+# against saved results
+NOISE_MS = 0.1
+
+DISK_COLUMNS = ['location', 'serial_number', 'vendor', 'model', 'revision',
+                'size', 'status', 'health', 'architecture', 'ssd_life_left']
+
+class Benchmark:
+    ''' A single benchmark
+
+        Attributes:
+            name (string): Name of the benchmark
+            setup (callable): Called before each run, returning the
+                arguments to pass to 'func'. Not included in the timings.
+            func (callable): The code being measured
+    '''
+
+    def __init__(self, name, setup, func):
+        self.name = name
+        self.setup = setup
+        self.func = func
+
+    def run(self, repeat):
+        # Warm up any caches (eg: imports, regex compilation) first
+        self.func(*self.setup())
+
+        timings = []
+        for _ in range(repeat):
+            args = self.setup()
+            start = time.perf_counter()
+            self.func(*args)
+            timings.append(time.perf_counter() - start)
+
+        args = self.setup()
+        tracemalloc.start()
+        try:
+            self.func(*args)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'min_ms': min(timings) * 1000,
+            'median_ms': statistics.median(timings) * 1000,
+            'peak_kib': peak / 1024,
+            }
+
+def _construct(model, dicts):
+    return [model(_dict) for _dict in dicts]
+
+def _disk_rows(disks):
+    return [[getattr(disk, column) for column in DISK_COLUMNS] for disk in disks]
+
+def _run_quietly(command, session):
+    with contextlib.redirect_stdout(io.StringIO()):
+        command(argparse.Namespace(), session)
+
+def benchmarks(size, enclosures):
+    array = SyntheticArray(enclosures=enclosures)
+    responses = array.responses
+    disks = [Disk(_dict) for _dict in copy.deepcopy(responses['show/disks']['drives'])]
+    rows = _disk_rows(disks)
+
+    def dicts(endpoint, key):
+        # Models consume nested lists from the dicts they are built from,
+        # so each run needs its own copy
+        return lambda: (copy.deepcopy(responses[endpoint][key]),)
+
+    yield Benchmark(f'model:disk[{size}]', dicts('show/disks', 'drives'),
+                    lambda _dicts: _construct(Disk, _dicts))
+    yield Benchmark(f'model:disk-attrs[{size}]',
+                    lambda: (_construct(Disk, copy.deepcopy(responses['show/disks']['drives'])),),
+                    _disk_rows)
+    yield Benchmark(f'model:disk-group[{size}]', dicts('show/disk-groups', 'disk-groups'),
+                    lambda _dicts: _construct(DiskGroup, _dicts))
+    yield Benchmark(f'model:pool[{size}]', dicts('show/pools', 'pools'),
+                    lambda _dicts: _construct(Pool, _dicts))
+    yield Benchmark(f'model:system[{size}]', dicts('show/system', 'system'),
+                    lambda _dicts: _construct(System, _dicts))
+    yield Benchmark(f'tables:format_table[{size}]', lambda: ([DISK_COLUMNS], rows),
+                    lambda header, items: tables.format_table(header[0], items, style='bordered'))
+    yield Benchmark(f'command:show-disks[{size}]', lambda: (array.session(),),
+                    lambda session: _run_quietly(me4storage.commands.show.disks, session))
+    yield Benchmark(f'command:check-health[{size}]', lambda: (array.session(),),
+                    lambda session: _run_quietly(me4storage.commands.check.health_status, session))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Number of timed runs of each benchmark (default: %(default)s)')
+    parser.add_argument('--filter', default=None,
+                        help='Only run benchmarks whose name contains this string')
+    parser.add_argument('--save', default=None, metavar='FILE',
+                        help='Save results as JSON to FILE')
+    parser.add_argument('--compare', default=None, metavar='FILE',
+                        help='Compare results against those saved in FILE')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='Ratio of median time, or peak memory, to the '
+                             'saved results above which a benchmark is '
+                             'reported as a regression (default: %(default)s)')
+    args = parser.parse_args()
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+
+    results = {}
+    table_rows = []
+    regressions = []
+    for size, enclosures in SIZES.items():
+        for benchmark in benchmarks(size, enclosures):
+            if args.filter and args.filter not in benchmark.name:
+                continue
+            result = benchmark.run(args.repeat)
+            results[benchmark.name] = result
+
+            row = [benchmark.name,
+                   f"{result['min_ms']:.2f}",
+                   f"{result['median_ms']:.2f}",
+                   f"{result['peak_kib']:.0f}"]
+            previous = baseline.get(benchmark.name)
+            if previous is not None:
+                time_ratio = result['median_ms'] / previous['median_ms']
+                memory_ratio = result['peak_kib'] / max(previous['peak_kib'], 1)
+                row.append(f"{time_ratio:.2f}x / {memory_ratio:.2f}x")
+                slower = (time_ratio > args.threshold
+                          and result['median_ms'] - previous['median_ms'] > NOISE_MS)
+                if slower or memory_ratio > args.threshold:
+                    regressions.append(benchmark.name)
+            table_rows.append(row)
+
+    table_header = ['Benchmark', 'Min (ms)', 'Median (ms)', 'Peak (KiB)']
+    if baseline:
+        table_header.append('vs baseline (time / memory)')
+        table_rows = [row + [''] * (len(table_header) - len(row)) for row in table_rows]
+    tables.display_table(table_header, table_rows, style='bordered')
+
+    if args.save:
+        with open(args.save, 'w') as results_file:
+            json.dump(results, results_file, indent=2, sort_keys=True)
+
+    if regressions:
+        print(f"\nRegressions above {args.threshold}x: {', '.join(regressions)}", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
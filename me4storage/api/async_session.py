@@ -0,0 +1,290 @@
+import asyncio
+import logging
+import random
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+from me4storage.common.exceptions import ApiError, ApiStatusError
+from me4storage.api.session import BaseSession, is_read_only, _count_sessions, LOGOUT_TIMEOUT
+from me4storage.api.tracing import Tracer
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes which are retried, matching the retry strategy of Session
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+class AsyncSession(BaseSession):
+    ''' asyncio counterpart of me4storage.api.session.Session
+
+        Requests are made with aiohttp, so one process can talk to many
+        arrays from a single event loop without a thread per array. URL
+        encoding, response decoding, status checking and login are shared
+        with Session.
+
+        The session must be used as an asynchronous context manager, which
+        opens the connection pool and logs in, and on exit logs out, eg:
+
+            async with AsyncSession(host, 443, username, password, verify) as session:
+                systems = await async_show.system(session)
+
+        Attributes:
+            max_concurrency (int): Maximum number of requests in flight to
+                the array at once. The management controller handles few
+                requests concurrently, so keep this small.
+            token_cache (TokenCache): optional on-disk session token cache
+            cache (ResponseCache): optional cache of 'show/' responses
+            plan (Plan): if given, requests which would modify the array
+                are recorded rather than sent, see Session
+    '''
+
+    def __init__(self,
+                 host,
+                 port,
+                 username,
+                 password,
+                 verify,
+                 timeout = 120,
+                 retries = 5,
+                 max_concurrency = 4,
+                 token_cache = None,
+                 cache = None,
+                 tracer = None,
+                 plan = None,
+                 ):
+
+        if aiohttp is None:
+            raise ImportError("AsyncSession requires the 'aiohttp' package. "
+                              "Install it with: pip install me4storage[async]")
+
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.verify = verify
+        self.timeout = timeout
+        self.retries = retries
+        self.max_concurrency = max_concurrency
+        self.token_cache = token_cache
+        self.cache = cache
+        self.tracer = tracer if tracer is not None else Tracer()
+        self.plan = plan
+
+        self.session = None
+        self.session_token = None
+        self.headers = None
+        # Session token we logged in for, rather than took from the cache
+        self._owned_token = None
+        self._semaphore = None
+        self._login_lock = None
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        """ Open the connection pool and login to the API """
+
+        # Create asyncio primitives here rather than in __init__, so that
+        # they belong to the event loop the session is used from
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._login_lock = asyncio.Lock()
+
+        connector = aiohttp.TCPConnector(ssl=None if self.verify else False,
+                                         limit_per_host=self.max_concurrency)
+        self.session = aiohttp.ClientSession(connector=connector,
+                                             timeout=aiohttp.ClientTimeout(total=self.timeout))
+
+        if self.token_cache is not None:
+            self.session_token = self.token_cache.get(self.host, self.port, self.username)
+        if self.session_token is None:
+            await self._login()
+        self.headers = {
+                "datatype": "json",
+                "sessionKey": self.session_token,
+                }
+
+    async def close(self):
+        """ Logout of the API and close the connection pool
+
+        See Session.close
+        """
+
+        if self.session is None:
+            return
+
+        token = self._owned_token
+        self._owned_token = None
+        if token is not None:
+            if not self._kept_for_reuse(self.host, token):
+                await self._logout(token)
+            _count_sessions(-1)
+
+        await self.session.close()
+        self.session = None
+
+    async def _logout(self, token):
+
+        url = self._build_url('exit')
+        trace = self.tracer.start('GET', url, endpoint='exit')
+        try:
+            # A single attempt, see Session._logout
+            async with self.session.get(url,
+                                        headers={"datatype": "json", "sessionKey": token},
+                                        timeout=aiohttp.ClientTimeout(total=LOGOUT_TIMEOUT),
+                                        ) as response:
+                text = await response.text()
+                status = response.status
+            trace.response(status, text)
+            self._raise_for_status(status, url)
+            self._raise_status(self._decode_text(text))
+        except Exception as e:
+            logger.debug(f"Unable to logout of {self.host}: {type(e).__name__}: {e}")
+            return
+        logger.debug(f"Logged out of {self.host}")
+
+    async def _request(self, url, headers):
+        """ Issue a HTTP GET, retrying connection errors and the same HTTP
+        status codes as Session, with exponential backoff.
+
+        Returns:
+            tuple of (status code, response text)
+        """
+
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    async with self.session.get(url, headers=headers) as response:
+                        text = await response.text()
+                        status = response.status
+                if status not in RETRY_STATUS_CODES or attempt >= self.retries:
+                    return status, text
+                logger.debug(f"HTTP {status} from {self.host}, retrying")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.retries:
+                    raise
+                logger.debug(f"Request to {self.host} failed: {e}, retrying")
+
+            attempt += 1
+            await asyncio.sleep((2 ** (attempt - 1)) * (0.5 + random.random()))
+
+    @staticmethod
+    def _raise_for_status(status, url):
+        if status >= 400:
+            raise ApiError(f"HTTP {status} error for url: {url}")
+
+    async def _login(self):
+        """ Login to the API and store the session token
+
+        See Session._login
+        """
+
+        url = self._build_url(self._login_endpoint())
+        trace = self.tracer.start('GET', url, sensitive=True)
+        status, text = await self._request(url, {"datatype": "json"})
+        trace.response(status, size=len(text))
+        self._raise_for_status(status, url)
+
+        response_body = self._decode_text(text)
+        self.session_token = self._token_from_login(response_body, text)
+        self._owned_token = self.session_token
+        _count_sessions(1)
+
+        if self.token_cache is not None:
+            self.token_cache.set(self.host, self.port, self.username, self.session_token)
+
+    async def _relogin(self, rejected_token):
+        async with self._login_lock:
+            if self.session_token != rejected_token:
+                return
+            logger.debug("Session token rejected by controller, logging in again")
+            if rejected_token == self._owned_token:
+                # The controller has already ended the session
+                self._owned_token = None
+                _count_sessions(-1)
+            if self.token_cache is not None:
+                self.token_cache.invalidate(self.host, self.port, self.username)
+            await self._login()
+            self.headers = dict(self.headers, sessionKey=self.session_token)
+
+    async def _get(self, url, relogin=True):
+
+        session_token = self.session_token
+        trace = self.tracer.start('GET', url)
+        status, text = await self._request(url, self.headers)
+        trace.response(status, text)
+        if relogin and self._is_session_error(status):
+            await self._relogin(session_token)
+            return await self._get(url, relogin=False)
+
+        self._raise_for_status(status, url)
+
+        response_body = self._decode_text(text)
+        trace.body(response_body)
+
+        try:
+            self._raise_status(response_body)
+        except ApiStatusError as e:
+            if relogin and self._is_session_error(status, e):
+                await self._relogin(session_token)
+                return await self._get(url, relogin=False)
+            raise
+
+        return response_body
+
+    async def get_object(self, endpoint, params={}):
+        """ Get a single object from API
+
+        See Session.get_object
+        """
+
+        url = self._build_url(endpoint, params)
+
+        if self.plan is not None and not is_read_only(endpoint):
+            self.plan.record('GET', url)
+            return self.plan.response(endpoint)
+
+        cacheable = self.cache is not None and endpoint.startswith('show/')
+        if cacheable:
+            data = self.cache.get(url)
+            if data is not None:
+                return data
+
+        data = await self._get(url)
+        if isinstance(data, list):
+            raise RuntimeError(f'Bad object URL \'{url}\': expected an object, '
+                               f'got a collection of objects')
+
+        if cacheable:
+            self.cache.set(endpoint, url, data)
+        elif self.cache is not None and not is_read_only(endpoint):
+            self.cache.clear()
+        return data
+
+    async def put(self, endpoint, data={}):
+        """ Modify API
+
+        See Session.put
+        """
+
+        url = self._build_url(endpoint, data)
+
+        if self.plan is not None:
+            self.plan.record('GET', url)
+            return self.plan.response(endpoint)
+
+        data = await self._get(url)
+
+        if self.cache is not None:
+            self.cache.clear()
+
+        if isinstance(data, list):
+            raise RuntimeError(f'Bad object URL \'{url}\': expected an object, '
+                               f'got a collection of objects')
+        return data
@@ -0,0 +1,95 @@
+""" asyncio variants of the functions in me4storage.api.show
+
+Each function here takes an AsyncSession in place of a Session, and is
+otherwise called exactly as its counterpart in me4storage.api.show, eg:
+
+    systems = await async_show.system(session)
+    disks = await async_show.disks(session, detail=True)
+
+Many arrays can be polled concurrently from a single event loop, with the
+number of requests in flight to each array bounded by its AsyncSession:
+
+    async def poll(host):
+        async with AsyncSession(host, 443, username, password, False) as session:
+            return await async_show.disks(session)
+
+    loop = asyncio.get_event_loop()
+    results = loop.run_until_complete(
+        asyncio.gather(*[poll(host) for host in hosts], return_exceptions=True))
+"""
+
+import logging
+import functools
+
+from me4storage.api import show
+
+logger = logging.getLogger(__name__)
+
+class _Request(Exception):
+    """ Raised by _RequestRecorder to carry the request made by a show function """
+
+    def __init__(self, endpoint, params):
+        super().__init__(endpoint)
+        self.endpoint = endpoint
+        self.params = params
+
+class _RequestRecorder:
+    """ Stand-in session which captures the request a show function makes """
+
+    def get_object(self, endpoint, params={}):
+        raise _Request(endpoint, dict(params))
+
+class _ResponseReplay:
+    """ Stand-in session which returns an already fetched response """
+
+    def __init__(self, response_body):
+        self.response_body = response_body
+
+    def get_object(self, endpoint, params={}):
+        return self.response_body
+
+def _async_variant(func):
+    """ Build an async variant of a function from me4storage.api.show
+
+    The show functions build the request parameters, make a single
+    get_object call, and construct models from the response. Rather than
+    duplicate each of them, we run the function once against a recorder to
+    learn the request it makes, await that request on the AsyncSession, and
+    then run the function again against the response to build the models.
+    """
+
+    @functools.wraps(func)
+    async def wrapper(session, *args, **kwargs):
+        try:
+            func(_RequestRecorder(), *args, **kwargs)
+        except _Request as request:
+            response_body = await session.get_object(request.endpoint, request.params)
+        else:
+            raise RuntimeError(f"{func.__name__} made no API request")
+        return func(_ResponseReplay(response_body), *args, **kwargs)
+
+    return wrapper
+
+users = _async_variant(show.users)
+system = _async_variant(show.system)
+license = _async_variant(show.license)
+service_tag_info = _async_variant(show.service_tag_info)
+ntp_status = _async_variant(show.ntp_status)
+dns = _async_variant(show.dns)
+dns_management_hostname = _async_variant(show.dns_management_hostname)
+network_parameters = _async_variant(show.network_parameters)
+email_parameters = _async_variant(show.email_parameters)
+pools = _async_variant(show.pools)
+disk_groups = _async_variant(show.disk_groups)
+volumes = _async_variant(show.volumes)
+disks = _async_variant(show.disks)
+initiators = _async_variant(show.initiators)
+host_groups = _async_variant(show.host_groups)
+mappings = _async_variant(show.mappings)
+volume_mappings = _async_variant(show.volume_mappings)
+host_group_mappings = _async_variant(show.host_group_mappings)
+svc_tag = _async_variant(show.svc_tag)
+unwritable_cache = _async_variant(show.unwritable_cache)
+versions = _async_variant(show.versions)
+certificate = _async_variant(show.certificate)
+advanced_settings = _async_variant(show.advanced_settings)
@@ -0,0 +1,93 @@
+import logging
+import copy
+import time
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Time-to-live, in seconds, of cached responses for each endpoint. Objects
+# which rarely or never change during the lifetime of a command are cached
+# for longer than those which reflect the changing state of the array
+DEFAULT_TTLS = {
+    'show/system': 60,
+    'show/service-tag-info': 3600,
+    'show/license': 3600,
+    'show/versions': 300,
+    'show/certificate': 300,
+    'show/users': 300,
+    'show/network-parameters': 300,
+    'show/dns-parameters': 300,
+    'show/dns-management-hostname': 300,
+    'show/ntp-status': 60,
+    'show/email-parameters': 300,
+    'show/advanced-settings': 300,
+    'show/disks': 30,
+    'show/disk-groups': 30,
+    'show/pools': 30,
+    'show/volumes': 30,
+    'show/unwritable-cache': 10,
+    }
+DEFAULT_TTL = 30
+
+class ResponseCache:
+    ''' Cache of decoded API responses, keyed by request URL
+
+        The ME4 management controller is slow to answer requests, and many
+        commands fetch the same objects several times (eg: show/system at
+        the start of almost every command). This caches the decoded
+        responses of read-only requests for a per-endpoint time-to-live.
+
+        The Session clears the cache whenever a request that modifies the
+        array succeeds, so stale objects are never returned after a change
+        made through the same Session.
+
+        Attributes:
+            ttls (dict): Mapping of endpoint (eg: 'show/disks') to the
+                number of seconds responses are cached for. A TTL of 0
+                disables caching for that endpoint.
+            default_ttl (int): TTL for endpoints not listed in 'ttls'
+    '''
+
+    def __init__(self, ttls=None, default_ttl=DEFAULT_TTL):
+        self.ttls = dict(DEFAULT_TTLS)
+        if ttls is not None:
+            self.ttls.update(ttls)
+        self.default_ttl = default_ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def ttl(self, endpoint):
+        return self.ttls.get(endpoint, self.default_ttl)
+
+    def get(self, url):
+        """ Return a copy of the cached response for url, or None """
+
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            expires, response_body = entry
+            if expires <= time.monotonic():
+                del self._entries[url]
+                return None
+
+        logger.debug(f"Cache hit: {url}")
+        # Models consume the dictionaries they are built from, so always
+        # hand out a copy of the cached response
+        return copy.deepcopy(response_body)
+
+    def set(self, endpoint, url, response_body):
+        """ Cache a copy of response_body for url """
+
+        ttl = self.ttl(endpoint)
+        if ttl <= 0:
+            return
+        entry = (time.monotonic() + ttl, copy.deepcopy(response_body))
+        with self._lock:
+            self._entries[url] = entry
+
+    def clear(self):
+        with self._lock:
+            if self._entries:
+                logger.debug("Clearing response cache")
+            self._entries.clear()
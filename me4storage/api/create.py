@@ -7,6 +7,10 @@ from me4storage.common.exceptions import ApiError
 
 logger = logging.getLogger(__name__)
 
+# Upper limit on the number of volumes mapped by a single 'map/volume'
+# request, to keep the request URL to a reasonable length
+MAX_VOLUMES_PER_MAPPING = 32
+
 def linear_disk_group(session,
            name,
            disks,
@@ -132,6 +136,34 @@ def mapping(session,
     response = session.put('map/volume',data)
     return response
 
+def mapping_batches(assignments, max_volumes=MAX_VOLUMES_PER_MAPPING):
+    """ Group volume to LUN assignments into as few mappings as possible
+
+    When given several volumes, 'map/volume' assigns the given LUN to the
+    first volume and increments it for each following volume, so a run of
+    volumes with consecutive LUNs can be mapped in a single request.
+
+    Args:
+        assignments (list): (volume name, LUN) tuples
+        max_volumes (int): maximum number of volumes in each batch
+
+    Returns:
+        list of (list of volume names, first LUN) tuples, one per request
+    """
+
+    batches = []
+    previous_lun = None
+    for volume, lun in sorted(assignments, key=lambda assignment: int(assignment[1])):
+        lun = int(lun)
+        if (batches
+                and lun == previous_lun + 1
+                and len(batches[-1][0]) < max_volumes):
+            batches[-1][0].append(volume)
+        else:
+            batches.append(([volume], lun))
+        previous_lun = lun
+    return batches
+
 def user(session,
          name,
          password,
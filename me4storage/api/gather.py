@@ -0,0 +1,69 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Upper limit on the number of requests in flight against a single array.
+# This should not exceed the connection pool size of the session's
+# transport adapter (10 by default), otherwise connections are discarded
+# rather than reused
+MAX_WORKERS = 8
+
+# Functions capturing state of the calling thread which the calls need,
+# see register_context()
+_context_captures = []
+
+def register_context(capture):
+    """ Carry state of the calling thread over to the threads calls run in
+
+    capture is called in the thread calling gather(), and returns a
+    function which gather() calls in each worker thread before running a
+    call there, to restore the state. eg: me4storage.fleet uses this so
+    that output and log messages are attributed to the right array.
+    """
+
+    _context_captures.append(capture)
+
+def gather(session, *calls, max_workers=MAX_WORKERS):
+    """ Issue independent API calls concurrently and return their results
+
+    The ME4 management controller can take seconds to answer each request,
+    so commands which need several independent objects (eg: system, network
+    and DNS parameters) spend most of their time waiting on the network.
+    This runs each call in a thread pool, sharing the session's connection
+    pool, so that the total time is roughly that of the slowest call.
+
+    Each call is a callable taking the session as its only argument,
+    typically one of the functions in me4storage.api.show. Use
+    functools.partial to provide any additional arguments, eg:
+
+        systems, disks = gather(session,
+                                show.system,
+                                partial(show.disks, detail=True))
+
+    Args:
+        session (Session): session to issue the calls with
+        calls: callables to run, each called as call(session)
+        max_workers (int): maximum number of calls to run concurrently
+
+    Returns:
+        list of the results of each call, in the order the calls were given.
+        If any call raised an exception, the first such exception (in order
+        of the calls given) is re-raised once all calls have finished.
+    """
+
+    if len(calls) <= 1:
+        return [call(session) for call in calls]
+
+    restores = [capture() for capture in _context_captures]
+
+    def run(call):
+        for restore in restores:
+            restore()
+        return call(session)
+
+    workers = max(1, min(len(calls), max_workers))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run, call) for call in calls]
+
+    return [future.result() for future in futures]
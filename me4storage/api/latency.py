@@ -0,0 +1,138 @@
+import logging
+import os
+import json
+import math
+import tempfile
+import threading
+
+from me4storage.api.token_cache import default_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Number of recent response times kept per endpoint
+MAX_SAMPLES = 200
+
+# Number of response times needed before an endpoint's percentiles are used
+MIN_SAMPLES = 20
+
+# Request timeouts are this multiple of an endpoint's p99 response time,
+# within the bounds below (seconds)
+TIMEOUT_FACTOR = 3
+MIN_TIMEOUT = 10
+MAX_TIMEOUT = 600
+
+# Serialises saves by threads of this process. Concurrent processes may
+# lose each other's samples, which only costs a little history
+_save_lock = threading.Lock()
+
+def percentile(samples, q):
+    """ q-th percentile (0-100) of samples, by the nearest-rank method """
+
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+class LatencyStore:
+    ''' Response times of each API endpoint, kept across invocations
+
+        Endpoints differ greatly in how long the management controller
+        takes to answer them: show/system is quick, while show/disks and
+        show/pools on large arrays are slow. Rather than one fixed timeout
+        for every request, the Session records how long each endpoint
+        takes, and derives its timeout from the endpoint's p99 response
+        time, see timeout(). The p95 response time decides when to send a
+        hedged request to the partner controller, see Session.
+
+        Response times are kept for each controller separately, so that
+        arrays of different sizes sharing the file (eg: in fleet mode) each
+        have their own.
+
+        Response times are saved to a JSON file in the me4cli cache
+        directory, merged with any saved by other invocations since.
+
+        Attributes:
+            path (string): file response times are saved to
+            max_samples (int): number of recent response times kept per
+                endpoint
+    '''
+
+    def __init__(self, path=None, max_samples=MAX_SAMPLES):
+        if path is None:
+            path = os.path.join(default_cache_dir(), 'latency.json')
+        self.path = path
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._new = {}
+        self._samples = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as latency_file:
+                samples = json.load(latency_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.debug(f"Unable to read latency file {self.path}: {e}")
+            return {}
+        return {key: [float(sample) for sample in values][-self.max_samples:]
+                for key, values in samples.items() if isinstance(values, list)}
+
+    @staticmethod
+    def _key(host, endpoint):
+        return f'{host} {endpoint}'
+
+    def record(self, host, endpoint, seconds):
+        """ Record the response time of a request to endpoint of host """
+
+        key = self._key(host, endpoint)
+        with self._lock:
+            for samples in (self._samples, self._new):
+                values = samples.setdefault(key, [])
+                values.append(round(seconds, 4))
+                del values[:-self.max_samples]
+
+    def percentile(self, host, endpoint, q):
+        """ q-th percentile response time of endpoint of host, or None if
+        too few response times have been recorded """
+
+        with self._lock:
+            samples = list(self._samples.get(self._key(host, endpoint), []))
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return percentile(samples, q)
+
+    def timeout(self, host, endpoint, default):
+        """ Request timeout for endpoint of host, based on its p99 response
+        time, or default if it has too few recorded response times """
+
+        p99 = self.percentile(host, endpoint, 99)
+        if p99 is None:
+            return default
+        return min(max(p99 * TIMEOUT_FACTOR, MIN_TIMEOUT), MAX_TIMEOUT)
+
+    def save(self):
+        """ Save the response times recorded by this invocation, merged
+        with those saved by others since we loaded the file """
+
+        with self._lock:
+            new, self._new = self._new, {}
+        if not new:
+            return
+
+        with _save_lock:
+            samples = self._load()
+            for key, values in new.items():
+                samples[key] = (samples.get(key, []) + values)[-self.max_samples:]
+
+            directory = os.path.dirname(self.path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as latency_file:
+                    json.dump(samples, latency_file)
+                os.replace(tmp_path, self.path)
+            except Exception:
+                os.unlink(tmp_path)
+                raise
@@ -0,0 +1,68 @@
+import logging
+import threading
+
+from me4storage.api.tracing import redact_url
+import me4storage.common.tables as tables
+
+logger = logging.getLogger(__name__)
+
+class Plan:
+    ''' Record of the changes a command would make, without making them
+
+        When a Session is given a Plan, read-only requests ('show/',
+        'check/') are sent to the array as normal, so commands see the
+        real state of the array. Every other request is recorded here
+        instead, and answered with a synthetic success status. Commands
+        record any other side effects (eg: SFTP uploads, emails, waits)
+        with record().
+
+        Reads return the current state of the array, so steps which depend
+        on an earlier planned change (eg: creating volumes on disk groups
+        which the plan would create) may be missing from the plan.
+
+        Attributes:
+            steps (list): (method, target, detail) tuples, in the order
+                they would have been made
+    '''
+
+    def __init__(self):
+        self.steps = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.steps)
+
+    def record(self, method, target, detail=''):
+        """ Record a step, eg: record('SFTP PUT', 'sftp://host:1022/flash', 'firmware.bin') """
+
+        with self._lock:
+            self.steps.append((method, redact_url(target), detail))
+        logger.debug(f"Planned: {method} {redact_url(target)} {detail}".rstrip())
+
+    @staticmethod
+    def response(endpoint):
+        """ Synthetic successful response body for a planned request """
+
+        return {'status': [{
+            'object-name': 'status',
+            'meta': '/meta/status',
+            'response-type': 'Success',
+            'response-type-numeric': 0,
+            'response': f"Planned: {endpoint}",
+            'return-code': 0,
+            'component-id': '',
+            'time-stamp': '',
+            'time-stamp-numeric': 0,
+            }]}
+
+    def display(self):
+        """ Print the plan as a table """
+
+        if not self.steps:
+            print("Plan: no changes would be made")
+            return
+        table_header = ['#', 'Method', 'Target', 'Detail']
+        table_rows = [[index + 1, method, target, detail]
+                      for index, (method, target, detail) in enumerate(self.steps)]
+        print(f"Plan: {len(self.steps)} step(s) would be made")
+        tables.display_table(table_header, table_rows, style='bordered')
@@ -0,0 +1,226 @@
+import logging
+import random
+import time
+
+import requests
+
+from me4storage.common.exceptions import ApiError, ApiStatusError, LoginError
+from me4storage.api import show, check
+
+logger = logging.getLogger(__name__)
+
+# Seconds to wait for the management controllers before giving up
+DEFAULT_DEADLINE = 900
+
+# Seconds to wait for a controller firmware update before giving up. The
+# update itself is documented as taking 10-20 minutes
+FIRMWARE_DEADLINE = 3600
+
+# Seconds before the first poll, giving the controllers time to begin
+# restarting, so that we don't find them still up from before the restart
+DEFAULT_SETTLE = 15
+
+# Bounds of the exponential backoff between polls, in seconds
+MIN_INTERVAL = 2
+MAX_INTERVAL = 30
+
+# Timeout of each poll, in seconds. Kept short, as a controller which is
+# restarting either refuses the connection or never answers
+POLL_TIMEOUT = 10
+
+# Errors seen while a management controller is restarting
+UNAVAILABLE_ERRORS = (requests.exceptions.RequestException, LoginError,
+                      ApiError, ApiStatusError, ValueError)
+
+def poll(check_ready, description, deadline=DEFAULT_DEADLINE, settle=DEFAULT_SETTLE,
+         min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+    """ Call check_ready() until it reports success, or the deadline passes
+
+    The interval between calls doubles from min_interval up to
+    max_interval, with random jitter so that many arrays polled together
+    are not polled in lock step.
+
+    Args:
+        check_ready (callable): called with no arguments, returning a
+            tuple (result, reason). A result other than None ends the
+            wait, otherwise reason describes what we are waiting for.
+        description (string): what we are waiting for, for log messages
+        deadline (int): seconds to wait before giving up
+        settle (int): seconds to wait before the first call
+
+    Returns:
+        the result returned by check_ready()
+
+    Raises:
+        ApiError: if check_ready() does not succeed within the deadline
+    """
+
+    start = time.monotonic()
+    expires = start + deadline
+    interval = min_interval
+    time.sleep(min(settle, deadline))
+
+    attempt = 0
+    while True:
+        attempt += 1
+        result, reason = check_ready()
+        elapsed = time.monotonic() - start
+        if result is not None:
+            logger.info(f"{description}: done after {elapsed:.0f}s")
+            return result
+
+        remaining = expires - time.monotonic()
+        if remaining <= 0:
+            raise ApiError(f"{description}: not done after {deadline}s "
+                           f"({attempt} attempts). Last status: {reason}")
+
+        delay = min(remaining, random.uniform(interval / 2, interval))
+        logger.info(f"{description}: {reason} ({elapsed:.0f}s elapsed). "
+                    f"Retrying in {delay:.0f}s...")
+        time.sleep(delay)
+        interval = min(max_interval, interval * 2)
+
+def _probe_session(session):
+    """ Login with a session making a single attempt per request, as the
+    backoff between polls is ours """
+
+    return session.clone(retries=0, timeout=POLL_TIMEOUT)
+
+def wait_for_ready(session, deadline=DEFAULT_DEADLINE, **kwargs):
+    """ Wait for the management controllers of an array to be ready
+
+    After a management controller restart (eg: following a certificate or
+    firmware update) the API is unavailable for an indeterminate time.
+    Rather than sleeping for a fixed worst case, poll the array until we
+    can login and 'show/system' reports the other management controller
+    as Operational.
+
+    When the session is planning, the wait is recorded in the plan instead,
+    and the session given is left open.
+
+    Args:
+        session (Session): session with the array. Its session key is not
+            expected to survive the restart.
+        deadline (int): seconds to wait before giving up
+        kwargs: passed on to poll()
+
+    Returns:
+        a new Session, logged in to the restarted controller, with the
+        same parameters as the one given. The session given is closed.
+
+    Raises:
+        ApiError: if the array is not ready within the deadline
+    """
+
+    if session.plan is not None:
+        session.plan.record('WAIT', f"<= {deadline}s", "until management controllers are ready")
+        # Callers close the session returned, and the planning session
+        # given must carry on
+        return session.clone()
+
+    def check_ready():
+        probe = None
+        try:
+            probe = _probe_session(session)
+            system = next(iter(show.system(probe)), None)
+        except UNAVAILABLE_ERRORS as e:
+            if probe is not None:
+                probe.close(logout=False)
+            return None, f"{type(e).__name__}: {e}"
+        if system is None or system.other_mc_status != 'Operational':
+            probe.close()
+            if system is None:
+                return None, "no system in response"
+            return None, f"other MC status: {system.other_mc_status}"
+        return probe, 'ready'
+
+    probe = poll(check_ready, f"Waiting for management controllers on {session.host}",
+                 deadline=deadline, **kwargs)
+    probe.close()
+    # The session given is no longer valid, as the restart ended it
+    session.close()
+    # Hand back a session with the original retry and timeout settings
+    return session.clone()
+
+def wait_for_firmware(session, bundle_version, deadline=FIRMWARE_DEADLINE, **kwargs):
+    """ Wait for a controller firmware update to complete
+
+    Polls 'show/versions' and 'check/firmware-upgrade-health' until the
+    bundle version of every controller is bundle_version, logging each
+    controller's version as it changes, and when the management controller
+    stops answering while it restarts.
+
+    When the session is planning, the wait is recorded in the plan instead,
+    and the session given is left open.
+
+    Args:
+        session (Session): session with the array
+        bundle_version (string): bundle version being installed,
+            eg: 'GT280R010-01'
+        deadline (int): seconds to wait before giving up
+        kwargs: passed on to poll()
+
+    Returns:
+        a new Session, logged in to the updated controller. The session
+        given is closed.
+
+    Raises:
+        ApiError: if the update is not complete within the deadline
+    """
+
+    if session.plan is not None:
+        session.plan.record('WAIT', f"<= {deadline}s",
+                            f"until controllers report bundle {bundle_version}")
+        return session.clone()
+
+    # State carried between polls
+    state = {'probe': None, 'versions': {}, 'health': None, 'unavailable': False}
+
+    def check_ready():
+        try:
+            if state['probe'] is None:
+                state['probe'] = _probe_session(session)
+            versions = show.versions(state['probe'])
+            readiness = next(iter(check.firmware_upgrade_health(state['probe'])), None)
+        except UNAVAILABLE_ERRORS as e:
+            # Login again once the controller is back, as restarts end
+            # every session
+            if state['probe'] is not None:
+                state['probe'].close(logout=False)
+            state['probe'] = None
+            if not state['unavailable']:
+                logger.info(f"Management controller on {session.host} is not "
+                            f"answering, presumably restarting ({type(e).__name__})")
+                state['unavailable'] = True
+            return None, "management controller restarting"
+
+        if state['unavailable']:
+            logger.info(f"Management controller on {session.host} is answering again")
+            state['unavailable'] = False
+
+        current = {}
+        for version in versions:
+            # eg: 'controller-a-versions' -> 'A'
+            controller = version.object_name.split('-')[1].upper()
+            current[controller] = version.bundle_version
+            previous = state['versions'].get(controller)
+            if previous != version.bundle_version:
+                progress = 'updated' if version.bundle_version == bundle_version else 'updating'
+                logger.info(f"Controller {controller}: bundle {version.bundle_version} ({progress})")
+        state['versions'] = current
+
+        if readiness is not None and readiness.overall_health != state['health']:
+            logger.info(f"Firmware upgrade health: {readiness.overall_health}")
+            state['health'] = readiness.overall_health
+
+        pending = [controller for controller, version in sorted(current.items())
+                   if version != bundle_version]
+        if not current or pending:
+            return None, f"waiting for controller(s) {', '.join(pending) or 'A, B'}"
+        return state['probe'], 'updated'
+
+    probe = poll(check_ready, f"Waiting for firmware {bundle_version} on {session.host}",
+                 deadline=deadline, **kwargs)
+    probe.close()
+    session.close()
+    return session.clone()
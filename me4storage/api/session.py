@@ -1,117 +1,115 @@
 import logging
 import requests
-import distutils
 import hashlib
 import urllib
 import json
+import queue
+import re
+import threading
+import time
 
-from pprint import pformat
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 
 from me4storage.common.exceptions import LoginError, ApiStatusError
 from me4storage.models.status import Status
+from me4storage.common import jsonstream
+from me4storage.api.tracing import Tracer, Lazy, redact_url
 
 logger = logging.getLogger(__name__)
 
-class Session:
+# Pattern matching the status response given by the API when the session
+# key provided in the request headers is not (or no longer) valid
+SESSION_ERROR_REGEX = re.compile(r'session\s*key|not logged in|session.*(expired|invalid)', re.IGNORECASE)
 
-    def __init__(self,
-                 host,
-                 port,
-                 username,
-                 password,
-                 verify,
-                 timeout = 120,
-                 retries = 5,
-                 ):
+# Endpoints which only read state from the array. All other endpoints
+# (set/, create/, add/, delete/, map/, restart/, ...) modify the array
+READ_ONLY_PREFIXES = ('show/', 'check/')
 
-        logger.debug("Init class Session")
-        self.host = host
-        self.port = port
-        self.username = username
-        self.password = password
-        self.verify = verify
-        self.timeout = timeout
-        self.retries = retries
+# Size of chunks read from the network when parsing responses incrementally
+STREAM_CHUNK_SIZE = 64 * 1024
 
-        logger.debug("Session params:\n"
-                "\thost: {}\n"
-                "\tport: {}\n"
-                "\tusername: {}\n"
-                "\tpassword: {}\n"
-                "\tverify: {}"
-                .format(self.host,
-                        self.port,
-                        self.username,
-                        self.password,
-                        self.verify))
+# Seconds a controller which could not be reached is avoided for, when the
+# session has a second controller to use instead
+FAILOVER_COOLDOWN = 30
 
-        # If verify is false, disable all requests InsecureRequestWarning
-        # instances, which produce annoying warning messages on the console
-        if self.verify == False:
-            requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+# Timeout of the request ending each management controller session when a
+# Session is closed, in seconds. Kept short, as closing must not hold up
+# the exit of a command
+LOGOUT_TIMEOUT = 10
 
-        # Add a requests transport adapter: https://requests.readthedocs.io/en/master/user/advanced/#transport-adapters
-        # to implement retries for certain failed requests
-        retry_strategy = Retry(
-            total=retries,
-            connect=retries,
-            read=retries,
-            backoff_factor=1,
-            status_forcelist=[429, 500, 502, 503, 504],
-            method_whitelist=["HEAD", "GET", "OPTIONS"]
-        )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        self.session = requests.Session()
-        self.session.mount("https://", adapter)
+# Number of management controller session keys obtained by logging in, and
+# not yet released by Session.close(), across every Session in this process
+_open_sessions = 0
+_open_sessions_lock = threading.Lock()
 
-        # Login to the api and get session token
-        self.session_token = None
-        self._login()
+def _count_sessions(change):
+    global _open_sessions
+    with _open_sessions_lock:
+        _open_sessions += change
 
-        # Set authorization token in session headers
-        self.headers = {
-                "datatype": "json",
-                "sessionKey": self.session_token,
-                }
+def open_sessions():
+    """ Return the number of management controller sessions this process
+    has logged in to and not yet closed, for diagnostics """
+    return _open_sessions
 
-    def _login(self):
-        """
-        Login to the API and store the session token
+def is_read_only(endpoint):
+    """ Return True if the endpoint does not modify the array """
+    return endpoint.startswith(READ_ONLY_PREFIXES)
 
-        POST to the auth/login endpoint with the provided username and
-        password. The response contains the parameter 'token' which is
-        stored and then used in all future API calls to authenticate.
-        """
+class BaseSession:
+    ''' Transport independent parts of an ME4 API session
 
-        auth_string = hashlib.sha256(f'{self.username}_{self.password}'.encode('utf-8')).hexdigest()
-        endpoint_path = f'login/{auth_string}'
-        url = self._build_url(endpoint_path)
+        URL encoding, response decoding, status checking and the login
+        handshake are shared by the blocking Session and the asyncio
+        AsyncSession, so both behave identically against the array.
+    '''
 
-        response = self.session.get(
-                url,
-                verify = self.verify,
-                headers = { "datatype": "json",},
-                )
+    def _kept_for_reuse(self, host, token):
+        """ Whether token is kept in the token cache, to be reused by later
+        invocations, so must not be logged out of """
 
-        logger.debug("Response:\n{}".format(response.text))
-        response.raise_for_status()
+        return (self.token_cache is not None and
+                self.token_cache.get(host, self.port, self.username) == token)
 
-        response_body = self._decode_response(response)
-        logger.debug("Response:\n{}".format(pformat(response_body)))
+    def _login_endpoint(self):
+        """ Endpoint used to login, which encodes a hash of the credentials """
+
+        auth_string = hashlib.sha256(f'{self.username}_{self.password}'.encode('utf-8')).hexdigest()
+        return f'login/{auth_string}'
+
+    def _token_from_login(self, response_body, text):
+        """ Extract the session token from the decoded login response """
 
         try:
-            self.session_token = response_body['status'][0]['response']
+            return response_body['status'][0]['response']
         except Exception as e:
             logger.error("Unable to login, unexpected output in "
-                         f"response: \n{response.text}")
+                         f"response: \n{text}")
             raise LoginError("No session token received")
 
-    def _decode_response(self, response):
+    @staticmethod
+    def _is_session_error(status_code, error=None):
+        """
+        Check whether a request failed because our session token was
+        rejected, either with a HTTP authentication error, or with an
+        error status object in the response
+        """
+
+        if status_code in (401, 403):
+            return True
+        if error is not None and isinstance(error.response, dict):
+            for status_response in error.response.get('status', []):
+                if SESSION_ERROR_REGEX.search(str(status_response.get('response', ''))):
+                    return True
+        return False
+
+    def _decode_text(self, text):
+        """ Decode the text of an API response from json """
+
         try:
-            response_body = response.json()
+            response_body = json.loads(text)
         except json.decoder.JSONDecodeError as e:
             # Handle edge-case for certain operations, such as creating
             # the very first user in the array after factory reset.
@@ -120,7 +118,7 @@ class Session:
             #
             # If this text output starts with the work 'Success' we squash
             # the error and instead return a dummy 'status' response
-            if response.text.startswith('Success:'):
+            if text.startswith('Success:'):
                 response_body = {
                         "status": [
                             {
@@ -137,13 +135,12 @@ class Session:
                         ],
                     }
             else:
-                logger.error(f"Failed to decode response into json:\n{response.text}")
+                logger.error(f"Failed to decode response into json:\n{text}")
                 raise e
 
         return response_body
 
-
-    def _build_url(self, endpoint, data={}):
+    def _build_url(self, endpoint, data={}, host=None):
         """ Format endpoint string and optional data parameters into compatible
             ME4 API URL
 
@@ -158,9 +155,12 @@ class Session:
             * HTTPS interface format: create/user/JSmith/interfaces/wbi/password/Abc#1379
 
         Thus, this function iterates over any provided parameters and encodes them into the URL
+
+        The URL is for the session's host, unless another host (eg: the
+        partner controller) is given.
         """
 
-        url = f"https://{self.host}:{self.port}/api/{endpoint}"
+        url = f"https://{host or self.host}:{self.port}/api/{endpoint}"
         for key, value in data.items():
             if value is not None:
                 # Note we quote the value here as the ME4 API expects this for
@@ -173,7 +173,7 @@ class Session:
 
         # Use urllib.parse.quote to sanitise URL
         sanitised_url = urllib.parse.quote(url, safe='/@_.,-~:"*')
-        logger.debug(f"url: {sanitised_url}")
+        logger.debug("url: %s", Lazy(redact_url, sanitised_url))
         return sanitised_url
 
     @staticmethod
@@ -198,55 +198,645 @@ class Session:
             if status.return_code != 0:
                 raise ApiStatusError(f"Operation failed. rc: {status.return_code}. Response: {status.response}", response)
 
-    def _get(self, url, params={}):
+class Session(BaseSession):
+    ''' Session with the ME4 HTTP API of a single array
+
+        Each controller of an array runs its own management controller
+        (MC). If a secondary host is given, the session uses both:
+
+            * Read-only requests ('show/', 'check/') alternate between the
+              two controllers, spreading the load.
+            * Requests which modify the array are all sent to one
+              controller (the primary, to begin with), so they are applied
+              in order.
+            * If a controller can't be reached, the request is retried on
+              the other controller straight away, rather than after the
+              full retry budget. The unreachable controller is avoided
+              for FAILOVER_COOLDOWN seconds, and if it was the controller
+              modifying requests were sent to, they move to the other.
+
+        We login to the primary when the session is created, and to the
+        secondary when it is first used. Each controller has its own
+        session key.
+
+        The management controllers only allow a limited number of sessions,
+        which otherwise last until they time out, so close the session once
+        done with it, or use it as a context manager, eg:
+
+            with Session(host, port, username, password, verify) as session:
+                show.system(session)
+
+        Closing logs out of each controller we logged in to, unless the
+        session keys are kept in a token cache for later invocations.
+
+        Given a LatencyStore (see me4storage.api.latency), the timeout of
+        each read-only request is derived from the response times of its
+        endpoint on the same controller, recorded in earlier requests and
+        invocations, rather than the fixed 'timeout'. Requests which modify
+        the array keep the fixed timeout: timed out requests are retried,
+        and retrying a modifying request which was only slow would apply it
+        twice. With 'hedge' as well, a read-only request which takes
+        longer than its endpoint's p95 response time is also sent to the
+        other controller, and whichever answers first is used.
+
+        Attributes:
+            secondary_host (string): optional hostname/IP of the partner
+                controller
+            latency (LatencyStore): optional record of endpoint response
+                times, used for adaptive timeouts and hedging
+            hedge (bool): send slow read-only requests to both controllers
+            token_cache (TokenCache): optional on-disk session token cache
+            cache (ResponseCache): optional cache of 'show/' responses
+            tracer (Tracer): request tracing, see me4storage.api.tracing
+            transport (callable): factory for the requests transport
+                adapter used to talk to the array, called with the
+                'max_retries' keyword argument. Defaults to HTTPAdapter.
+                See me4storage.api.transport for adapters which record
+                and replay responses.
+            plan (Plan): if given, requests which would modify the array
+                are recorded in the plan rather than sent, see
+                me4storage.api.plan
+    '''
+
+    def __init__(self,
+                 host,
+                 port,
+                 username,
+                 password,
+                 verify,
+                 timeout = 120,
+                 retries = 5,
+                 token_cache = None,
+                 cache = None,
+                 tracer = None,
+                 transport = None,
+                 plan = None,
+                 secondary_host = None,
+                 latency = None,
+                 hedge = False,
+                 ):
+
+        logger.debug("Init class Session")
+        self.host = host
+        self.secondary_host = secondary_host
+        self.hosts = [host]
+        if secondary_host and secondary_host != host:
+            self.hosts.append(secondary_host)
+        self.port = port
+        self.username = username
+        self.password = password
+        self.verify = verify
+        self.timeout = timeout
+        self.retries = retries
+        self.token_cache = token_cache
+        self.cache = cache
+        self.tracer = tracer if tracer is not None else Tracer()
+        self.transport = transport if transport is not None else HTTPAdapter
+        self.plan = plan
+        self.latency = latency
+        self.hedge = hedge
+
+        logger.debug("Session params:\n"
+                "\thost: %s\n"
+                "\tsecondary host: %s\n"
+                "\tport: %s\n"
+                "\tusername: %s\n"
+                "\tpassword: %s\n"
+                "\tverify: %s",
+                self.host,
+                self.secondary_host,
+                self.port,
+                self.username,
+                '<redacted>',
+                self.verify)
+
+        # If verify is false, disable all requests InsecureRequestWarning
+        # instances, which produce annoying warning messages on the console
+        if self.verify == False:
+            requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
+
+        # Add a requests transport adapter: https://requests.readthedocs.io/en/master/user/advanced/#transport-adapters
+        # to implement retries for certain failed requests
+        # With a second controller, connection errors fail over to it
+        # immediately instead of being retried
+        retry_strategy = Retry(
+            total=retries,
+            connect=retries if len(self.hosts) == 1 else 0,
+            read=retries,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            method_whitelist=["HEAD", "GET", "OPTIONS"]
+        )
+        adapter = self.transport(max_retries=retry_strategy)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+
+        # Session tokens of each controller, and routing state
+        self._tokens = {}
+        self._login_lock = threading.Lock()
+        self._route_lock = threading.Lock()
+        self._next_read = 0
+        self._pinned = self.host
+        self._unavailable_until = {}
+        # Session keys we logged in for, as opposed to taken from the
+        # token cache
+        self._owned_tokens = set()
+        self.closed = False
+
+        # Login to the primary controller and get session token, reusing a
+        # cached token if available
+        self._token(self.host)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self, logout=True):
+        """ End the session with each controller, and close our connections
+
+        Sends 'exit' to each controller we logged in to, ending the session
+        on the management controller rather than leaving it to time out.
+        The only session keys left open are those kept in the token cache
+        to be reused by later invocations. Each logout is a single attempt
+        with a short timeout, and failing to logout is not an error, as the
+        session times out regardless.
+
+        Args:
+            logout (bool): pass False when the controllers have restarted,
+                which has already ended our sessions, to release the
+                session keys without sending requests that would fail
+        """
+
+        with self._login_lock:
+            if self.closed:
+                return
+            self.closed = True
+            tokens = dict(self._tokens)
+            owned = self._owned_tokens
+            self._tokens = {}
+            self._owned_tokens = set()
+
+        for host, token in tokens.items():
+            if token not in owned:
+                continue
+            if logout and not self._kept_for_reuse(host, token):
+                self._logout(host, token)
+            _count_sessions(-1)
+
+        self.session.close()
+
+    def _logout(self, host, token):
+
+        url = self._build_url('exit', host=host)
+        trace = self.tracer.start('GET', url, endpoint='exit')
+        # Without retries, so that a controller which can't be reached (eg:
+        # at its address before a network change) doesn't hold us up
+        try:
+            with requests.Session() as logout_session:
+                logout_session.mount("https://", self.transport(max_retries=0))
+                response = logout_session.get(url,
+                                              verify=self.verify,
+                                              headers={"datatype": "json", "sessionKey": token},
+                                              timeout=LOGOUT_TIMEOUT,
+                                              )
+            trace.response(response.status_code, Lazy(getattr, response, 'text'), len(response.content))
+            response.raise_for_status()
+            self._raise_status(self._decode_response(response))
+        except Exception as e:
+            logger.debug(f"Unable to logout of controller {host}: {type(e).__name__}: {e}")
+            return
+        logger.debug(f"Logged out of controller {host}")
+
+    @property
+    def session_token(self):
+        """ Session token of the primary controller """
+        return self._tokens.get(self.host)
+
+    @property
+    def headers(self):
+        """ Request headers for the primary controller """
+        return self._headers(self.host)
+
+    def _headers(self, host):
+        return {
+                "datatype": "json",
+                "sessionKey": self._token(host),
+                }
+
+    def _token(self, host):
+        """ Session token for host, logging in on first use """
+
+        token = self._tokens.get(host)
+        if token is None:
+            with self._login_lock:
+                token = self._tokens.get(host)
+                if token is None and self.token_cache is not None:
+                    token = self.token_cache.get(host, self.port, self.username)
+                    if token is not None:
+                        self._tokens[host] = token
+                if token is None:
+                    token = self._login(host)
+        return token
+
+    def _route(self, read_only):
+        """ Controllers to send a request to, in the order to try them """
+
+        with self._route_lock:
+            now = time.monotonic()
+            available = [host for host in self.hosts
+                         if self._unavailable_until.get(host, 0) <= now]
+            unavailable = [host for host in self.hosts if host not in available]
+            if read_only and len(available) > 1:
+                self._next_read = (self._next_read + 1) % len(available)
+                available = available[self._next_read:] + available[:self._next_read]
+            elif not read_only and self._pinned in available:
+                available.remove(self._pinned)
+                available.insert(0, self._pinned)
+            # Still try controllers we have recently failed to reach, as a
+            # last resort
+            return available + unavailable
+
+    def _failover(self, host, hosts, error):
+        """ Mark host unavailable after error. Returns True if there is
+        another controller to try """
+
+        remaining = hosts[hosts.index(host) + 1:]
+        if not remaining:
+            return False
+        with self._route_lock:
+            self._unavailable_until[host] = time.monotonic() + FAILOVER_COOLDOWN
+        logger.warning(f"Controller {host} unavailable ({type(error).__name__}), "
+                       f"failing over to {remaining[0]}")
+        return True
+
+    @staticmethod
+    def _can_fail_over(error, read_only):
+        """ Whether a request which failed with error can safely be sent
+        to the other controller. A modifying request which timed out may
+        still have been applied, so is only retried if we never connected.
+        """
+
+        if isinstance(error, requests.exceptions.ConnectionError):
+            return True
+        return read_only and isinstance(error, requests.exceptions.Timeout)
+
+    def clone(self, **overrides):
+        """ Create a new Session with the same parameters as this one,
+        apart from any given as keyword arguments, eg:
+
+            session = session.clone(host=new_ip, retries=10)
+
+        The new session logs in again, and shares this session's token
+        cache, response cache, tracer, transport and plan. It must be
+        closed separately.
+        """
+
+        params = dict(host=self.host,
+                      secondary_host=self.secondary_host,
+                      port=self.port,
+                      username=self.username,
+                      password=self.password,
+                      verify=self.verify,
+                      timeout=self.timeout,
+                      retries=self.retries,
+                      token_cache=self.token_cache,
+                      cache=self.cache,
+                      tracer=self.tracer,
+                      transport=self.transport,
+                      plan=self.plan,
+                      latency=self.latency,
+                      hedge=self.hedge,
+                      )
+        params.update(overrides)
+
+        # When planning, the array has not really been changed, so a new
+        # address (eg: after a planned network change) does not exist yet.
+        # Record the reconnection, and carry on talking to the current host
+        if self.plan is not None:
+            for name in ('host', 'secondary_host'):
+                if params[name] != getattr(self, name):
+                    if params[name]:
+                        self.plan.record('CONNECT', f"https://{params[name]}:{params['port']}/api/")
+                    params[name] = getattr(self, name)
+
+        return type(self)(**params)
+
+    def _login(self, host):
+        """
+        Login to the API of a controller and store the session token
+
+        POST to the auth/login endpoint with the provided username and
+        password. The response contains the parameter 'token' which is
+        stored and then used in all future API calls to authenticate.
+
+        If a token cache is configured, the new token is stored in it
+
+        Returns:
+            the session token
+        """
+
+        url = self._build_url(self._login_endpoint(), host=host)
+
+        # The login response contains the session key, so is never logged
+        trace = self.tracer.start('GET', url, sensitive=True, endpoint='login')
+        response = self.session.get(
+                url,
+                verify = self.verify,
+                headers = { "datatype": "json",},
+                )
+        trace.response(response.status_code, size=len(response.content))
+
+        response.raise_for_status()
+
+        text = response.text
+        response_body = self._decode_text(text)
+
+        token = self._token_from_login(response_body, text)
+        self._tokens[host] = token
+        self._owned_tokens.add(token)
+        _count_sessions(1)
+
+        if self.token_cache is not None:
+            self.token_cache.set(host, self.port, self.username, token)
+        return token
+
+    def _relogin(self, host, rejected_token):
+        """
+        Login again after the controller rejected our session token
+
+        Several threads may be using this session at once, so we only login
+        again if no other thread has already replaced the rejected token.
+        """
+
+        with self._login_lock:
+            if self._tokens.get(host) != rejected_token:
+                return
+            logger.debug(f"Session token rejected by controller {host}, logging in again")
+            if rejected_token in self._owned_tokens:
+                # The controller has already ended the session
+                self._owned_tokens.discard(rejected_token)
+                _count_sessions(-1)
+            if self.token_cache is not None:
+                self.token_cache.invalidate(host, self.port, self.username)
+            self._login(host)
+
+    def _decode_response(self, response):
+        return self._decode_text(response.text)
+
+    def _timeout(self, host, endpoint):
+        if self.latency is not None and is_read_only(endpoint):
+            return self.latency.timeout(host, endpoint, self.timeout)
+        return self.timeout
+
+    def _get(self, endpoint, params={}):
+        """ Send a request to the controller chosen by _route(), failing
+        over to the other controller if it can't be reached """
+
+        read_only = is_read_only(endpoint)
+        hosts = self._route(read_only)
+
+        if read_only and self.hedge and self.latency is not None and len(hosts) > 1:
+            delay = self.latency.percentile(hosts[0], endpoint, 95)
+            if delay is not None:
+                return self._hedged_get(endpoint, params, hosts, delay)
+
+        for host in hosts:
+            try:
+                response_body = self._get_from(host, endpoint, params)
+            except requests.exceptions.RequestException as e:
+                if self._can_fail_over(e, read_only) and self._failover(host, hosts, e):
+                    continue
+                raise
+            if not read_only:
+                # Keep sending modifying requests to this controller
+                self._pinned = host
+            return response_body
+
+    def _hedged_get(self, endpoint, params, hosts, delay):
+        """ Send a read-only request to the first controller, and if it
+        hasn't answered within delay seconds, to the second as well.
+        Returns the first successful response.
+
+        The slower request is left to finish in the background, and its
+        response discarded.
+        """
+
+        results = queue.Queue()
+
+        def attempt(host):
+            try:
+                results.put((host, self._get_from(host, endpoint, params), None))
+            except Exception as e:
+                results.put((host, None, e))
+
+        def launch(host):
+            threading.Thread(target=attempt, args=(host,), daemon=True,
+                             name=f'me4-hedge-{host}').start()
+
+        launch(hosts[0])
+        pending = 1
+        hedged = False
+        error = None
+        while pending:
+            try:
+                host, response_body, e = results.get(timeout=None if hedged else delay)
+            except queue.Empty:
+                logger.debug(f"No response to {endpoint} from {hosts[0]} after "
+                             f"{delay:.2f}s (p95), also sending to {hosts[1]}")
+                launch(hosts[1])
+                pending += 1
+                hedged = True
+                continue
+
+            pending -= 1
+            if e is None:
+                return response_body
+            error = e
+            if not hedged:
+                # Failed before we hedged, so fail over as usual
+                if (isinstance(e, requests.exceptions.RequestException) and
+                        self._can_fail_over(e, True) and self._failover(host, hosts, e)):
+                    launch(hosts[1])
+                    pending += 1
+                    hedged = True
+                    continue
+                raise e
+        raise error
+
+    def _get_from(self, host, endpoint, params={}, relogin=True):
+
+        url = self._build_url(endpoint, params, host=host)
+        session_token = self._token(host)
+        trace = self.tracer.start('GET', url, endpoint=endpoint, params=params)
+        start = time.monotonic()
+        try:
+            response = self.session.get(url,
+                                        verify=self.verify,
+                                        headers={"datatype": "json", "sessionKey": session_token},
+                                        params=params,
+                                        timeout=self._timeout(host, endpoint),
+                                        )
+        except requests.exceptions.Timeout:
+            # Count timeouts too, so that the timeout of an endpoint which
+            # has become slower grows
+            if self.latency is not None:
+                self.latency.record(host, endpoint, time.monotonic() - start)
+            raise
+        if self.latency is not None:
+            self.latency.record(host, endpoint, time.monotonic() - start)
+        trace.response(response.status_code, Lazy(getattr, response, 'text'), len(response.content))
+        # If our session token has been rejected (eg: a cached token which
+        # has expired on the controller), login again and retry once
+        if relogin and self._is_session_error(response.status_code):
+            self._relogin(host, session_token)
+            return self._get_from(host, endpoint, params, relogin=False)
 
-        logger.debug("HTTP GET: {}".format(url))
-        response = self.session.get(url,
-                                    verify=self.verify,
-                                    headers=self.headers,
-                                    params=params,
-                                    timeout=self.timeout,
-                                    )
         # Throw exception if bad request (a 4XX client error or 5XX server error)
         response.raise_for_status()
 
         # Decode response from json
         response_body = self._decode_response(response)
-        logger.debug("Response:\n{}".format(pformat(response_body)))
+        trace.body(response_body)
 
         # Accorindg to Dell API guidelines all API responses
         # contain a 'status' object, that we should check that
         # the operation was successful
-        self._raise_status(response_body)
+        try:
+            self._raise_status(response_body)
+        except ApiStatusError as e:
+            if relogin and self._is_session_error(response.status_code, e):
+                self._relogin(host, session_token)
+                return self._get_from(host, endpoint, params, relogin=False)
+            raise
 
         return response_body
 
 
     def get_object(self, endpoint, params={}):
-        """ Get a single object from API """
+        """ Get a single object from API
+
+        If the session has a response cache, responses from 'show/'
+        endpoints are served from and stored in the cache. Any other
+        endpoint is assumed to modify the array, and clears the cache.
+        """
 
         url = self._build_url(endpoint, params)
-        data = self._get(url, params)
+
+        if self.plan is not None and not is_read_only(endpoint):
+            self.plan.record('GET', url)
+            return self.plan.response(endpoint)
+
+        cacheable = self.cache is not None and endpoint.startswith('show/')
+        if cacheable:
+            data = self.cache.get(url)
+            if data is not None:
+                return data
+
+        data = self._get(endpoint, params)
         if isinstance(data, list):
             raise RuntimeError(f'Bad object URL \'{url}\': expected an object, '
                                f'got a collection of objects')
+
+        if cacheable:
+            self.cache.set(endpoint, url, data)
+        elif self.cache is not None and not is_read_only(endpoint):
+            self.cache.clear()
         return data
 
+    def iter_objects(self, endpoint, key, params={}, relogin=True):
+        """ Get a collection of objects from API, parsing the response
+        incrementally
+
+        Yields each object in the 'key' member of the response as soon as
+        it has been decoded, rather than decoding the whole response first.
+        This keeps memory use flat for large collections (eg: show/disks on
+        arrays with several expansion enclosures). Responses are never
+        cached.
+
+        The status object is checked once the whole response has been read,
+        so a failed request raises ApiStatusError after yielding any objects
+        that were returned.
+        """
+
+        read_only = is_read_only(endpoint)
+        hosts = self._route(read_only)
+        for host in hosts:
+            try:
+                url = self._build_url(endpoint, params, host=host)
+                session_token = self._token(host)
+                trace = self.tracer.start('GET', url, endpoint=endpoint, params=params)
+                response = self.session.get(url,
+                                            verify=self.verify,
+                                            headers={"datatype": "json", "sessionKey": session_token},
+                                            params=params,
+                                            timeout=self._timeout(host, endpoint),
+                                            stream=True,
+                                            )
+            except requests.exceptions.RequestException as e:
+                if self._can_fail_over(e, read_only) and self._failover(host, hosts, e):
+                    continue
+                raise
+            break
+
+        members = {}
+        count = 0
+        try:
+            if relogin and self._is_session_error(response.status_code):
+                response.close()
+                self._relogin(host, session_token)
+                yield from self.iter_objects(endpoint, key, params, relogin=False)
+                return
+
+            response.raise_for_status()
+
+            size = 0
+            def chunks():
+                nonlocal size
+                for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+                    size += len(chunk)
+                    yield chunk
+
+            for item in jsonstream.iter_array(chunks(), key, members):
+                count += 1
+                yield item
+        finally:
+            response.close()
+
+        trace.response(response.status_code, size=size)
+        logger.debug("Streamed %d objects from %s", count, endpoint)
+        try:
+            self._raise_status(members)
+        except ApiStatusError as e:
+            if relogin and count == 0 and self._is_session_error(response.status_code, e):
+                self._relogin(host, session_token)
+                yield from self.iter_objects(endpoint, key, params, relogin=False)
+                return
+            raise
+
+    def invalidate_cache(self):
+        """ Discard all cached responses, if response caching is enabled """
+
+        if self.cache is not None:
+            self.cache.clear()
+
     def _put(self, url, data={}):
 
-        logger.debug("HTTP PUT: {}".format(url))
+        trace = self.tracer.start('PUT', url)
         response = self.session.put(url,
                                     verify=self.verify,
                                     headers=self.headers,
                                     timeout=self.timeout,
                                     data=data,
                                     )
+        trace.response(response.status_code, Lazy(getattr, response, 'text'), len(response.content))
         # Throw exception if bad request (a 4XX client error or 5XX server error)
         response.raise_for_status()
 
         # Decode response from json
         response_body = self._decode_response(response)
-        logger.debug("Response:\n{}".format(pformat(response_body)))
+        trace.body(response_body)
 
         # Accorindg to Dell API guidelines all API responses
         # contain a 'status' object, that we should check that
@@ -275,7 +865,16 @@ class Session:
         """
 
         url = self._build_url(endpoint, data)
-        data = self._get(url, data)
+
+        if self.plan is not None:
+            self.plan.record('GET', url)
+            return self.plan.response(endpoint)
+
+        data = self._get(endpoint, data)
+
+        # The array has been modified, so any cached responses may be stale
+        self.invalidate_cache()
+
         if isinstance(data, list): raise RuntimeError(f'Bad object URL \'{url}\': expected an object, '
                                f'got a collection of objects')
         return data
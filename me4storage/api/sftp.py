@@ -1,25 +1,305 @@
 import logging
+import hashlib
 import os
-import json
-from pprint import pformat
-import pysftp
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-from me4storage.common.exceptions import ApiError
+import paramiko
+import pysftp
 
 logger = logging.getLogger(__name__)
 
-def save_logs(host, port, username, password, output_file):
+# Seconds between progress messages during a transfer
+PROGRESS_INTERVAL = 10
+
+# Size of each read when downloading. Only one chunk is held in memory at
+# a time, whatever the size of the file.
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
 
+# Number of times a download is restarted after the connection drops
+DOWNLOAD_RETRIES = 3
+
+def _cnopts():
     cnopts = pysftp.CnOpts(knownhosts=os.path.expanduser(os.path.join('~','.ssh','known_hosts')))
+    # The controllers present self-signed host keys which change with
+    # every certificate or firmware update, so are not checked
     cnopts.hostkeys = None
+    return cnopts
+
+def connect(host, port, username, password):
+    """ Open an SFTP connection to a controller """
+
+    logger.debug(f"Opening SFTP connection to {host}:{port}")
+    return pysftp.Connection(host,
+                             port=int(port),
+                             username=username,
+                             password=password,
+                             cnopts=_cnopts())
+
+class TransferStats:
+    ''' Size and duration of a completed transfer
+
+        Attributes:
+            host (string): Controller the file was transferred to or from
+            path (string): Local path of the file
+            remotepath (string): Remote path of the file
+            size (int): Bytes transferred
+            elapsed (float): Seconds taken
+            sha256 (string): Hex SHA-256 digest of the file, for downloads
+    '''
+
+    def __init__(self, host, path, remotepath, size, elapsed, sha256=None):
+        self.host = host
+        self.path = path
+        self.remotepath = remotepath
+        self.size = size
+        self.elapsed = elapsed
+        self.sha256 = sha256
+
+    @property
+    def throughput(self):
+        """ Bytes per second """
+        return self.size / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"{os.path.basename(self.path)} ({self.host}:{self.remotepath}): "
+                f"{self.size / 2**20:.1f} MiB in {self.elapsed:.1f}s, "
+                f"{self.throughput / 2**20:.2f} MiB/s")
+
+class _Progress:
+    """ pysftp transfer callback, logging progress at most every
+    PROGRESS_INTERVAL seconds
+    """
+
+    def __init__(self, description, interval=PROGRESS_INTERVAL):
+        self.description = description
+        self.interval = interval
+        self.start = time.monotonic()
+        self.last_report = self.start
+        self.transferred = 0
+
+    def __call__(self, transferred, total):
+        self.transferred = transferred
+        now = time.monotonic()
+        if now - self.last_report < self.interval:
+            return
+        self.last_report = now
+        rate = transferred / (now - self.start) / 2**20
+        if total:
+            logger.info(f"{self.description}: {transferred / 2**20:.1f} of "
+                        f"{total / 2**20:.1f} MiB ({100 * transferred / total:.0f}%), {rate:.2f} MiB/s")
+        else:
+            logger.info(f"{self.description}: {transferred / 2**20:.1f} MiB, {rate:.2f} MiB/s")
+
+class ConnectionPool:
+    ''' SFTP connections to the controllers of an array, opened on first
+        use and reused for every following transfer to the same controller,
+        so each controller costs a single SSH handshake.
+
+        A connection must only be used by one thread at a time, which
+        transfer() ensures by holding a per-controller lock. Use as a
+        context manager to close all connections afterwards, eg:
+
+            with ConnectionPool(port, username, password) as pool:
+                pool.put(host, firmware_path, '/disk')
+
+        Attributes:
+            port (int): SFTP port of the controllers
+            username (string): Username to login as
+            password (string): Password to login with
+    '''
+
+    def __init__(self, port, username, password):
+        self.port = port
+        self.username = username
+        self.password = password
+        self._connections = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _host_lock(self, host):
+        with self._lock:
+            return self._locks.setdefault(host, threading.Lock())
+
+    def _connection(self, host):
+        connection = self._connections.get(host)
+        if connection is None:
+            connection = connect(host, self.port, self.username, self.password)
+            self._connections[host] = connection
+        return connection
+
+    def _discard(self, host):
+        connection = self._connections.pop(host, None)
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception as e:
+                logger.debug(f"Error closing SFTP connection: {e}")
+
+    def transfer(self, host, direction, path, remotepath):
+        """ Upload ('put') or download ('get') a file, over the pooled
+        connection to host
+
+        Returns:
+            TransferStats
+        """
+
+        if direction not in ('put', 'get'):
+            raise ValueError(f"Invalid transfer direction '{direction}'")
+
+        description = (f"Uploading {os.path.basename(path)} to {host}:{remotepath}"
+                       if direction == 'put' else
+                       f"Downloading {host}:{remotepath} to {path}")
+        with self._host_lock(host):
+            connection = self._connection(host)
+            progress = _Progress(description)
+            logger.info(f"{description}...")
+            start = time.monotonic()
+            if direction == 'put':
+                # The controllers consume uploaded files immediately, so
+                # there is nothing to stat afterwards
+                connection.put(path, remotepath=remotepath, callback=progress, confirm=False)
+            else:
+                connection.get(remotepath, localpath=path, callback=progress)
+            stats = TransferStats(host, path, remotepath, progress.transferred,
+                                  time.monotonic() - start)
+
+        logger.info(f"Transferred {stats}")
+        return stats
+
+    def put(self, host, path, remotepath):
+        return self.transfer(host, 'put', path, remotepath)
+
+    def get(self, host, remotepath, path):
+        return self.transfer(host, 'get', path, remotepath)
+
+    def download(self, host, remotepath, path, retries=DOWNLOAD_RETRIES):
+        """ Download a file in chunks, starting again if the connection drops
+
+        The file is written to '<path>.part', and renamed to path once
+        complete, or removed if the download fails. A SHA-256 digest is computed as the data arrives, rather
+        than by reading the file again afterwards. If the connection
+        drops, we reconnect and download the whole file again, up to
+        'retries' times. We can't resume from the last byte received, as
+        the controller generates a new file (eg: the log bundle) for each
+        download, so the two parts would not belong to the same file.
+
+        Returns:
+            TransferStats, including the sha256 digest of the file
+        """
+
+        part_path = path + '.part'
+        digest = hashlib.sha256()
+        offset = 0
+        attempt = 0
+        progress = _Progress(f"Downloading {host}:{remotepath} to {path}")
+        logger.info(f"{progress.description}...")
+        start = time.monotonic()
+
+        try:
+            with self._host_lock(host), open(part_path, 'wb') as local_file:
+                while True:
+                    try:
+                        connection = self._connection(host)
+                        with connection.open(remotepath, 'rb') as remote_file:
+                            total = remote_file.stat().st_size or None
+                            if total:
+                                # Pipeline read requests, rather than waiting
+                                # for each one in turn
+                                remote_file.prefetch(total)
+                            while True:
+                                chunk = remote_file.read(DOWNLOAD_CHUNK_SIZE)
+                                if not chunk:
+                                    break
+                                local_file.write(chunk)
+                                digest.update(chunk)
+                                offset += len(chunk)
+                                progress(offset, total)
+                        break
+                    except (EnvironmentError, EOFError, paramiko.SSHException) as e:
+                        self._discard(host)
+                        attempt += 1
+                        if attempt > retries:
+                            raise
+                        logger.warning(f"Download from {host}:{remotepath} interrupted after "
+                                       f"{offset / 2**20:.1f} MiB ({e}). Starting again, "
+                                       f"attempt {attempt} of {retries}...")
+                        digest = hashlib.sha256()
+                        offset = 0
+                        local_file.seek(0)
+                        local_file.truncate()
+        except BaseException:
+            # Don't leave a partial download behind
+            try:
+                os.remove(part_path)
+            except OSError:
+                pass
+            raise
+
+        os.replace(part_path, path)
+        stats = TransferStats(host, path, remotepath, offset,
+                              time.monotonic() - start, sha256=digest.hexdigest())
+        logger.info(f"Transferred {stats}, sha256: {stats.sha256}")
+        return stats
+
+    def put_parallel(self, uploads):
+        """ Upload files to several controllers at once
+
+        Uploads to the same controller are made one after another over a
+        single connection, while each controller is uploaded to in
+        parallel.
+
+        Args:
+            uploads (list): (host, local path, remote path) tuples
+
+        Returns:
+            list of TransferStats, in the order the uploads were given.
+            If any upload failed, the first such exception is raised once
+            all uploads have finished.
+        """
+
+        by_host = {}
+        for index, (host, path, remotepath) in enumerate(uploads):
+            by_host.setdefault(host, []).append((index, path, remotepath))
+
+        def upload_all(host, host_uploads):
+            return [(index, self.put(host, path, remotepath))
+                    for index, path, remotepath in host_uploads]
+
+        with ThreadPoolExecutor(max_workers=max(1, len(by_host))) as executor:
+            futures = [executor.submit(upload_all, host, host_uploads)
+                       for host, host_uploads in by_host.items()]
+
+        results = {}
+        for future in futures:
+            results.update(future.result())
+        return [results[index] for index in range(len(uploads))]
+
+    def close(self):
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections = {}
+        for connection in connections:
+            try:
+                connection.close()
+            except Exception as e:
+                logger.debug(f"Error closing SFTP connection: {e}")
+
+def save_logs(host, port, username, password, output_file):
+    """ Download the log bundle of an array to output_file
+
+    Returns:
+        TransferStats, including the sha256 digest of the bundle
+    """
+
     logger.info(f"Downloading log bundle from {host} to "
                 f"{output_file} ... This can take a few minutes.")
-    with pysftp.Connection(host,
-                      port=int(port),
-                      username=username,
-                      password=password,
-                      cnopts=cnopts,
-                      ) as sftp:
-        sftp.get(remotepath='/logs', localpath=output_file)
-
-    return True
+    with ConnectionPool(port, username, password) as pool:
+        return pool.download(host, '/logs', output_file)
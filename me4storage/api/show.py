@@ -145,7 +145,7 @@ def disk_groups(session, detail=None, pool_name=None, disk_groups=None):
 
     return results
 
-def volumes(session, detail=None, pool=None, disk_groups=None, volume_type=None, volumes=None):
+def _volumes_params(detail=None, pool=None, disk_groups=None, volume_type=None, volumes=None):
     params = {}
     if detail is not None:
         params['detail'] = None
@@ -157,6 +157,10 @@ def volumes(session, detail=None, pool=None, disk_groups=None, volume_type=None,
         params['type'] = volume_type
     if (volumes is not None) and isinstance(volumes, list):
         params[",".join(volumes)] = None
+    return params
+
+def volumes(session, detail=None, pool=None, disk_groups=None, volume_type=None, volumes=None):
+    params = _volumes_params(detail, pool, disk_groups, volume_type, volumes)
 
     response_body = session.get_object('show/volumes',params)
     # iterate over list of results and instantiate model object for each entry
@@ -166,12 +170,24 @@ def volumes(session, detail=None, pool=None, disk_groups=None, volume_type=None,
 
     return results
 
-def disks(session, detail=None, disk_groups=None):
+def iter_volumes(session, detail=None, pool=None, disk_groups=None, volume_type=None, volumes=None):
+    """ Generator variant of volumes(), yielding each Volume as soon as it
+    has been parsed from the response
+    """
+    params = _volumes_params(detail, pool, disk_groups, volume_type, volumes)
+    for _dict in session.iter_objects('show/volumes', 'volumes', params):
+        yield Volume(_dict)
+
+def _disks_params(detail=None, disk_groups=None):
     params = {}
     if detail is not None:
         params['detail'] = None
     if (disk_groups is not None) and isinstance(disk_groups, list):
         params['disk-group'] = ",".join(disk_groups)
+    return params
+
+def disks(session, detail=None, disk_groups=None):
+    params = _disks_params(detail, disk_groups)
 
     response_body = session.get_object('show/disks',params)
     # iterate over list of results and instantiate model object for each entry
@@ -181,6 +197,14 @@ def disks(session, detail=None, disk_groups=None):
 
     return results
 
+def iter_disks(session, detail=None, disk_groups=None):
+    """ Generator variant of disks(), yielding each Disk as soon as it
+    has been parsed from the response
+    """
+    params = _disks_params(detail, disk_groups)
+    for _dict in session.iter_objects('show/disks', 'drives', params):
+        yield Disk(_dict)
+
 def initiators(session, hosts=None, initiators=None):
     params = {}
     if (hosts is not None) and isinstance(hosts, list):
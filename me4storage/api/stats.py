@@ -0,0 +1,200 @@
+import logging
+import sys
+import threading
+import time
+
+from me4storage.api.latency import percentile
+from me4storage.api.tracing import redact_url
+import me4storage.common.tables as tables
+
+logger = logging.getLogger(__name__)
+
+# The call each thread last started, which models built by the thread are
+# attributed to, and the depth of nested model construction in the thread
+_current = threading.local()
+
+def url_template(endpoint, params=None):
+    """ Return the URL path of a request with its parameter values
+    replaced by placeholders, so that it contains no names or credentials
+
+    eg: 'create/user', {'JSmith': None, 'password': 'Abc#1379'}
+        -> 'create/user/<arg>/password/<value>'
+    """
+
+    template = endpoint
+    for key, value in (params or {}).items():
+        if value is None:
+            # A bare word, which may be a flag or an object name
+            template += '/<arg>'
+        else:
+            template += f'/{key}/<value>'
+    return template
+
+class Call:
+    ''' Accounting of a single API request, see CallStats
+
+        Attributes:
+            method (string): HTTP method
+            template (string): URL path with parameter values removed,
+                see url_template()
+            status_code (int): HTTP status, or None if no response was
+                received (eg: timeout)
+            size (int): bytes received
+            network (float): seconds from sending the request until the
+                response was received
+            decode (float): seconds spent decoding the JSON response
+            build (float): seconds spent building models from the response
+    '''
+
+    __slots__ = ('method', 'template', 'status_code', 'size', 'start', 'end',
+                 'network', 'decode', 'build')
+
+    def __init__(self, method, template):
+        self.method = method
+        self.template = template
+        self.status_code = None
+        self.size = 0
+        self.start = time.monotonic()
+        self.end = self.start
+        self.network = 0.0
+        self.decode = 0.0
+        self.build = 0.0
+
+    @property
+    def total(self):
+        return self.network + self.decode + self.build
+
+class _BuildTimer:
+    """ Context manager timing the construction of a model, see
+    me4storage.models.basemodel.Model.build_timer
+
+    Models containing other models are only timed once, at the outermost
+    level.
+    """
+
+    __slots__ = ('start',)
+
+    def __enter__(self):
+        depth = getattr(_current, 'depth', 0)
+        _current.depth = depth + 1
+        if depth == 0:
+            self.start = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb):
+        _current.depth -= 1
+        if _current.depth == 0:
+            call = getattr(_current, 'call', None)
+            if call is not None:
+                call.build += time.perf_counter() - self.start
+
+def build_timer():
+    return _BuildTimer()
+
+class CallStats:
+    ''' Accounting of every API request made by a command, for --stats
+
+        The session's Tracer creates a Call for each request, recording its
+        HTTP status, response size, and the time spent on the network and
+        decoding the response. Models built from a response (timed when
+        Model.build_timer is set to build_timer) are attributed to the last
+        request started by the same thread.
+
+        Streamed responses (Session.iter_objects) are decoded as they are
+        received, so their decoding is counted as network time.
+
+        display() prints a table of the calls made to each endpoint, which
+        shows slow endpoints, and endpoints called once per object (N+1
+        patterns). Time the command spent outside API requests and building
+        models is reported as rendering.
+    '''
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def begin(self, method, endpoint, params=None, url=None):
+        """ Start accounting for a request. The URL is only used if no
+        endpoint is given, with any credentials redacted """
+
+        if endpoint is not None:
+            template = url_template(endpoint, params)
+        else:
+            template = redact_url(url or '').split('/api/', 1)[-1]
+        call = Call(method, template)
+        with self._lock:
+            self.calls.append(call)
+        _current.call = call
+        return call
+
+    def summary(self):
+        """ Return a list of (template, calls) tuples, grouping calls by
+        URL template, slowest total first """
+
+        with self._lock:
+            calls = list(self.calls)
+
+        by_template = {}
+        for call in calls:
+            by_template.setdefault(call.template, []).append(call)
+        return sorted(by_template.items(),
+                      key=lambda item: sum(call.total for call in item[1]),
+                      reverse=True)
+
+    def api_time(self):
+        """ Wall clock seconds during which at least one request was in
+        flight. Concurrent requests (see me4storage.api.gather) overlap,
+        so this is less than the sum of their times """
+
+        with self._lock:
+            intervals = sorted((call.start, call.end) for call in self.calls)
+        elapsed = 0.0
+        current_start = current_end = None
+        for start, end in intervals:
+            if current_end is None or start > current_end:
+                if current_end is not None:
+                    elapsed += current_end - current_start
+                current_start, current_end = start, end
+            else:
+                current_end = max(current_end, end)
+        if current_end is not None:
+            elapsed += current_end - current_start
+        return elapsed
+
+    def display(self, title='API calls', file=None):
+        """ Print the summary table, to stderr by default so that it isn't
+        mixed with the command's output """
+
+        file = file if file is not None else sys.stderr
+        total = time.monotonic() - self.start
+
+        table_header = ['Endpoint', 'Calls', 'Status', 'Bytes', 'Network',
+                        'p95', 'Decode', 'Build', 'Total']
+        table_rows = []
+        build = 0.0
+        for template, calls in self.summary():
+            statuses = {}
+            for call in calls:
+                status = str(call.status_code) if call.status_code is not None else 'error'
+                statuses[status] = statuses.get(status, 0) + 1
+            network = [call.network for call in calls]
+            build += sum(call.build for call in calls)
+            table_rows.append([
+                template,
+                str(len(calls)),
+                ', '.join(f'{status}:{count}' for status, count in sorted(statuses.items())),
+                f'{sum(call.size for call in calls):,}',
+                f'{sum(network):.3f}s',
+                f'{percentile(network, 95):.3f}s',
+                f'{sum(call.decode for call in calls):.3f}s',
+                f'{sum(call.build for call in calls):.3f}s',
+                f'{sum(call.total for call in calls):.3f}s',
+                ])
+
+        api_time = self.api_time()
+        rendering = max(0.0, total - api_time - build)
+        print(f"{title}:", file=file)
+        if table_rows:
+            print(tables.format_table(table_header, table_rows), file=file)
+        print(f"Total {total:.3f}s: API requests {api_time:.3f}s, "
+              f"building models {build:.3f}s, rendering {rendering:.3f}s", file=file)
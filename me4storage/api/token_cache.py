@@ -0,0 +1,112 @@
+import logging
+import os
+import stat
+import json
+import time
+import hashlib
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+def default_cache_dir():
+    """ Default location of the me4cli cache directory
+
+    Follows the XDG base directory specification, falling back to
+    ~/.cache/me4cli
+    """
+
+    cache_home = os.environ.get('XDG_CACHE_HOME',
+                                os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'me4cli')
+
+class TokenCache:
+    ''' On-disk cache of ME4 API session tokens
+
+        Logging in to the ME4 API costs a full request to the management
+        controller before any real work can be done. For short-lived
+        invocations, such as monitoring checks run every minute, we cache
+        the session token on disk and reuse it for subsequent invocations
+        until it expires.
+
+        Tokens are stored one per file, keyed by host, port and username.
+        The cache directory is only accessible by the owning user, and
+        each token file is created with mode 0600. Any token file
+        readable by other users is ignored.
+
+        Attributes:
+            cache_dir (string): Directory to store session tokens in
+            ttl (int): Number of seconds a cached token is considered
+                valid for after login. This should be shorter than the
+                session timeout configured for the user on the array.
+    '''
+
+    def __init__(self, cache_dir=None, ttl=1500):
+        if cache_dir is None:
+            cache_dir = os.path.join(default_cache_dir(), 'tokens')
+        self.cache_dir = cache_dir
+        self.ttl = int(ttl)
+
+    def _path(self, host, port, username):
+        key = hashlib.sha256(f'{host}:{port}:{username}'.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def get(self, host, port, username):
+        """ Return cached session token, or None if no valid token is cached """
+
+        path = self._path(host, port, username)
+        try:
+            file_stat = os.stat(path)
+            if file_stat.st_uid != os.getuid() or file_stat.st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+                logger.warning(f"Ignoring session token cache file {path} "
+                               f"with insecure ownership or permissions")
+                return None
+
+            with open(path, 'r') as token_file:
+                entry = json.load(token_file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.debug(f"Unable to read session token cache file {path}: {e}")
+            return None
+
+        if entry.get('expires', 0) <= time.time():
+            logger.debug(f"Cached session token for {username}@{host}:{port} has expired")
+            return None
+
+        logger.debug(f"Using cached session token for {username}@{host}:{port}")
+        return entry.get('token')
+
+    def set(self, host, port, username, token):
+        """ Store session token in the cache """
+
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        os.chmod(self.cache_dir, 0o700)
+
+        entry = {
+            'host': host,
+            'port': port,
+            'username': username,
+            'token': token,
+            'expires': time.time() + self.ttl,
+            }
+
+        # Write to a temporary file first and rename into place so that
+        # concurrent invocations never see a partially written file.
+        # mkstemp creates the file with mode 0600
+        path = self._path(host, port, username)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as token_file:
+                json.dump(entry, token_file)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def invalidate(self, host, port, username):
+        """ Remove any cached session token """
+
+        try:
+            os.unlink(self._path(host, port, username))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,164 @@
+import logging
+import os
+import re
+import itertools
+import threading
+import time
+
+from pprint import pformat
+
+logger = logging.getLogger(__name__)
+
+# Parts of API URLs which must never be logged: the login endpoint encodes
+# a hash of the username and password, and several endpoints take a
+# password parameter
+_REDACT_PATTERNS = [
+    (re.compile(r'(/login/)[^/?]+'), r'\1<redacted>'),
+    (re.compile(r'(/(?:password|new-password|auth-password|priv-password)/)("[^"]*"|[^/?]*)',
+                re.IGNORECASE), r'\1"<redacted>"'),
+    ]
+
+def redact_url(url):
+    """ Return url with any credentials replaced by a placeholder """
+
+    for pattern, replacement in _REDACT_PATTERNS:
+        url = pattern.sub(replacement, url)
+    return url
+
+class Lazy:
+    ''' Log message argument which is only evaluated if the record is emitted
+
+        logging only formats a message's arguments when a handler actually
+        emits the record, so wrapping an expensive call in Lazy means it
+        costs nothing when the log level is disabled, eg:
+
+            logger.debug("Response:\n%s", Lazy(pformat, response_body))
+    '''
+
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+class Trace:
+    ''' A single traced API request, created by Tracer.start '''
+
+    def __init__(self, tracer, method, url, sensitive, endpoint=None, params=None):
+        self.tracer = tracer
+        self.method = method
+        self.url = url
+        self.sensitive = sensitive
+        self.start = time.monotonic()
+        self.status_code = None
+        self.size = 0
+        self.elapsed = None
+        self.call = None
+        if tracer.stats is not None:
+            self.call = tracer.stats.begin(method, endpoint, params, url)
+
+    def response(self, status_code, text=None, size=None):
+        """ Record the response to the request
+
+        Args:
+            status_code (int): HTTP status code
+            text (string or Lazy): raw text of the response, dumped to
+                the trace directory if configured. Pass a Lazy to avoid
+                decoding the response when it isn't dumped.
+            size (int): size of the response in bytes, if text is not given
+        """
+
+        self.elapsed = time.monotonic() - self.start
+        self.status_code = status_code
+        if size is None:
+            size = len(str(text)) if text is not None else 0
+        self.size = size
+
+        logger.debug("HTTP %s %s -> %s, %d bytes in %.3fs",
+                     self.method, Lazy(redact_url, self.url), status_code, size, self.elapsed,
+                     extra={'api_method': self.method,
+                            'api_status': status_code,
+                            'api_bytes': size,
+                            'api_elapsed': self.elapsed})
+
+        if text is not None and not self.sensitive and self.tracer.dump_dir is not None:
+            self.tracer.dump(self, str(text))
+
+        if self.call is not None:
+            self.call.status_code = status_code
+            self.call.size = size
+            # Models built from a streamed response are built while it is
+            # being received
+            self.call.network = self.elapsed - self.call.build
+            self.call.end = time.monotonic()
+
+    def body(self, response_body):
+        """ Log the decoded response body, if debug logging is enabled
+
+        The response is decoded between response() and body(), which is
+        the decode time recorded for --stats.
+        """
+
+        if self.call is not None:
+            now = time.monotonic()
+            self.call.decode = now - self.call.end
+            self.call.end = now
+
+        if not self.sensitive:
+            logger.debug("Response:\n%s", Lazy(pformat, response_body))
+
+class Tracer:
+    ''' Tracing of the requests made by a Session
+
+        Each request logs one debug record with its method, URL (with any
+        credentials redacted), HTTP status, response size and latency. The
+        size and latency are also attached to the record as the
+        'api_bytes' and 'api_elapsed' attributes for use by log handlers.
+        All formatting is deferred until a handler emits the record, so
+        tracing costs next to nothing when debug logging is off.
+
+        Attributes:
+            dump_dir (string): If set, the raw text of each response is
+                written to a numbered file in this directory. Login
+                responses, which contain the session key, are never dumped.
+            stats (CallStats): If set, each request is also accounted for
+                in stats, see me4storage.api.stats
+    '''
+
+    def __init__(self, dump_dir=None, stats=None):
+        self.dump_dir = dump_dir
+        self.stats = stats
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+        if dump_dir is not None:
+            os.makedirs(dump_dir, mode=0o700, exist_ok=True)
+
+    def start(self, method, url, sensitive=False, endpoint=None, params=None):
+        """ Start tracing a request
+
+        Args:
+            method (string): HTTP method
+            url (string): request URL
+            sensitive (bool): True if the response contains credentials,
+                so must not be logged or dumped
+            endpoint (string): API endpoint of the request, and
+            params (dict): its parameters, used to group requests in stats
+        """
+        return Trace(self, method, url, sensitive, endpoint, params)
+
+    def dump(self, trace, text):
+        with self._lock:
+            sequence = next(self._sequence)
+        # Name files after the host and endpoint, so that sessions to
+        # several arrays can share a dump directory
+        request = redact_url(trace.url).split('://', 1)[-1].replace('/api/', '/', 1)
+        name = re.sub(r'[^A-Za-z0-9_.-]+', '_', request)[:120]
+        path = os.path.join(self.dump_dir, f'{name}-{sequence:05d}.json')
+        try:
+            with open(path, 'w') as dump_file:
+                dump_file.write(text)
+        except OSError as e:
+            logger.warning(f"Unable to write response to {path}: {e}")
@@ -0,0 +1,180 @@
+import logging
+import io
+import os
+import re
+import json
+import time
+import hashlib
+import tempfile
+import urllib.parse
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+
+from me4storage.common.exceptions import NotFoundError
+from me4storage.api.tracing import redact_url
+
+logger = logging.getLogger(__name__)
+
+# Session key substituted into recorded login responses, so that real
+# session keys are never written to fixtures
+REPLAY_SESSION_KEY = 'replay-session-key'
+
+class FixtureStore:
+    ''' Directory of recorded API responses
+
+        Each response is stored as a JSON file, keyed by the request URL
+        with any credentials redacted, under a sub-directory for each
+        array. The files are plain JSON, so fixtures can be inspected and
+        edited by hand, eg:
+
+            <directory>/me4-array01_443/show_disks_detail-1a2b3c4d.json
+
+        Attributes:
+            directory (string): Directory to store fixtures in
+    '''
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __str__(self):
+        return self.directory
+
+    @staticmethod
+    def key(url):
+        """ Key identifying a request, used to match replayed requests """
+
+        parsed = urllib.parse.urlsplit(redact_url(url))
+        path = urllib.parse.unquote(parsed.path)
+        if path.startswith('/api/'):
+            path = path[len('/api/'):]
+        return f"{parsed.netloc}/{path}"
+
+    def path(self, url):
+        key = self.key(url)
+        netloc, endpoint = key.split('/', 1)
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()[:8]
+        name = re.sub(r'[^A-Za-z0-9.-]+', '_', endpoint).strip('_')[:100]
+        return os.path.join(self.directory,
+                            re.sub(r'[^A-Za-z0-9.-]+', '_', netloc),
+                            f"{name}-{digest}.json")
+
+    def get(self, url):
+        """ Return the recorded fixture for url, or None """
+
+        try:
+            with open(self.path(url), 'r') as fixture_file:
+                return json.load(fixture_file)
+        except FileNotFoundError:
+            return None
+
+    def set(self, url, status_code, text, elapsed):
+        """ Record the response to url """
+
+        fixture = {
+            'url': self.key(url),
+            'status_code': status_code,
+            'elapsed': round(elapsed, 3),
+            }
+        # Store the decoded response where possible, so fixtures are
+        # readable, falling back to the raw text (eg: 'Success: ...')
+        try:
+            fixture['json'] = json.loads(text)
+        except ValueError:
+            fixture['text'] = text
+
+        path = self.path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as fixture_file:
+                json.dump(fixture, fixture_file, indent=2, sort_keys=True)
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+def _sanitise_login(text):
+    """ Replace the session key in a login response """
+
+    try:
+        response_body = json.loads(text)
+        for status in response_body.get('status', []):
+            status['response'] = REPLAY_SESSION_KEY
+        return json.dumps(response_body)
+    except (ValueError, AttributeError):
+        return text
+
+class RecordingAdapter(HTTPAdapter):
+    ''' requests transport adapter which records every response to a
+        FixtureStore, whilst talking to the array as normal
+    '''
+
+    def __init__(self, store, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+
+    def send(self, request, **kwargs):
+        start = time.monotonic()
+        response = super().send(request, **kwargs)
+        # Reading the content here means streamed responses are held in
+        # memory, which is acceptable whilst recording
+        text = response.content.decode('utf-8', errors='replace')
+        elapsed = time.monotonic() - start
+
+        if '/login/' in request.url:
+            text = _sanitise_login(text)
+        self.store.set(request.url, response.status_code, text, elapsed)
+        logger.debug("Recorded response for %s", FixtureStore.key(request.url))
+        return response
+
+class ReplayAdapter(BaseAdapter):
+    ''' requests transport adapter which serves responses from a
+        FixtureStore instead of talking to an array
+
+        Attributes:
+            store (FixtureStore): recorded responses to serve
+            latency (float or string): Seconds to wait before answering
+                each request, to simulate a real controller. If 'recorded',
+                wait as long as the request took when it was recorded.
+    '''
+
+    def __init__(self, store, latency=0, **kwargs):
+        # Accept, and ignore, any arguments for HTTPAdapter (eg: max_retries)
+        super().__init__()
+        self.store = store
+        self.latency = latency
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        fixture = self.store.get(request.url)
+        if fixture is None:
+            raise NotFoundError(f"No recorded response for {FixtureStore.key(request.url)} "
+                                f"in {self.store}")
+
+        if self.latency == 'recorded':
+            delay = fixture.get('elapsed', 0)
+        else:
+            delay = float(self.latency)
+        if delay > 0:
+            time.sleep(delay)
+
+        if 'json' in fixture:
+            text = json.dumps(fixture['json'])
+        else:
+            text = fixture.get('text', '')
+
+        response = requests.models.Response()
+        response.status_code = fixture.get('status_code', 200)
+        response.reason = 'OK' if response.status_code < 400 else 'Error'
+        content = text.encode('utf-8')
+        response.raw = io.BytesIO(content)
+        response._content = content
+        response._content_consumed = True
+        response.encoding = 'utf-8'
+        response.headers['Content-Type'] = 'application/json'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
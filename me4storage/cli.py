@@ -1,120 +1,92 @@
 import argparse
 import argcomplete
+import importlib
 import logging
 import configparser
 import colorama
+import os
 import sys
 import traceback
 
 from colorama import Fore, Style
-from collections import namedtuple
+from collections import namedtuple, OrderedDict
 
 from me4storage.common import util
 from me4storage.common.exceptions import UsageError
 from me4storage.common.nsca import CheckResult
+from me4storage.models.basemodel import Model
 
-from me4storage.api.session import Session
-from me4storage import commands
-from me4storage.commands import add, check, modify, show, configure
-from me4storage.commands import delete, save, update, restart, email, jira
+from me4storage import fleet
+from me4storage.api.session import open_sessions
 
-def cli():
+# Top level subcommands, in the order they are listed in the help. Maps the
+# subcommand name to (help, names of parent parsers, function adding its
+# arguments and subcommands to its parser). See subcommand()
+SUBCOMMANDS = OrderedDict()
 
-    # Parse configuration files present if any to get default values
-    # We make this parser with add_help=False so that
-    # it doesn't parse -h and print help.
-    conf_parser = argparse.ArgumentParser(
-        prog='me4cli',
-        description='CLI utility around ME4 API',
-        # Turn off help, so we print all options in response to -h
-        add_help=False,
-        )
-    conf_parser.add_argument(
-        '-f','--config-files',
-        nargs='?',
-        # Later files take precendence over earlier
-        default=['/etc/me4cli/me4cli.conf','.me4cli.conf'],
-        help="Tool configuration file location (default: %(default)s)"
-        )
-    conf_parser.add_argument('--debug',
-        action="store_true",
-        default=False,
-        dest='debug',
-        help='Enable debug output')
-    conf_parser.add_argument('--quiet',
-        action="store_true",
-        default=False,
-        dest='quiet',
-        help='Suppress all informational output, log at WARN level')
-    conf_parser.add_argument('--nocolour', '--nocolor',
-        action="store_true",
-        default=False,
-        dest='nocolour',
-        help='Strip ANSI color codes from all output to console')
-    args, remaining_argv = conf_parser.parse_known_args()
+class LazyCommand:
+    ''' Function implementing a subcommand, which is imported from its
+        module in me4storage.commands only when called.
 
-    # Set log level
-    logger = logging.getLogger()
-    logger.setLevel(logging.INFO)
-    # Set paramiko logger to WARNING level because paramiko logging is quite noisy
-    # for our purposes, with many things (like authentication banner) logged to
-    # level INFO, which I prefer not to see
-    logging.getLogger("paramiko").setLevel(logging.WARNING)
-    if args.quiet:
-        logger.setLevel(logging.WARN)
-    if args.debug:
-        logger.setLevel(logging.DEBUG)
-        logging.getLogger("paramiko").setLevel(logging.DEBUG)
+        Some command modules pull in heavy dependencies (eg: pysftp and
+        paramiko, jira, fuzzywuzzy), which a quick monitoring check such as
+        'check health' shouldn't pay for.
 
-    # Set up colorama
-    if args.nocolour:
-        util.configure_logging(logger,colour=False)
-        colorama.init(strip=True, autoreset=True)
-    else:
-        util.configure_logging(logger)
-        colorama.init(autoreset=True)
+        Attributes:
+            module (string): module name, relative to me4storage.commands
+            name (string): name of the function in the module
+    '''
 
-    # Set up configuration file if present
-    file_parser = configparser.SafeConfigParser()
-    config_files = file_parser.read(args.config_files)
-    conf_file_defaults = {}
-    if config_files:
-        logger.debug('Found configuration files: {}'.format(config_files))
-        for section_name in file_parser.sections():
-            logger.debug('Section: {}'.format(section_name))
-            logger.debug('  Options: {}'.format(file_parser.options(section_name)))
-            for name, value in file_parser.items(section_name):
-                logger.debug('  {} = {}'.format(name, value))
-                conf_file_defaults.update({name: value})
-    logger.debug("Config File options: {}".format(conf_file_defaults))
+    def __init__(self, module, name):
+        self.module = module
+        self.name = name
 
-    # Create the rest of the parser inheriting from the conf_parser above
-    # with all remaining arguments
-    parser = argparse.ArgumentParser(
-        parents=[conf_parser],
-        )
-    # Create list to store all subparsers so we can iterate over these
-    # to apply command defaults from config
-    subparsers = []
+    def resolve(self):
+        module = importlib.import_module(f'me4storage.commands.{self.module}')
+        return getattr(module, self.name)
 
-    # Define command line interface
-    # Set up subparses for the subcommands
-    subcommands = parser.add_subparsers(dest='subcommands',
-                                        title='subcommands',
-                                        description='''
-        Below are the core subcommands of program:''')
-    subcommands.required = True
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self):
+        return f"LazyCommand('{self.module}', '{self.name}')"
+
+def subcommand(name, help, parents=()):
+    """ Register a function adding the arguments and subcommands of the
+    top level subcommand 'name' to its parser.
+
+    The function is called with the subcommand's parser, the list of
+    subparsers to apply config file defaults to, and the common parent
+    parsers (auth_p, email_p, jira_p) as keyword arguments. It is only
+    called if the subcommand is selected on the command line, or when
+    completing the command line in the shell.
+
+    Args:
+        name (string): name of the subcommand
+        help (string): help text of the subcommand
+        parents (tuple): names of common parsers to use as parents of the
+            subcommand's parser, eg: ('auth_p',)
+    """
+
+    def register(build):
+        SUBCOMMANDS[name] = (help, parents, build)
+        return build
+    return register
+
+def _common_parsers(subparsers):
+    """ Parsers of the arguments shared by many subcommands, used as
+    parents of the subcommand parsers """
 
-    #########
-    # COMMON Arguments
-    #########
     auth_p = argparse.ArgumentParser(add_help=False)
     subparsers.append(auth_p)
     auth_group = auth_p.add_argument_group('Authentication')
     auth_group.add_argument(
                 '-H','--api-host',
-                default='localhost',
-                help="Controller hostname/IP"
+                dest='api_hosts',
+                action='append',
+                default=None,
+                help="Controller hostname/IP. May be given multiple times "
+                     "to run against several arrays concurrently"
                 )
     auth_group.add_argument(
                 '--secondary-host',
@@ -145,6 +117,94 @@ def cli():
                 action='store_true',
                 help="API disable TLS certificate verification"
                 )
+    auth_group.add_argument(
+                '--api-token-cache',
+                action='store_true',
+                help="Cache API session tokens on disk, and reuse them "
+                     "across invocations until they expire"
+                )
+    auth_group.add_argument(
+                '--api-token-cache-dir',
+                default=None,
+                help="Directory to cache API session tokens in "
+                     "(default: ~/.cache/me4cli/tokens)"
+                )
+    auth_group.add_argument(
+                '--api-token-cache-ttl',
+                type=int,
+                default=1500,
+                help="Number of seconds to reuse a cached API session token "
+                     "for (default: %(default)s)"
+                )
+    auth_group.add_argument(
+                '--api-cache',
+                action='store_true',
+                help="Cache API responses for the duration of the command, "
+                     "to avoid fetching the same objects repeatedly"
+                )
+    auth_group.add_argument(
+                '--api-adaptive-timeouts',
+                action='store_true',
+                help="Record the response time of each API endpoint across "
+                     "invocations (in ~/.cache/me4cli/latency.json), and time "
+                     "out requests based on the endpoint's p99 response time"
+                )
+    auth_group.add_argument(
+                '--api-hedge',
+                action='store_true',
+                help="With --secondary-host, also send read-only requests "
+                     "which take longer than their endpoint's p95 response "
+                     "time to the other controller, using the first response. "
+                     "Implies --api-adaptive-timeouts"
+                )
+    auth_group.add_argument(
+                '--api-trace-dir',
+                default=None,
+                help="Write the raw text of every API response to a file in "
+                     "this directory, for debugging"
+                )
+    auth_group.add_argument(
+                '--api-record',
+                default=None,
+                metavar='DIR',
+                help="Record every API response as a fixture in this "
+                     "directory, for later use with --api-replay"
+                )
+    auth_group.add_argument(
+                '--api-replay',
+                default=None,
+                metavar='DIR',
+                help="Serve API responses from fixtures recorded with "
+                     "--api-record, instead of connecting to the array"
+                )
+    auth_group.add_argument(
+                '--api-replay-latency',
+                default='0',
+                help="Seconds to delay each replayed API response by, or "
+                     "'recorded' to use the recorded response times "
+                     "(default: %(default)s)"
+                )
+    auth_group.add_argument(
+                '--plan',
+                action='store_true',
+                help="Print the API requests and other changes the command "
+                     "would make, without making them. Read-only requests "
+                     "are still sent to the array"
+                )
+    fleet_group = auth_p.add_argument_group('Fleet')
+    fleet_group.add_argument(
+                '--inventory',
+                default=None,
+                help="File listing arrays to run against, one per line, as "
+                     "'<host> [<secondary-host>]'"
+                )
+    fleet_group.add_argument(
+                '--fleet-workers',
+                type=int,
+                default=8,
+                help="Maximum number of arrays to run against concurrently "
+                     "(default: %(default)s)"
+                )
 
 
     email_p = argparse.ArgumentParser(add_help=False)
@@ -207,14 +267,14 @@ def cli():
                 help='Jira issue type to create new issues as',
                 )
 
+    return dict(auth_p=auth_p, email_p=email_p, jira_p=jira_p)
 
-    ####################################################################
-    # CHECK subcommands
-    ####################################################################
+########################################################################
+# CHECK subcommands
+########################################################################
 
-    # Top level subcommand
-    check_p = subcommands.add_parser(name='check',
-        help='''check commands''')
+@subcommand('check', help='check commands')
+def _check_subcommands(check_p, subparsers, auth_p, **common):
     check_subcommands = check_p.add_subparsers(dest='check_subcommands',
         title='subcommands of check',description='''
         Below are the core subcommands of program:''')
@@ -224,26 +284,25 @@ def cli():
                     parents=[auth_p],
                     help='''check health status''')
     subparsers.append(check_health_p)
-    check_health_p.set_defaults(func=commands.check.health_status)
+    check_health_p.set_defaults(func=LazyCommand('check', 'health_status'))
 
     check_firmware_p = check_subcommands.add_parser(name='firmware',
                     parents=[auth_p],
                     help='''check firmware version''')
     subparsers.append(check_firmware_p)
-    check_firmware_p.set_defaults(func=commands.check.firmware_version)
+    check_firmware_p.set_defaults(func=LazyCommand('check', 'firmware_version'))
     check_firmware_p.add_argument(
                 '--firmware-version',
                 required=True,
                 help='Expected Firmware bundle version for controllers'
                 )
 
-    ####################################################################
-    # ADD subcommands
-    ####################################################################
+########################################################################
+# ADD subcommands
+########################################################################
 
-    # Top level subcommand
-    add_p = subcommands.add_parser(name='add',
-        help='''add commands''')
+@subcommand('add', help='add commands')
+def _add_subcommands(add_p, subparsers, auth_p, **common):
     add_subcommands = add_p.add_subparsers(dest='add_subcommands',
         title='subcommands of add',description='''
         Below are the core subcommands of program:''')
@@ -253,7 +312,7 @@ def cli():
                     parents=[auth_p],
                     help='''add user''')
     subparsers.append(add_user_p)
-    add_user_p.set_defaults(func=commands.add.user)
+    add_user_p.set_defaults(func=LazyCommand('add', 'user'))
     add_user_p.add_argument(
                 '--username',
                 required=True,
@@ -288,13 +347,12 @@ def cli():
                 help="Sets the display of storage size to be either base2 or base10"
                 )
 
-    ####################################################################
-    # SET subcommands
-    ####################################################################
+########################################################################
+# SET subcommands
+########################################################################
 
-    # Top level subcommand
-    set_p = subcommands.add_parser(name='set',
-        help='''set commands''')
+@subcommand('set', help='set commands')
+def _set_subcommands(set_p, subparsers, auth_p, **common):
     set_subcommands = set_p.add_subparsers(dest='set_subcommands',
         title='subcommands of set',description='''
         Below are the core subcommands of program:''')
@@ -304,7 +362,7 @@ def cli():
                     parents=[auth_p],
                     help='''set system information (name, contact, desc)''')
     subparsers.append(set_system_info_p)
-    set_system_info_p.set_defaults(func=commands.modify.system_info)
+    set_system_info_p.set_defaults(func=LazyCommand('modify', 'system_info'))
     set_system_info_p.add_argument(
                 '--name',
                 dest='system_name',
@@ -334,7 +392,7 @@ def cli():
                     parents=[auth_p],
                     help='''set user parameters''')
     subparsers.append(set_user_p)
-    set_user_p.set_defaults(func=commands.modify.user)
+    set_user_p.set_defaults(func=LazyCommand('modify', 'user'))
     set_user_p.add_argument(
                 '--username',
                 required=True,
@@ -372,7 +430,7 @@ def cli():
                     parents=[auth_p],
                     help='''set ntp parameters''')
     subparsers.append(set_ntp_p)
-    set_ntp_p.set_defaults(func=commands.modify.ntp)
+    set_ntp_p.set_defaults(func=LazyCommand('modify', 'ntp'))
     set_ntp_p.add_argument(
                 '--status',
                 dest="status",
@@ -399,7 +457,7 @@ def cli():
                     parents=[auth_p],
                     help='''set dns parameters''')
     subparsers.append(set_dns_p)
-    set_dns_p.set_defaults(func=commands.modify.dns)
+    set_dns_p.set_defaults(func=LazyCommand('modify', 'dns'))
     set_dns_p.add_argument(
                 '--name-servers',
                 dest='name_servers',
@@ -421,7 +479,7 @@ def cli():
                     parents=[auth_p],
                     help='''set network parameters''')
     subparsers.append(set_network_p)
-    set_network_p.set_defaults(func=commands.modify.network)
+    set_network_p.set_defaults(func=LazyCommand('modify', 'network'))
     set_network_p.add_argument(
                 '--controller-a-ip',
                 required=True,
@@ -451,7 +509,7 @@ def cli():
                     parents=[auth_p],
                     help='''set support-assist on/off''')
     subparsers.append(set_support_assist_p)
-    set_support_assist_p.set_defaults(func=commands.modify.support_assist)
+    set_support_assist_p.set_defaults(func=LazyCommand('modify', 'support_assist'))
     set_support_assist_p.add_argument(
                 '--status',
                 required=True,
@@ -464,7 +522,7 @@ def cli():
                     parents=[auth_p],
                     help='''set email notification parameters''')
     subparsers.append(set_email_p)
-    set_email_p.set_defaults(func=commands.modify.email)
+    set_email_p.set_defaults(func=LazyCommand('modify', 'email'))
     set_email_p.add_argument(
                 '--domain',
                 required=True,
@@ -510,20 +568,19 @@ def cli():
                     parents=[auth_p],
                     help='''set advanced_settings notification parameters''')
     subparsers.append(set_advanced_settings_p)
-    set_advanced_settings_p.set_defaults(func=commands.modify.advanced_settings)
+    set_advanced_settings_p.set_defaults(func=LazyCommand('modify', 'advanced_settings'))
     set_advanced_settings_p.add_argument(
                 '--background-scrub-interval',
                 default=None,
                 help="Sets the interval in hours between background disk-group scrub"
                 )
 
-    ####################################################################
-    # SHOW subcommands
-    ####################################################################
+########################################################################
+# SHOW subcommands
+########################################################################
 
-    # Top level subcommand
-    show_p = subcommands.add_parser(name='show',
-        help='''show commands''')
+@subcommand('show', help='show commands')
+def _show_subcommands(show_p, subparsers, auth_p, **common):
     show_subcommands = show_p.add_subparsers(dest='show_subcommands',
         title='subcommands of show',description='''
         Below are the core subcommands of program:''')
@@ -533,31 +590,31 @@ def cli():
                     parents=[auth_p],
                     help='''show users''')
     subparsers.append(show_users_p)
-    show_users_p.set_defaults(func=commands.show.users)
+    show_users_p.set_defaults(func=LazyCommand('show', 'users'))
 
     show_system_info_p = show_subcommands.add_parser(name='system-info',
                     parents=[auth_p],
                     help='''show system information (name, contact, desc)''')
     subparsers.append(show_system_info_p)
-    show_system_info_p.set_defaults(func=commands.show.system_info)
+    show_system_info_p.set_defaults(func=LazyCommand('show', 'system_info'))
 
     show_network_p = show_subcommands.add_parser(name='network',
                     parents=[auth_p],
                     help='''show network information (IP, DNS, NTP)''')
     subparsers.append(show_network_p)
-    show_network_p.set_defaults(func=commands.show.network)
+    show_network_p.set_defaults(func=LazyCommand('show', 'network'))
 
     show_notifications_p = show_subcommands.add_parser(name='notifications',
                     parents=[auth_p],
                     help='''show notifications information (email, SNMP, ...)''')
     subparsers.append(show_notifications_p)
-    show_notifications_p.set_defaults(func=commands.show.notifications)
+    show_notifications_p.set_defaults(func=LazyCommand('show', 'notifications'))
 
     show_storage_p = show_subcommands.add_parser(name='storage',
                     parents=[auth_p],
                     help='''show storage information ''')
     subparsers.append(show_storage_p)
-    show_storage_p.set_defaults(func=commands.show.storage)
+    show_storage_p.set_defaults(func=LazyCommand('show', 'storage'))
     show_storage_p.add_argument(
                 '--detailed',
                 action='store_true',
@@ -568,13 +625,13 @@ def cli():
                     parents=[auth_p],
                     help='''show hosts information ''')
     subparsers.append(show_hosts_p)
-    show_hosts_p.set_defaults(func=commands.show.hosts)
+    show_hosts_p.set_defaults(func=LazyCommand('show', 'hosts'))
 
     show_mappings_p = show_subcommands.add_parser(name='mappings',
                     parents=[auth_p],
                     help='''show mappings information ''')
     subparsers.append(show_mappings_p)
-    show_mappings_p.set_defaults(func=commands.show.mappings)
+    show_mappings_p.set_defaults(func=LazyCommand('show', 'mappings'))
     show_mappings_p.add_argument(
                 '--ansible-dm-multipath',
                 action='store_true',
@@ -586,13 +643,13 @@ def cli():
                     parents=[auth_p],
                     help='''show svc tag information ''')
     subparsers.append(show_svc_tag_p)
-    show_svc_tag_p.set_defaults(func=commands.show.svc_tag)
+    show_svc_tag_p.set_defaults(func=LazyCommand('show', 'svc_tag'))
 
     show_disks_p = show_subcommands.add_parser(name='disks',
                     parents=[auth_p],
                     help='''show disks information ''')
     subparsers.append(show_disks_p)
-    show_disks_p.set_defaults(func=commands.show.disks)
+    show_disks_p.set_defaults(func=LazyCommand('show', 'disks'))
     show_disks_p.add_argument(
                 '--detailed',
                 action='store_true',
@@ -603,14 +660,14 @@ def cli():
                     parents=[auth_p],
                     help='''show versions information ''')
     subparsers.append(show_versions_p)
-    show_versions_p.set_defaults(func=commands.show.versions)
+    show_versions_p.set_defaults(func=LazyCommand('show', 'versions'))
 
     show_certificates_p = show_subcommands.add_parser(name='certificates',
                     aliases=['certificate'],
                     parents=[auth_p],
                     help='''show certificates information ''')
     subparsers.append(show_certificates_p)
-    show_certificates_p.set_defaults(func=commands.show.certificates)
+    show_certificates_p.set_defaults(func=LazyCommand('show', 'certificates'))
     show_certificates_p.add_argument(
                 '--detailed',
                 action='store_true',
@@ -618,19 +675,17 @@ def cli():
                 )
 
     show_configuration_p = show_subcommands.add_parser(name='configuration',
-                    aliases=['certificate'],
                     parents=[auth_p],
                     help='''show configuration information ''')
     subparsers.append(show_configuration_p)
-    show_configuration_p.set_defaults(func=commands.show.configuration)
+    show_configuration_p.set_defaults(func=LazyCommand('show', 'configuration'))
 
-    ####################################################################
-    # CONFIGURE subcommands
-    ####################################################################
+########################################################################
+# CONFIGURE subcommands
+########################################################################
 
-    # Top level subcommand
-    configure_p = subcommands.add_parser(name='configure',
-        help='''configure commands''')
+@subcommand('configure', help='configure commands')
+def _configure_subcommands(configure_p, subparsers, auth_p, **common):
     configure_subcommands = configure_p.add_subparsers(dest='configure_subcommands',
         title='subcommands of configure',description='''
         Below are the core subcommands of program:''')
@@ -649,7 +704,7 @@ def cli():
                          '''layout for Lustre OSTs - Provisions 8x 10-disk '''
                          '''Linear Raid6 volumes with a 1MiB stripe-width.''')
     subparsers.append(me4084_linear_layout_p)
-    me4084_linear_layout_p.set_defaults(func=commands.configure.disk_layout_me4084_linear_raid6)
+    me4084_linear_layout_p.set_defaults(func=LazyCommand('configure', 'disk_layout_me4084_linear_raid6'))
 
     me4024_linear_layout_p = layout_subcommands.add_parser(name='me4024-linear-raid10',
                     parents=[auth_p],
@@ -657,7 +712,7 @@ def cli():
                          '''layout for Lustre MDTs - Provisions 2x 10-disk '''
                          '''Linear raid10 volumes''')
     subparsers.append(me4024_linear_layout_p)
-    me4024_linear_layout_p.set_defaults(func=commands.configure.disk_layout_me4024_linear_raid10)
+    me4024_linear_layout_p.set_defaults(func=LazyCommand('configure', 'disk_layout_me4024_linear_raid10'))
 
     me4024_virtual_layout_p = layout_subcommands.add_parser(name='me4024-virtual-raid10',
                     parents=[auth_p],
@@ -665,7 +720,7 @@ def cli():
                          '''layout for Lustre MDTs - Provisions 2x 10-disk '''
                          '''virtual raid10 volumes''')
     subparsers.append(me4024_virtual_layout_p)
-    me4024_virtual_layout_p.set_defaults(func=commands.configure.disk_layout_me4024_virtual_raid10)
+    me4024_virtual_layout_p.set_defaults(func=LazyCommand('configure', 'disk_layout_me4024_virtual_raid10'))
     me4024_virtual_layout_p.add_argument(
                 '--mdt-size',
                 type=int,
@@ -683,7 +738,7 @@ def cli():
                     parents=[auth_p],
                     help='''show hosts information ''')
     subparsers.append(configure_host_p)
-    configure_host_p.set_defaults(func=commands.configure.host)
+    configure_host_p.set_defaults(func=LazyCommand('configure', 'host'))
     configure_host_p.add_argument(
                 '--host-group',
                 default=None,
@@ -705,7 +760,7 @@ def cli():
                     parents=[auth_p],
                     help='''configure volume mappings''')
     subparsers.append(configure_mapping_p)
-    configure_mapping_p.set_defaults(func=commands.configure.mapping)
+    configure_mapping_p.set_defaults(func=LazyCommand('configure', 'mapping'))
     configure_mapping_g = configure_mapping_p.add_mutually_exclusive_group(required=True)
     configure_mapping_g.add_argument(
                 '--all',
@@ -719,13 +774,34 @@ def cli():
                 help="Name of host-group to map volumes to."
                 )
 
-    ####################################################################
-    # DELETE subcommands
-    ####################################################################
+########################################################################
+# APPLY subcommand
+########################################################################
+
+@subcommand('apply',
+            help='''bring the array to the state described in a YAML or '''
+                 '''JSON spec, making only the changes required''',
+            parents=('auth_p',))
+def _apply_subcommands(apply_p, subparsers, **common):
+    subparsers.append(apply_p)
+    apply_p.set_defaults(func=LazyCommand('apply', 'apply'))
+    apply_p.add_argument(
+                'spec',
+                help="YAML or JSON file describing the desired state of the array"
+                )
+    apply_p.add_argument(
+                '--prune',
+                action='store_true',
+                help="Delete pools and host groups which are not in the spec. "
+                     "Use with --plan to check what would be deleted first"
+                )
+
+########################################################################
+# DELETE subcommands
+########################################################################
 
-    # Top level subcommand
-    delete_p = subcommands.add_parser(name='delete',
-        help='''delete commands''')
+@subcommand('delete', help='delete commands')
+def _delete_subcommands(delete_p, subparsers, auth_p, **common):
     delete_subcommands = delete_p.add_subparsers(dest='delete_subcommands',
         title='subcommands of delete',description='''
         Below are the core subcommands of program:''')
@@ -735,19 +811,19 @@ def cli():
                     parents=[auth_p],
                     help='''Delete all configuration, including storage''')
     subparsers.append(delete_configuration_p)
-    delete_configuration_p.set_defaults(func=commands.delete.configuration)
+    delete_configuration_p.set_defaults(func=LazyCommand('delete', 'configuration'))
 
     delete_host_configuration_p = delete_subcommands.add_parser(name='host-configuration',
                     parents=[auth_p],
                     help='''Delete all host configuration''')
     subparsers.append(delete_host_configuration_p)
-    delete_host_configuration_p.set_defaults(func=commands.delete.host_configuration)
+    delete_host_configuration_p.set_defaults(func=LazyCommand('delete', 'host_configuration'))
 
     delete_pool_p = delete_subcommands.add_parser(name='pool',
                     parents=[auth_p],
                     help='''Delete pool''')
     subparsers.append(delete_pool_p)
-    delete_pool_p.set_defaults(func=commands.delete.pool)
+    delete_pool_p.set_defaults(func=LazyCommand('delete', 'pool'))
 
     delete_pool_g = delete_pool_p.add_mutually_exclusive_group(required=True)
     delete_pool_g.add_argument(
@@ -769,7 +845,7 @@ def cli():
                     parents=[auth_p],
                     help='''Delete host group''')
     subparsers.append(delete_host_group_p)
-    delete_host_group_p.set_defaults(func=commands.delete.host_group)
+    delete_host_group_p.set_defaults(func=LazyCommand('delete', 'host_group'))
     delete_host_group_p.add_argument(
                 '--delete-hosts',
                 action='store_true',
@@ -798,7 +874,7 @@ def cli():
                     parents=[auth_p],
                     help='''Delete volume mapping''')
     subparsers.append(delete_mapping_p)
-    delete_mapping_p.set_defaults(func=commands.delete.mapping)
+    delete_mapping_p.set_defaults(func=LazyCommand('delete', 'mapping'))
     delete_mapping_volumes_g = delete_mapping_p.add_mutually_exclusive_group(required=True)
     delete_mapping_volumes_g.add_argument(
                 '--volume',
@@ -823,13 +899,12 @@ def cli():
                 help="Name of host-group to un-map volumes from"
                 )
 
-    ####################################################################
-    # SAVE subcommands
-    ####################################################################
+########################################################################
+# SAVE subcommands
+########################################################################
 
-    # Top level subcommand
-    save_p = subcommands.add_parser(name='save',
-        help='''save commands''')
+@subcommand('save', help='save commands')
+def _save_subcommands(save_p, subparsers, auth_p, **common):
     save_subcommands = save_p.add_subparsers(dest='save_subcommands',
         title='subcommands of save',description='''
         Below are the core subcommands of program:''')
@@ -839,7 +914,7 @@ def cli():
                     parents=[auth_p],
                     help='''save logs''')
     subparsers.append(save_logs_p)
-    save_logs_p.set_defaults(func=commands.save.logs)
+    save_logs_p.set_defaults(func=LazyCommand('save', 'logs'))
     save_logs_p.add_argument(
                 '--output-dir',
                 default=None,
@@ -851,13 +926,12 @@ def cli():
                 help="Name of output file to save logs to"
                 )
 
-    ####################################################################
-    # UPDATE subcommands
-    ####################################################################
+########################################################################
+# UPDATE subcommands
+########################################################################
 
-    # Top level subcommand
-    update_p = subcommands.add_parser(name='update',
-        help='''update commands''')
+@subcommand('update', help='update commands')
+def _update_subcommands(update_p, subparsers, auth_p, **common):
     update_subcommands = update_p.add_subparsers(dest='update_subcommands',
         title='subcommands of update',description='''
         Below are the core subcommands of program:''')
@@ -867,7 +941,7 @@ def cli():
                     parents=[auth_p],
                     help='''update controller-firmware''')
     subparsers.append(update_firmware_p)
-    update_firmware_p.set_defaults(func=commands.update.firmware)
+    update_firmware_p.set_defaults(func=LazyCommand('update', 'firmware'))
 
     update_firmware_p.add_argument(
                 '--force',
@@ -881,12 +955,23 @@ def cli():
                 'controller firmewarZipfile, or extracted .bin file '
                 'containing ME4 controller firmware'
                 )
+    update_firmware_p.add_argument(
+                '--wait',
+                action='store_true',
+                help='Wait until both controllers report the new firmware bundle',
+                )
+    update_firmware_p.add_argument(
+                '--wait-timeout',
+                type=int,
+                default=3600,
+                help='Seconds to wait for the update with --wait (default: %(default)s)',
+                )
 
     update_disk_firmware_p = update_subcommands.add_parser(name='disk-firmware',
                     parents=[auth_p],
                     help='''update disk-firmware''')
     subparsers.append(update_disk_firmware_p)
-    update_disk_firmware_p.set_defaults(func=commands.update.disk_firmware)
+    update_disk_firmware_p.set_defaults(func=LazyCommand('update', 'disk_firmware'))
 
     update_disk_firmware_p.add_argument(
                 '--force',
@@ -909,7 +994,7 @@ def cli():
                     parents=[auth_p],
                     help='''update controller TLS certificate''')
     subparsers.append(update_certificate_p)
-    update_certificate_p.set_defaults(func=commands.update.certificate)
+    update_certificate_p.set_defaults(func=LazyCommand('update', 'certificate'))
     update_certificate_p.add_argument(
                 '--tls-certificate', '--certificate',
                 required=True,
@@ -920,14 +1005,20 @@ def cli():
                 required=True,
                 help='TLS RSA key',
                 )
+    update_certificate_p.add_argument(
+                '--wait-timeout',
+                type=int,
+                default=900,
+                help='Seconds to wait for the management controllers to '
+                'restart with the new certificate (default: %(default)s)',
+                )
 
-    ####################################################################
-    # EMAIL subcommands
-    ####################################################################
+########################################################################
+# EMAIL subcommands
+########################################################################
 
-    # Top level subcommand
-    email_parser_p = subcommands.add_parser(name='email',
-        help='''email commands''')
+@subcommand('email', help='email commands')
+def _email_subcommands(email_parser_p, subparsers, auth_p, email_p, **common):
     email_subcommands = email_parser_p.add_subparsers(dest='email_subcommands',
         title='subcommands of email',description='''
         Below are the core subcommands of program:''')
@@ -937,15 +1028,14 @@ def cli():
                     parents=[auth_p, email_p],
                     help='''email logs''')
     subparsers.append(email_logs_p)
-    email_logs_p.set_defaults(func=commands.email.logs)
+    email_logs_p.set_defaults(func=LazyCommand('email', 'logs'))
 
-    ####################################################################
-    # JIRA subcommands
-    ####################################################################
+########################################################################
+# JIRA subcommands
+########################################################################
 
-    # Top level subcommand
-    jira_parser_p = subcommands.add_parser(name='jira',
-        help='''jira commands''')
+@subcommand('jira', help='jira commands')
+def _jira_subcommands(jira_parser_p, subparsers, auth_p, jira_p, **common):
     jira_subcommands = jira_parser_p.add_subparsers(dest='jira_subcommands',
         title='subcommands of jira',description='''
         Below are the core subcommands of program:''')
@@ -955,15 +1045,14 @@ def cli():
                     parents=[auth_p, jira_p],
                     help='''jira logs''')
     subparsers.append(jira_logs_p)
-    jira_logs_p.set_defaults(func=commands.jira.logs)
+    jira_logs_p.set_defaults(func=LazyCommand('jira', 'logs'))
 
-    ####################################################################
-    # RESTART subcommands
-    ####################################################################
+########################################################################
+# RESTART subcommands
+########################################################################
 
-    # Top level subcommand
-    restart_p = subcommands.add_parser(name='restart',
-        help='''restart commands''')
+@subcommand('restart', help='restart commands')
+def _restart_subcommands(restart_p, subparsers, auth_p, **common):
     restart_subcommands = restart_p.add_subparsers(dest='restart_subcommands',
         title='subcommands of restart',description='''
         Below are the core subcommands of program:''')
@@ -973,12 +1062,199 @@ def cli():
                     parents=[auth_p],
                     help='''restart management-controllers''')
     subparsers.append(restart_controller_p)
-    restart_controller_p.set_defaults(func=commands.restart.management_controllers)
+    restart_controller_p.set_defaults(func=LazyCommand('restart', 'management_controllers'))
     restart_controller_p.add_argument(
                 '--controller',
                 choices=['A','B','0','1'],
                 help='Choose controller to restart (if not set, will restart both)',
                 )
+    restart_controller_p.add_argument(
+                '--wait',
+                action='store_true',
+                help='Wait until the management controllers are ready again',
+                )
+    restart_controller_p.add_argument(
+                '--wait-timeout',
+                type=int,
+                default=900,
+                help='Seconds to wait for the management controllers with '
+                '--wait (default: %(default)s)',
+                )
+
+########################################################################
+# EXPORTER subcommand
+########################################################################
+
+@subcommand('exporter',
+            help='''run a Prometheus exporter daemon, serving metrics '''
+                 '''polled from the array''',
+            parents=('auth_p',))
+def _exporter_subcommands(exporter_p, subparsers, **common):
+    subparsers.append(exporter_p)
+    # Runs until stopped, see the checks in cli()
+    exporter_p.set_defaults(func=LazyCommand('exporter', 'serve'), daemon=True)
+    exporter_p.add_argument(
+                '--listen-address',
+                default='127.0.0.1',
+                help='Address to serve metrics on (default: %(default)s)',
+                )
+    exporter_p.add_argument(
+                '--listen-port',
+                type=int,
+                default=9846,
+                help='Port to serve metrics on (default: %(default)s)',
+                )
+    exporter_p.add_argument(
+                '--system-interval',
+                type=int,
+                default=60,
+                help='Seconds between polls of system health (default: %(default)s)',
+                )
+    exporter_p.add_argument(
+                '--disks-interval',
+                type=int,
+                default=300,
+                help='Seconds between polls of disks (default: %(default)s)',
+                )
+    exporter_p.add_argument(
+                '--disk-groups-interval',
+                type=int,
+                default=120,
+                help='Seconds between polls of disk groups (default: %(default)s)',
+                )
+    exporter_p.add_argument(
+                '--pools-interval',
+                type=int,
+                default=120,
+                help='Seconds between polls of pools (default: %(default)s)',
+                )
+    exporter_p.add_argument(
+                '--volumes-interval',
+                type=int,
+                default=300,
+                help='Seconds between polls of volumes (default: %(default)s)',
+                )
+
+def cli():
+
+    # Parse configuration files present if any to get default values
+    # We make this parser with add_help=False so that
+    # it doesn't parse -h and print help.
+    conf_parser = argparse.ArgumentParser(
+        prog='me4cli',
+        description='CLI utility around ME4 API',
+        # Turn off help, so we print all options in response to -h
+        add_help=False,
+        )
+    conf_parser.add_argument(
+        '-f','--config-files',
+        nargs='?',
+        # Later files take precendence over earlier
+        default=['/etc/me4cli/me4cli.conf','.me4cli.conf'],
+        help="Tool configuration file location (default: %(default)s)"
+        )
+    conf_parser.add_argument('--debug',
+        action="store_true",
+        default=False,
+        dest='debug',
+        help='Enable debug output')
+    conf_parser.add_argument('--quiet',
+        action="store_true",
+        default=False,
+        dest='quiet',
+        help='Suppress all informational output, log at WARN level')
+    conf_parser.add_argument('--nocolour', '--nocolor',
+        action="store_true",
+        default=False,
+        dest='nocolour',
+        help='Strip ANSI color codes from all output to console')
+    conf_parser.add_argument('--strict-models',
+        action="store_true",
+        default=False,
+        dest='strict_models',
+        help='Check every API response contains all attributes of its model, '
+             'rather than only those used by the command')
+    conf_parser.add_argument('--stats',
+        action="store_true",
+        default=False,
+        dest='stats',
+        help='Print a summary of the API calls made by the command on stderr: '
+             'calls, HTTP status, bytes and time per endpoint, and the time '
+             'spent rendering')
+    args, remaining_argv = conf_parser.parse_known_args()
+
+    # Set log level
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+    # Set paramiko logger to WARNING level because paramiko logging is quite noisy
+    # for our purposes, with many things (like authentication banner) logged to
+    # level INFO, which I prefer not to see
+    logging.getLogger("paramiko").setLevel(logging.WARNING)
+    if args.quiet:
+        logger.setLevel(logging.WARN)
+    if args.debug:
+        logger.setLevel(logging.DEBUG)
+        logging.getLogger("paramiko").setLevel(logging.DEBUG)
+
+    if args.strict_models:
+        Model.strict = True
+
+    if args.stats:
+        from me4storage.api.stats import build_timer
+        Model.build_timer = build_timer
+
+    # Set up colorama
+    if args.nocolour:
+        util.configure_logging(logger,colour=False)
+        colorama.init(strip=True, autoreset=True)
+    else:
+        util.configure_logging(logger)
+        colorama.init(autoreset=True)
+
+    # Set up configuration file if present
+    file_parser = configparser.SafeConfigParser()
+    config_files = file_parser.read(args.config_files)
+    conf_file_defaults = {}
+    if config_files:
+        logger.debug('Found configuration files: {}'.format(config_files))
+        for section_name in file_parser.sections():
+            logger.debug('Section: {}'.format(section_name))
+            logger.debug('  Options: {}'.format(file_parser.options(section_name)))
+            for name, value in file_parser.items(section_name):
+                logger.debug('  {} = {}'.format(name, value))
+                conf_file_defaults.update({name: value})
+    logger.debug("Config File options: {}".format(conf_file_defaults))
+
+    # Create the rest of the parser inheriting from the conf_parser above
+    # with all remaining arguments
+    parser = argparse.ArgumentParser(
+        parents=[conf_parser],
+        )
+    # Create list to store all subparsers so we can iterate over these
+    # to apply command defaults from config
+    subparsers = []
+
+    # Define command line interface
+    # Set up subparses for the subcommands
+    subcommands = parser.add_subparsers(dest='subcommands',
+                                        title='subcommands',
+                                        description='''
+        Below are the core subcommands of program:''')
+    subcommands.required = True
+
+    # Building the parsers of every subcommand takes a large part of our
+    # startup time, so only the parsers of the selected subcommand are
+    # built. Shell completion (argcomplete sets _ARGCOMPLETE) needs them all.
+    common = _common_parsers(subparsers)
+    selected = next((arg for arg in remaining_argv if arg in SUBCOMMANDS), None)
+    build_all = '_ARGCOMPLETE' in os.environ
+    for name, (help_text, parent_names, build) in SUBCOMMANDS.items():
+        if build_all or name == selected:
+            subcommand_p = subcommands.add_parser(name=name, help=help_text,
+                                parents=[common[parent] for parent in parent_names])
+            build(subcommand_p, subparsers, **common)
+        else:
+            subcommands.add_parser(name=name, help=help_text)
 
     #########
     # PARSE arguments
@@ -997,13 +1273,23 @@ def cli():
 
     # Run subcommand function
     try:
-
-        session = Session(host = args.api_host,
-                          port = args.api_port,
-                          username = args.api_username,
-                          password = args.api_password,
-                          verify = False if args.api_disable_tls_verification else True)
-        rc = args.func(args, session)
+        arrays = fleet.resolve_arrays(args)
+        if getattr(args, 'daemon', False):
+            # A daemon listens on a fixed port and handles signals, which
+            # only the main thread can, so it serves one array. --stats
+            # would account for every poll for as long as it runs
+            if len(arrays) > 1:
+                raise UsageError("exporter serves a single array, run an exporter per array")
+            if getattr(args, 'stats', False):
+                raise UsageError("--stats cannot be used with exporter")
+        if len(arrays) > 1:
+            # Fleet mode, run the subcommand against every array concurrently
+            rc = fleet.run(args, arrays, workers=args.fleet_workers)
+        else:
+            host, secondary_host = next(iter(arrays))
+            args = fleet.array_args(args, host, secondary_host)
+            with fleet.create_session(args) as session:
+                rc = fleet.run_command(args, session)
     except Exception as e:
         # Print traceback if debug flag enabled
         if args.debug:
@@ -1012,6 +1298,8 @@ def cli():
         # Print exception message and return error
         logger.error("Exception {}: {}".format(e.__class__.__name__, e))
         sys.exit(CheckResult.CRITICAL.value)
+    finally:
+        logger.debug(f"Management controller sessions still open: {open_sessions()}")
 
     sys.exit(rc)
 
@@ -0,0 +1,444 @@
+import logging
+import json
+import os
+from functools import partial
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+from me4storage.common.exceptions import UsageError
+from me4storage.common.nsca import CheckResult
+from me4storage.api.gather import gather
+from me4storage.api import show, modify, create, add, delete
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of independent changes in flight at once, within a stage
+APPLY_WORKERS = 4
+
+# Changes are applied in stages, so that objects exist before anything
+# referring to them is created. Network changes come last, since changing
+# the address of the controller we are talking to ends the session.
+STAGES = (
+    'settings',
+    'unmap',
+    'disk-groups',
+    'volumes',
+    'initiators',
+    'hosts',
+    'host-groups',
+    'mappings',
+    'network',
+    )
+
+# Hosts which aren't in a host group are reported as the members of this
+# host group, which isn't a real one, so is never pruned
+UNGROUPED_HOST_GROUP = '-ungrouped-'
+
+SECTIONS = ('system', 'users', 'ntp', 'dns', 'email', 'network', 'disk_groups',
+            'volumes', 'hosts', 'host_groups', 'mappings')
+
+class Change:
+    ''' A single API call required to bring the array to the desired state
+
+        Attributes:
+            stage (string): One of STAGES, determining the order changes
+                are applied in
+            description (string): Human readable summary of the change
+            call (callable): Makes the change, called as call(session)
+    '''
+
+    def __init__(self, stage, description, call):
+        self.stage = stage
+        self.description = description
+        self.call = call
+
+    def __str__(self):
+        return self.description
+
+def _stringify(value):
+    # Values are sent to the array as strings in the request URL, so
+    # numbers in the spec (eg: 'lun: 2', 'chunk_size: 128') become strings
+    if isinstance(value, dict):
+        return {key: _stringify(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_stringify(item) for item in value]
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return value
+
+def load_spec(path):
+    """ Load a desired state spec from a YAML or JSON file """
+
+    with open(path, 'r') as spec_file:
+        text = spec_file.read()
+
+    if os.path.splitext(path)[1].lower() == '.json':
+        spec = json.loads(text)
+    else:
+        if yaml is None:
+            raise ImportError("YAML specs require the 'pyyaml' package. "
+                              "Install it with: pip install me4storage[yaml], "
+                              "or provide the spec as JSON")
+        spec = yaml.safe_load(text)
+
+    if not isinstance(spec, dict):
+        raise UsageError(f"Spec {path} must be a mapping of section names to settings")
+    unknown = set(spec) - set(SECTIONS)
+    if unknown:
+        raise UsageError(f"Unknown sections in spec {path}: {', '.join(sorted(unknown))}. "
+                         f"Expected: {', '.join(SECTIONS)}")
+    return _stringify(spec)
+
+def _differs(current, desired):
+    return str(current).strip().lower() != str(desired).strip().lower()
+
+def _list(value):
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+    return [str(item) for item in value]
+
+def _wwpn(wwpn):
+    # Remove leading '0x' if present, as in 'configure host'
+    wwpn = str(wwpn).strip()
+    return wwpn[2:] if wwpn.startswith('0x') else wwpn
+
+def fetch_state(session, spec):
+    """ Fetch the current state of everything the spec refers to, with
+    one request per object type, issued concurrently
+    """
+
+    calls = {}
+    if 'system' in spec:
+        calls['system'] = show.system
+    if 'users' in spec:
+        calls['users'] = show.users
+    if 'ntp' in spec:
+        calls['ntp'] = show.ntp_status
+    if 'dns' in spec:
+        calls['dns'] = show.dns
+    if 'email' in spec:
+        calls['email'] = show.email_parameters
+    if 'network' in spec:
+        calls['network'] = show.network_parameters
+    if 'disk_groups' in spec:
+        calls['disk_groups'] = show.disk_groups
+        calls['pools'] = show.pools
+    if 'volumes' in spec or 'mappings' in spec:
+        calls['volumes'] = show.volumes
+    if 'hosts' in spec or 'host_groups' in spec or 'mappings' in spec:
+        calls['initiators'] = show.initiators
+        calls['host_groups'] = show.host_groups
+    if 'mappings' in spec:
+        calls['mappings'] = show.host_group_mappings
+
+    results = gather(session, *calls.values())
+    return dict(zip(calls.keys(), results))
+
+def _system_changes(desired, state):
+    system = state['system'][0]
+    fields = {
+        'name': system.system_name,
+        'contact': system.system_contact,
+        'info': system.system_information,
+        'location': system.system_location,
+        }
+    changed = {field: desired[field] for field, current in fields.items()
+               if field in desired and _differs(current, desired[field])}
+    if changed:
+        yield Change('settings', f"Set system {', '.join(f'{k}={v}' for k, v in changed.items())}",
+                     partial(modify.system_info, **changed))
+
+def _user_changes(desired_users, state):
+    users = {user.username: user for user in state['users']}
+    for desired in desired_users:
+        name = desired['name']
+        roles = _list(desired['roles']) if 'roles' in desired else None
+        if name not in users:
+            if 'password' not in desired:
+                raise UsageError(f"User {name} does not exist, so a password is required")
+            yield Change('settings', f"Create user {name}",
+                         partial(create.user, name=name, password=desired['password'],
+                                 roles=roles, timeout=desired.get('timeout')))
+            continue
+
+        # Passwords cannot be read back, so are only set on creation
+        user = users[name]
+        changed = {}
+        if roles is not None and sorted(_list(user.roles)) != sorted(roles):
+            changed['roles'] = roles
+        if 'timeout' in desired and _differs(user.timeout, desired['timeout']):
+            changed['timeout'] = desired['timeout']
+        if changed:
+            yield Change('settings', f"Modify user {name}: {', '.join(changed)}",
+                         partial(modify.user, name=name, **changed))
+
+def _ntp_changes(desired, state):
+    ntp_status = state['ntp'][0]
+    changed = {}
+    if 'status' in desired:
+        current = 'enabled' if ntp_status.ntp_status == 'activated' else 'disabled'
+        if _differs(current, desired['status']):
+            changed['status'] = desired['status']
+    if 'server' in desired and _differs(ntp_status.ntp_server_address, desired['server']):
+        changed['ntp_server'] = desired['server']
+    if changed and 'timezone' in desired:
+        # The timezone is not reported by the array, so is only set along
+        # with other NTP changes
+        changed['timezone'] = desired['timezone']
+    if changed:
+        yield Change('settings', f"Set NTP {', '.join(f'{k}={v}' for k, v in changed.items())}",
+                     partial(modify.ntp, **changed))
+
+def _dns_changes(desired, state):
+    name_servers = _list(desired.get('name_servers', []))
+    search_domains = _list(desired.get('search_domains', []))
+    for dns in state['dns']:
+        if (('name_servers' in desired and _list(dns.name_servers) != name_servers)
+                or ('search_domains' in desired and _list(dns.search_domains) != search_domains)):
+            yield Change('settings', f"Set DNS name servers: {','.join(name_servers)}, "
+                                     f"search domains: {','.join(search_domains)}",
+                         partial(modify.dns, controller='both',
+                                 name_servers=name_servers if 'name_servers' in desired else None,
+                                 search_domains=search_domains if 'search_domains' in desired else None))
+            return
+
+def _email_changes(desired, state):
+    email = state['email'][0]
+    fields = {
+        'domain': email.email_domain,
+        'server': email.email_server,
+        'sender': email.email_sender,
+        'port': email.email_smtp_port,
+        'security_protocol': email.email_security_protocol,
+        'notification_level': email.email_notification_filter,
+        }
+    changed = {field: desired[field] for field, current in fields.items()
+               if field in desired and _differs(current, desired[field])}
+    if 'recipients' in desired:
+        current = [address for address in (email.email_notify_address_1,
+                                           email.email_notify_address_2,
+                                           email.email_notify_address_3,
+                                           email.email_notify_address_4) if address]
+        if current != _list(desired['recipients']):
+            changed['recipients'] = _list(desired['recipients'])
+    if changed:
+        yield Change('settings', f"Set email parameters: {', '.join(changed)}",
+                     partial(modify.email, **changed))
+
+def _network_changes(desired, state, session_host):
+    changes = []
+    for port in state['network']:
+        controller = port.durable_id.split('_')[-1].lower()
+        ip = desired.get(f'controller_{controller}_ip')
+        changed = {}
+        if ip is not None and _differs(port.ip_address, ip):
+            changed['ip'] = ip
+        if 'gateway' in desired and _differs(port.gateway, desired['gateway']):
+            changed['gateway'] = desired['gateway']
+        if 'netmask' in desired and _differs(port.subnet_mask, desired['netmask']):
+            changed['netmask'] = desired['netmask']
+        if changed:
+            change = Change('network',
+                            f"Set controller {controller} network "
+                            f"{', '.join(f'{k}={v}' for k, v in changed.items())}",
+                            partial(modify.network, controller=controller, **changed))
+            # Change the controller we are connected to last, as that ends
+            # our session
+            if port.ip_address == session_host:
+                changes.append(change)
+            else:
+                changes.insert(0, change)
+    return changes
+
+def _disk_group_changes(desired_groups, state, prune=False):
+    existing = {dg.name for dg in state['disk_groups']}
+    for desired in desired_groups:
+        name = desired['name']
+        if name in existing:
+            continue
+        disks = desired['disks'] if isinstance(desired['disks'], str) else ','.join(desired['disks'])
+        level = desired.get('level', 'raid6')
+        if desired.get('type', 'linear') == 'virtual':
+            call = partial(create.virtual_disk_group, name=name, disks=disks,
+                           raid_level=level, pool=desired['pool'])
+        else:
+            call = partial(create.linear_disk_group, name=name, disks=disks, raid_level=level,
+                           assigned_controller=desired.get('assigned_to', 'auto'),
+                           chunk_size=desired.get('chunk_size'),
+                           spare_disks=desired.get('spare_disks'))
+        yield Change('disk-groups', f"Create disk group {name}, disks: {disks}, level: {level}", call)
+
+    if prune:
+        desired_pools = {desired.get('pool', desired['name']) for desired in desired_groups}
+        unwanted = [pool.name for pool in state['pools'] if pool.name not in desired_pools]
+        if unwanted:
+            yield Change('unmap', f"Delete pools {','.join(unwanted)}, and their volumes",
+                         partial(delete.pools, names=unwanted))
+
+def _volume_changes(desired_volumes, state):
+    existing = {volume.volume_name for volume in state['volumes']}
+    for desired in desired_volumes:
+        name = desired['name']
+        if name in existing:
+            continue
+        if 'pool' in desired:
+            call = partial(create.virtual_volume, name=name, pool=desired['pool'], size=desired['size'])
+            location = f"pool {desired['pool']}"
+        else:
+            call = partial(create.linear_volume, name=name, disk_group=desired['disk_group'],
+                           size=desired['size'])
+            location = f"disk group {desired['disk_group']}"
+        yield Change('volumes', f"Create volume {name}, of size {desired['size']} on {location}", call)
+
+def _host_changes(desired_hosts, state):
+    initiators = {initiator.id: initiator for initiator in state['initiators']}
+    existing = {host.name for host_group in state['host_groups'] for host in host_group.hosts}
+    for desired in desired_hosts:
+        name = desired['name']
+        wwpns = [_wwpn(wwpn) for wwpn in _list(desired.get('initiators', []))]
+        for index, wwpn in enumerate(wwpns):
+            if wwpn not in initiators:
+                raise UsageError(f"Initiator {wwpn} of host {name} is not discovered by storage")
+            # Initiators are required to be named before adding to a host
+            nickname = f"{name}-P{index}"
+            if initiators[wwpn].nickname != nickname:
+                yield Change('initiators', f"Set initiator nickname {nickname} to {wwpn}",
+                             partial(modify.initiator, initiator_id=wwpn, nickname=nickname))
+        if name not in existing:
+            yield Change('hosts', f"Create host {name}, initiators: {','.join(wwpns)}",
+                         partial(create.host, name=name, initiators=wwpns))
+
+def _host_group_changes(desired_groups, state, prune=False):
+    existing = {host_group.name: {host.name for host in host_group.hosts}
+                for host_group in state['host_groups']}
+    for desired in desired_groups:
+        name = desired['name']
+        hosts = _list(desired.get('hosts', []))
+        if name not in existing:
+            yield Change('host-groups', f"Create host group {name}, hosts: {','.join(hosts)}",
+                         partial(create.host_group, name=name, hosts=hosts))
+            continue
+        missing = [host for host in hosts if host not in existing[name]]
+        if missing:
+            yield Change('host-groups', f"Add {','.join(missing)} to host group {name}",
+                         partial(add.host_group_members, name=name, hosts=missing))
+
+    if prune:
+        desired_names = {desired['name'] for desired in desired_groups}
+        unwanted = [name for name in existing
+                    if name not in desired_names and name != UNGROUPED_HOST_GROUP]
+        if unwanted:
+            yield Change('unmap', f"Delete host groups {','.join(unwanted)}, and their hosts",
+                         partial(delete.host_groups, names=unwanted, delete_hosts=True))
+
+def _mapping_changes(desired_mappings, state):
+    current = {}
+    for view in state['mappings']:
+        # Group names are given with the host and initiator wildcards,
+        # eg: 'hg1.*.*'
+        host_group = view.group_name.split('.')[0]
+        for mapping in view.host_view_mappings:
+            current[(host_group, mapping.volume)] = (mapping.lun, mapping.access)
+
+    # Mappings to the same host group with the same access can be made in
+    # a single request, for runs of consecutive LUNs
+    pending = {}
+    for desired in desired_mappings:
+        host_group = desired['host_group']
+        volume = desired['volume']
+        lun = str(desired['lun'])
+        access = desired.get('access', 'read-write')
+        existing = current.get((host_group, volume))
+        if existing == (lun, access):
+            continue
+        if existing is not None:
+            yield Change('unmap', f"Unmap volume {volume} from host group {host_group}, "
+                                  f"currently LUN {existing[0]}",
+                         partial(delete.mapping, volumes=[volume], initiators=[f"{host_group}.*.*"]))
+        pending.setdefault((host_group, access), []).append((volume, lun))
+
+    for (host_group, access), assignments in pending.items():
+        for volumes, lun in create.mapping_batches(assignments):
+            yield Change('mappings', f"Map volumes {','.join(volumes)} to host group "
+                                     f"{host_group}, LUN {lun} onwards, {access}",
+                         partial(create.mapping, volumes=volumes, initiators=[f"{host_group}.*.*"],
+                                 lun=str(lun), access=access))
+
+def plan(spec, state, session_host=None, prune=False):
+    """ Compute the changes needed to bring the array from state to spec
+
+    Returns:
+        list of Change, ordered by stage
+    """
+
+    changes = []
+    if 'system' in spec:
+        changes.extend(_system_changes(spec['system'], state))
+    if 'users' in spec:
+        changes.extend(_user_changes(spec['users'], state))
+    if 'ntp' in spec:
+        changes.extend(_ntp_changes(spec['ntp'], state))
+    if 'dns' in spec:
+        changes.extend(_dns_changes(spec['dns'], state))
+    if 'email' in spec:
+        changes.extend(_email_changes(spec['email'], state))
+    if 'disk_groups' in spec:
+        changes.extend(_disk_group_changes(spec['disk_groups'], state, prune=prune))
+    if 'volumes' in spec:
+        changes.extend(_volume_changes(spec['volumes'], state))
+    if 'hosts' in spec:
+        changes.extend(_host_changes(spec['hosts'], state))
+    if 'host_groups' in spec:
+        changes.extend(_host_group_changes(spec['host_groups'], state, prune=prune))
+    if 'mappings' in spec:
+        changes.extend(_mapping_changes(spec['mappings'], state))
+    if 'network' in spec:
+        changes.extend(_network_changes(spec['network'], state, session_host))
+
+    # sort() is stable, so changes keep their order within each stage
+    changes.sort(key=lambda change: STAGES.index(change.stage))
+    return changes
+
+def apply(args, session):
+    """ Bring the array to the state described by a YAML or JSON spec
+
+    The current state is fetched once, compared against the spec, and only
+    the calls needed to reconcile any differences are made. With --plan,
+    the changes are recorded in the plan rather than made, and the result
+    is WARNING if there are any.
+    """
+
+    spec = load_spec(args.spec)
+    state = fetch_state(session, spec)
+    changes = plan(spec, state, session_host=session.host, prune=args.prune)
+
+    if not changes:
+        logger.info("Array already matches spec. Nothing to do...")
+        rc = CheckResult.OK
+        return rc.value
+
+    for stage in STAGES:
+        stage_changes = [change for change in changes if change.stage == stage]
+        if not stage_changes:
+            continue
+        for change in stage_changes:
+            logger.info(f"{change}...")
+        if stage == 'network':
+            # Applied one at a time, in order, as each may end our session
+            for change in stage_changes:
+                change.call(session)
+        else:
+            gather(session, *[change.call for change in stage_changes],
+                   max_workers=APPLY_WORKERS)
+
+    if session.plan is not None:
+        logger.info(f"{len(changes)} change(s) required")
+        rc = CheckResult.WARNING
+        return rc.value
+
+    logger.info(f"Applied {len(changes)} change(s)")
+    rc = CheckResult.OK
+    return rc.value
@@ -14,14 +14,17 @@ import me4storage.formatters as formatters
 import me4storage.common.formatters
 
 from me4storage.api import show
+from me4storage.api.gather import gather
 
 logger = logging.getLogger(__name__)
 
 def health_status(args, session):
 
-    system = next(iter(show.system(session)))
-    disks = show.disks(session)
-    service_tags = show.service_tag_info(session)
+    systems, disks, service_tags = gather(session,
+                                          show.system,
+                                          show.disks,
+                                          show.service_tag_info)
+    system = next(iter(systems))
 
     if system.health == 'OK':
         rc = CheckResult.OK
@@ -38,8 +41,8 @@ def firmware_version(args, session):
     expected_version = args.firmware_version
 
     rc = CheckResult.OK
-    system = next(iter(show.system(session)))
-    versions = show.versions(session)
+    systems, versions = gather(session, show.system, show.versions)
+    system = next(iter(systems))
 
     print(f"{Fore.WHITE}{Style.BRIGHT}System: {system.system_name}{Style.RESET_ALL}")
 
@@ -5,6 +5,7 @@ from terminaltables import SingleTable
 from pprint import pformat
 import datetime
 import re
+from functools import partial
 
 from me4storage.api.session import Session
 from me4storage.common.exceptions import ApiError
@@ -14,10 +15,32 @@ import me4storage.common.tables as tables
 import me4storage.common.formatters
 
 from me4storage.api import show, modify, create, add
+from me4storage.api.gather import gather
 from me4storage import commands
 
 logger = logging.getLogger(__name__)
 
+# Maximum number of 'map/volume' requests in flight at once. Configuration
+# changes are serialised by the management controller, so little is gained
+# from more than a few
+MAPPING_WORKERS = 4
+
+# Size given to volumes created on new disk groups when planning, as the
+# size of a disk group is only known once it has been created
+PLANNED_SIZE = '<disk-group-size>'
+
+def _new_disk_groups(session, names):
+    """ Return (name, size) of each disk group just created, to create
+    volumes on
+
+    When planning, the disk groups have not really been created, so can't be
+    read back from the array.
+    """
+
+    if session.plan is not None:
+        return [(name, PLANNED_SIZE) for name in names]
+    return [(dg.name, dg.size) for dg in show.disk_groups(session)]
+
 def disk_layout_me4084_linear_raid6(args, session):
     """ Fully configure empty ME4084 into typical disk configuration for Lustre OSTs
 
@@ -57,6 +80,7 @@ def disk_layout_me4084_linear_raid6(args, session):
     drawer_1_start_id = 44
     drawer_1_end_id = 84
 
+    dg_names = []
     for i in range(0,8):
         start_id = drawer_0_start_id + i
         drawer_0_disks=list(range(start_id, drawer_0_end_id, 8))
@@ -80,16 +104,15 @@ def disk_layout_me4084_linear_raid6(args, session):
                                  disks=",".join(disk_ids),
                                  chunk_size="128",
                                  raid_level="raid6")
+        dg_names.append(dg_name)
 
-    disk_groups = show.disk_groups(session)
-    for dg in disk_groups:
-        volume_name = re.sub(r'^dg([0-9]+\-.*)',r'v\1',dg.name)
-        volume_size = dg.size
+    for dg_name, volume_size in _new_disk_groups(session, dg_names):
+        volume_name = re.sub(r'^dg([0-9]+\-.*)',r'v\1',dg_name)
         logger.info(f"""Creating volume: {volume_name}, of size """
-                    f"""{volume_size} on disk group: {dg.name}""")
+                    f"""{volume_size} on disk group: {dg_name}""")
         create.linear_volume(session,
                              name=volume_name,
-                             disk_group=dg.name,
+                             disk_group=dg_name,
                              size=volume_size)
 
     rc = CheckResult.OK
@@ -170,15 +193,13 @@ def disk_layout_me4024_linear_raid10(args, session):
                                  chunk_size="64",
                                  raid_level="raid10")
 
-    disk_groups = show.disk_groups(session)
-    for dg in disk_groups:
-        volume_name = re.sub(r'^dg([0-9]+\-.*)',r'v\1',dg.name)
-        volume_size = dg.size
+    for dg_name, volume_size in _new_disk_groups(session, [dg1_name, dg2_name]):
+        volume_name = re.sub(r'^dg([0-9]+\-.*)',r'v\1',dg_name)
         logger.info(f"""Creating volume: {volume_name}, of size """
-                    f"""{volume_size} on disk group: {dg.name}""")
+                    f"""{volume_size} on disk group: {dg_name}""")
         create.linear_volume(session,
                              name=volume_name,
-                             disk_group=dg.name,
+                             disk_group=dg_name,
                              size=volume_size)
 
     rc = CheckResult.OK
@@ -270,8 +291,6 @@ def disk_layout_me4024_virtual_raid10(args, session):
     modify.pool(session, pool='A', overcommit=False)
     modify.pool(session, pool='B', overcommit=False)
 
-    disk_groups = show.disk_groups(session)
-
     logger.info(f"""Creating volume: v1-{system_name}, of size """
                 f"""{mdt_size}GiB on pool A""")
     create.virtual_volume(session, f"v1-{system_name}", pool='A', size=f"{mdt_size}GiB")
@@ -358,17 +377,46 @@ def mapping(args, session):
 
     volumes = show.volumes(session)
 
-    for index, volume in enumerate(volumes):
-        # Define LUN number. LUN 1 is reserved for the chassis itself
-        lun_number = index+2
-        logger.info(f"Mapping volume: {volume.volume_name}, LUN "
-                    f"{lun_number} to initiators: {initiators}")
-        create.mapping(session,
-                       access="read-write",
-                       initiators=initiators,
-                       lun=str(lun_number),
-                       volumes=[volume.volume_name])
+    # Define LUN numbers. LUN 1 is reserved for the chassis itself
+    assignments = [(volume.volume_name, index+2) for index, volume in enumerate(volumes)]
+
+    # Runs of consecutive LUNs are mapped in a single request, and any
+    # remaining requests are independent of each other, so run concurrently
+    calls = []
+    for batch_volumes, lun_number in create.mapping_batches(assignments):
+        logger.info(f"Mapping volumes: {','.join(batch_volumes)}, LUN "
+                    f"{lun_number} onwards to initiators: {initiators}")
+        calls.append(partial(create.mapping,
+                             access="read-write",
+                             initiators=initiators,
+                             lun=str(lun_number),
+                             volumes=batch_volumes))
+    gather(session, *calls, max_workers=MAPPING_WORKERS)
+
+    if session.plan is not None:
+        # The mappings were only recorded, so there is nothing to check
+        rc = CheckResult.OK
+        return rc.value
 
+    # Check every volume was mapped as expected, with a single request
+    if args.all_initiators:
+        mapped = {view.volume_name: [mapping.lun for mapping in view.volume_view_mappings]
+                  for view in show.volume_mappings(session)}
+    else:
+        mapped = {}
+        for view in show.host_group_mappings(session):
+            # Group names are given with the host and initiator wildcards,
+            # eg: 'hg1.*.*'
+            if view.group_name.split('.')[0] == host_group:
+                for mapping in view.host_view_mappings:
+                    mapped.setdefault(mapping.volume, []).append(mapping.lun)
+
+    unmapped = [f"{volume} (LUN {lun})" for volume, lun in assignments
+                if str(lun) not in mapped.get(volume, [])]
+    if unmapped:
+        logger.error(f"Volumes not mapped as expected: {', '.join(unmapped)}")
+        rc = CheckResult.CRITICAL
+        return rc.value
 
     rc = CheckResult.OK
     return rc.value
@@ -54,15 +54,21 @@ Health Status:
 
 """
 
+    if session.plan is not None:
+        session.plan.record('SFTP GET', f"sftp://{args.api_host}:{args.sftp_port}/logs", filename)
+        session.plan.record('SMTP SEND', args.email_recipient, email_subject)
+        return CheckResult.OK.value
+
     # Generate temporary directory to store the log file before emailing it
     with tempfile.TemporaryDirectory() as tmpdirname:
         logfile = os.path.join(tmpdirname, filename)
 
-        sftp.save_logs(args.api_host,
-                       args.sftp_port,
-                       args.api_username,
-                       args.api_password,
-                       logfile)
+        stats = sftp.save_logs(args.api_host,
+                               args.sftp_port,
+                               args.api_username,
+                               args.api_password,
+                               logfile)
+        email_body += f"LOG BUNDLE SHA256: {stats.sha256}\n"
 
         util.send_email(args.email_sender,
                         args.email_recipient,
@@ -0,0 +1,290 @@
+import logging
+import signal
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from me4storage.common.nsca import CheckResult
+
+from me4storage.api import show
+
+logger = logging.getLogger(__name__)
+
+# Metric name -> (type, help text)
+METRICS = {
+    'me4_system_health': ('gauge', 'System health (0=OK, 1=Degraded, 2=Fault, 3=Unknown, 4=N/A)'),
+    'me4_system_unhealthy_components': ('gauge', 'Number of unhealthy components reported by the system'),
+    'me4_system_controller_status': ('gauge', 'Controller status, as the numeric value reported by the API (0=Operational)'),
+    'me4_system_other_mc_status': ('gauge', 'Status of the partner management controller, as the numeric value reported by the API'),
+    'me4_disk_health': ('gauge', 'Disk health (0=OK, 1=Degraded, 2=Fault, 3=Unknown, 4=N/A)'),
+    'me4_disk_size_bytes': ('gauge', 'Disk capacity in bytes'),
+    'me4_disk_temperature_celsius': ('gauge', 'Disk temperature in degrees Celsius'),
+    'me4_disk_ssd_life_left_percent': ('gauge', 'Percentage of SSD life remaining'),
+    'me4_disk_power_on_hours': ('counter', 'Disk power on hours'),
+    'me4_disk_group_health': ('gauge', 'Disk group health (0=OK, 1=Degraded, 2=Fault, 3=Unknown, 4=N/A)'),
+    'me4_disk_group_size_bytes': ('gauge', 'Disk group capacity in bytes'),
+    'me4_disk_group_freespace_bytes': ('gauge', 'Disk group free space in bytes'),
+    'me4_pool_health': ('gauge', 'Pool health (0=OK, 1=Degraded, 2=Fault, 3=Unknown, 4=N/A)'),
+    'me4_pool_total_size_bytes': ('gauge', 'Pool capacity in bytes'),
+    'me4_pool_total_avail_bytes': ('gauge', 'Pool available space in bytes'),
+    'me4_volume_health': ('gauge', 'Volume health (0=OK, 1=Degraded, 2=Fault, 3=Unknown, 4=N/A)'),
+    'me4_volume_size_bytes': ('gauge', 'Volume capacity in bytes'),
+    'me4_volume_allocated_size_bytes': ('gauge', 'Volume allocated size in bytes'),
+    'me4_exporter_poll_success': ('gauge', 'Whether the last poll of the API endpoint succeeded'),
+    'me4_exporter_poll_duration_seconds': ('gauge', 'Duration of the last poll of the API endpoint'),
+    'me4_exporter_poll_timestamp_seconds': ('gauge', 'Time of the last successful poll of the API endpoint'),
+    }
+
+# Value reported by the API for 'ssd-life-left-numeric' for spinning disks
+SSD_LIFE_NOT_APPLICABLE = 255
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _size_bytes(model, attr):
+    """ Sizes are reported by the API as a number of blocks """
+    return getattr(model, attr) * model.blocksize
+
+class MetricsStore:
+    ''' Thread-safe store of the latest samples from each poller
+
+        Each poller replaces its own set of samples wholesale after a
+        successful poll, so scrapes always see a consistent snapshot and
+        never have to wait on the array.
+    '''
+
+    def __init__(self):
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def update(self, source, samples):
+        with self._lock:
+            self._samples[source] = list(samples)
+
+    def render(self):
+        """ Render all samples in the Prometheus text exposition format """
+
+        with self._lock:
+            all_samples = [sample for samples in self._samples.values() for sample in samples]
+
+        by_name = {}
+        for name, labels, value in all_samples:
+            by_name.setdefault(name, []).append((labels, value))
+
+        output = []
+        for name in sorted(by_name):
+            metric_type, help_text = METRICS[name]
+            output.append(f"# HELP {name} {help_text}")
+            output.append(f"# TYPE {name} {metric_type}")
+            for labels, value in by_name[name]:
+                label_str = ",".join(f'{key}="{_escape_label(labels[key])}"' for key in sorted(labels))
+                output.append(f"{name}{{{label_str}}} {value}")
+
+        return "\n".join(output) + "\n"
+
+class Poller(threading.Thread):
+    ''' Background thread which polls a single API endpoint on a schedule
+        and converts the response into metric samples
+
+        Attributes:
+            name (string): Name of the endpoint being polled, used in the
+                exporter's own metrics
+            interval (int): Seconds between the start of each poll
+            poll (callable): Called with no arguments, returns a list of
+                (metric name, labels dict, value) samples
+            initial_delay (int): Seconds to wait before the first poll
+    '''
+
+    def __init__(self, name, interval, poll, store, stop_event, initial_delay=0):
+        super().__init__(name=f"poller-{name}", daemon=True)
+        self.endpoint = name
+        self.interval = interval
+        self.poll = poll
+        self.store = store
+        self.stop_event = stop_event
+        self.initial_delay = initial_delay
+        self.last_success = None
+
+    def run(self):
+        self.stop_event.wait(self.initial_delay)
+        while not self.stop_event.is_set():
+            start = time.monotonic()
+            try:
+                samples = self.poll()
+                success = 1
+                self.last_success = time.time()
+                self.store.update(self.endpoint, samples)
+            except Exception as e:
+                # Keep serving the last good samples, but flag the failure
+                logger.error(f"Failed to poll {self.endpoint}: {e.__class__.__name__}: {e}")
+                success = 0
+            duration = time.monotonic() - start
+
+            labels = {'endpoint': self.endpoint}
+            meta = [('me4_exporter_poll_success', labels, success),
+                    ('me4_exporter_poll_duration_seconds', labels, f"{duration:.3f}")]
+            if self.last_success is not None:
+                meta.append(('me4_exporter_poll_timestamp_seconds', labels, f"{self.last_success:.3f}"))
+            self.store.update(f"{self.endpoint}:meta", meta)
+
+            logger.debug(f"Polled {self.endpoint} in {duration:.3f}s")
+            self.stop_event.wait(max(0, self.interval - duration))
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+
+    store = None
+
+    def do_GET(self):
+        if self.path.split('?', 1)[0] == '/metrics':
+            body = self.store.render().encode('utf-8')
+            content_type = 'text/plain; version=0.0.4; charset=utf-8'
+            status = 200
+        elif self.path == '/':
+            body = b'<html><body><a href="/metrics">Metrics</a></body></html>\n'
+            content_type = 'text/html'
+            status = 200
+        else:
+            body = b'Not Found\n'
+            content_type = 'text/plain'
+            status = 404
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class Exporter:
+    ''' Prometheus exporter for a single ME4 array
+
+        Keeps a single API session open, and polls each endpoint from its
+        own background thread on an independent schedule. The HTTP server
+        answers scrapes from the latest polled samples held in memory, so
+        scraping never touches the array.
+    '''
+
+    def __init__(self, session, intervals):
+        self.session = session
+        self.intervals = intervals
+        self.store = MetricsStore()
+        self.stop_event = threading.Event()
+        self.system_name = ''
+
+    def _labels(self, **labels):
+        return dict(labels, system=self.system_name)
+
+    def poll_system(self):
+        samples = []
+        for system in show.system(self.session):
+            self.system_name = system.system_name
+            labels = self._labels()
+            samples.append(('me4_system_health', labels, system.health_numeric))
+            samples.append(('me4_system_unhealthy_components', labels, len(system.unhealthy_component)))
+            samples.append(('me4_system_other_mc_status', labels, system.other_mc_status_numeric))
+            for redundancy in system.redundancy:
+                samples.append(('me4_system_controller_status', self._labels(controller='A'),
+                                redundancy.controller_a_status_numeric))
+                samples.append(('me4_system_controller_status', self._labels(controller='B'),
+                                redundancy.controller_b_status_numeric))
+        return samples
+
+    def poll_disks(self):
+        samples = []
+        for disk in show.iter_disks(self.session):
+            labels = self._labels(location=disk.location,
+                                  serial=disk.serial_number,
+                                  disk_group=disk.disk_group)
+            samples.append(('me4_disk_health', labels, disk.health_numeric))
+            samples.append(('me4_disk_size_bytes', labels, _size_bytes(disk, 'size_numeric')))
+            samples.append(('me4_disk_temperature_celsius', labels, disk.temperature_numeric))
+            samples.append(('me4_disk_power_on_hours', labels, disk.power_on_hours))
+            if disk.ssd_life_left_numeric != SSD_LIFE_NOT_APPLICABLE:
+                samples.append(('me4_disk_ssd_life_left_percent', labels, disk.ssd_life_left_numeric))
+        return samples
+
+    def poll_disk_groups(self):
+        samples = []
+        for dg in show.disk_groups(self.session):
+            labels = self._labels(disk_group=dg.name, pool=dg.pool)
+            samples.append(('me4_disk_group_health', labels, dg.health_numeric))
+            samples.append(('me4_disk_group_size_bytes', labels, _size_bytes(dg, 'size_numeric')))
+            samples.append(('me4_disk_group_freespace_bytes', labels, _size_bytes(dg, 'freespace_numeric')))
+        return samples
+
+    def poll_pools(self):
+        samples = []
+        for pool in show.pools(self.session):
+            labels = self._labels(pool=pool.name)
+            samples.append(('me4_pool_health', labels, pool.health_numeric))
+            samples.append(('me4_pool_total_size_bytes', labels, _size_bytes(pool, 'total_size_numeric')))
+            samples.append(('me4_pool_total_avail_bytes', labels, _size_bytes(pool, 'total_avail_numeric')))
+        return samples
+
+    def poll_volumes(self):
+        samples = []
+        for volume in show.iter_volumes(self.session):
+            labels = self._labels(volume=volume.volume_name,
+                                  disk_group=volume.virtual_disk_name)
+            samples.append(('me4_volume_health', labels, volume.health_numeric))
+            samples.append(('me4_volume_size_bytes', labels, _size_bytes(volume, 'size_numeric')))
+            samples.append(('me4_volume_allocated_size_bytes', labels, _size_bytes(volume, 'allocated_size_numeric')))
+        return samples
+
+    def start(self):
+        # Poll the system once up front, so that all other metrics are
+        # labelled with the system name from the start
+        self.store.update('system', self.poll_system())
+
+        pollers = [('system', self.poll_system),
+                   ('disks', self.poll_disks),
+                   ('disk-groups', self.poll_disk_groups),
+                   ('pools', self.poll_pools),
+                   ('volumes', self.poll_volumes),
+                   ]
+        for name, poll in pollers:
+            initial_delay = self.intervals[name] if name == 'system' else 0
+            Poller(name, self.intervals[name], poll, self.store, self.stop_event,
+                   initial_delay=initial_delay).start()
+
+    def stop(self):
+        self.stop_event.set()
+
+def _terminate(signum, frame):
+    raise KeyboardInterrupt
+
+def serve(args, session):
+    """ Run a Prometheus exporter daemon for the array """
+
+    intervals = {
+        'system': args.system_interval,
+        'disks': args.disks_interval,
+        'disk-groups': args.disk_groups_interval,
+        'pools': args.pools_interval,
+        'volumes': args.volumes_interval,
+        }
+
+    exporter = Exporter(session, intervals)
+    exporter.start()
+
+    handler = type('MetricsRequestHandler', (_MetricsRequestHandler,), {'store': exporter.store})
+    server = _ThreadingHTTPServer((args.listen_address, int(args.listen_port)), handler)
+    signal.signal(signal.SIGTERM, _terminate)
+
+    logger.info(f"Serving metrics for {exporter.system_name} on "
+                f"http://{args.listen_address}:{args.listen_port}/metrics")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("Shutting down exporter...")
+    finally:
+        exporter.stop()
+        server.server_close()
+
+    return CheckResult.OK.value
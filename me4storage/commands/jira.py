@@ -53,6 +53,15 @@ Health Status:
 
 """
 
+    if session.plan is not None:
+        if args.jira_issue_id:
+            session.plan.record('JIRA COMMENT', f"{args.jira_server} {args.jira_issue_id}")
+        else:
+            session.plan.record('JIRA CREATE', f"{args.jira_server} {args.jira_project}", jira_summary)
+        session.plan.record('SFTP GET', f"sftp://{args.api_host}:{args.sftp_port}/logs", filename)
+        session.plan.record('JIRA ATTACH', args.jira_server, filename)
+        return CheckResult.OK.value
+
     try:
         jira = JIRA(basic_auth=(args.jira_user, args.jira_password), server=args.jira_server)
         logger.debug(f"Connection successful for user {args.jira_user}.")
@@ -81,7 +90,9 @@ Health Status:
                        args.api_password,
                        logfile)
 
-        jira.add_attachment(issue=issue, attachment=logfile)
+        # Pass an open file, which the upload reads from as it is sent
+        with open(logfile, 'rb') as logfile_obj:
+            jira.add_attachment(issue=issue, attachment=logfile_obj, filename=filename)
 
     rc = CheckResult.OK
     return rc.value
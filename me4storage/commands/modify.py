@@ -5,7 +5,6 @@ from terminaltables import SingleTable
 from pprint import pformat
 import datetime
 
-from me4storage.api.session import Session
 from me4storage.common.exceptions import ApiError
 from me4storage.common.nsca import CheckResult
 import me4storage.common.util as util
@@ -14,6 +13,7 @@ import me4storage.common.formatters
 
 from me4storage.api import show, modify
 from me4storage import commands
+import me4storage.commands.show
 
 logger = logging.getLogger(__name__)
 
@@ -103,23 +103,28 @@ def network(args, session):
     logger.info(f"Updated controller a ip: {args.controller_a_ip}")
     logger.warning("May take up to 2 minutes for updated network settings to dislay...")
     # Establish a new session here, since by changing the controller IP,
-    # we may have just broken our previous connection to the array
-    session = Session(host = args.controller_a_ip,
-                      port = args.api_port,
-                      username = args.api_username,
-                      password = args.api_password,
-                      verify = False if args.api_disable_tls_verification else True)
-
-    modify.network(session,
-                   controller='b',
-                   ip=args.controller_b_ip,
-                   gateway=args.gateway,
-                   netmask=args.netmask,
-                   )
-    logger.info(f"Updated controller b ip: {args.controller_b_ip}")
+    # we may have just broken our previous connection to the array.
+    # If we were using both controllers, carry on with controller B at the
+    # address it is about to be given, rather than its old one.
+    # Still try to log out of the previous session, as controller B is yet
+    # to be changed, and the management controller doesn't necessarily end
+    # sessions when its address changes
+    previous_session = session
+    session = session.clone(host = args.controller_a_ip,
+                            secondary_host = args.controller_b_ip if session.secondary_host else None)
+    previous_session.close()
+
+    with session:
+        modify.network(session,
+                       controller='b',
+                       ip=args.controller_b_ip,
+                       gateway=args.gateway,
+                       netmask=args.netmask,
+                       )
+        logger.info(f"Updated controller b ip: {args.controller_b_ip}")
 
-    logger.warning("May take up to 2 minutes for updated network settings to dislay...")
-    commands.show.network(args, session)
+        logger.warning("May take up to 2 minutes for updated network settings to dislay...")
+        commands.show.network(args, session)
 
     rc = CheckResult.OK
     return rc.value
@@ -6,7 +6,7 @@ from me4storage.common.nsca import CheckResult
 import me4storage.common.formatters
 import me4storage.formatters as formatters
 
-from me4storage.api import restart
+from me4storage.api import restart, ready
 
 logger = logging.getLogger(__name__)
 
@@ -21,4 +21,7 @@ def management_controllers(args, session):
 
     restart.mc(session, controller=controller)
 
+    if args.wait:
+        ready.wait_for_ready(session, deadline=args.wait_timeout).close()
+
     return CheckResult.OK.value
@@ -5,10 +5,10 @@ from terminaltables import SingleTable
 from pprint import pformat
 from datetime import datetime
 import os
-import pysftp
 import shutil
 
 from me4storage.api.session import Session
+import me4storage.api.sftp as sftp
 from me4storage.common.exceptions import ApiError
 from me4storage.common.nsca import CheckResult
 import me4storage.common.util as util
@@ -41,17 +41,15 @@ def logs(args, session):
 
     output_file = os.path.join(output_dir, filename)
 
-    cnopts = pysftp.CnOpts(knownhosts=os.path.expanduser(os.path.join('~','.ssh','known_hosts')))
-    cnopts.hostkeys = None
-    logger.info(f"Downloading log bundle from {args.api_host} to "
-                f"{output_file} ... This can take a few minutes.")
-    with pysftp.Connection(args.api_host,
-                      port=int(args.sftp_port),
-                      username=args.api_username,
-                      password=args.api_password,
-                      cnopts=cnopts,
-                      ) as sftp:
-        sftp.get(remotepath='/logs', localpath=output_file)
+    if session.plan is not None:
+        session.plan.record('SFTP GET', f"sftp://{args.api_host}:{args.sftp_port}/logs", output_file)
+        return CheckResult.OK.value
+
+    sftp.save_logs(args.api_host,
+                   args.sftp_port,
+                   args.api_username,
+                   args.api_password,
+                   output_file)
 
     rc = CheckResult.OK
     return rc.value
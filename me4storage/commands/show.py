@@ -5,6 +5,8 @@ from terminaltables import SingleTable
 from pprint import pformat
 import datetime
 import re
+from functools import partial
+from collections import defaultdict
 
 from me4storage.api.session import Session
 from me4storage.common.exceptions import ApiError
@@ -15,14 +17,14 @@ import me4storage.common.formatters
 import me4storage.formatters as formatters
 
 from me4storage.api import show
+from me4storage.api.gather import gather
 import me4storage.common.tables as tables
 
 logger = logging.getLogger(__name__)
 
 def users(args, session):
 
-    systems = show.system(session)
-    users = show.users(session)
+    systems, users = gather(session, show.system, show.users)
 
     for system in systems:
         print(f"{Fore.WHITE}{Style.BRIGHT}System: {system.system_name}{Style.RESET_ALL}")
@@ -66,8 +68,9 @@ def users(args, session):
 
 def system_info(args, session):
 
-    systems = show.system(session)
-    service_tags = show.service_tag_info(session)
+    systems, service_tags = gather(session,
+                                   show.system,
+                                   show.service_tag_info)
 
     rc = CheckResult.OK
     for system in systems:
@@ -94,11 +97,16 @@ def svc_tag(args, session):
 
 def network(args, session):
 
-    systems = show.system(session)
-    network_parameters = show.network_parameters(session)
-    ntp_instances = show.ntp_status(session)
-    dns_instances = show.dns(session)
-    hostnames = show.dns_management_hostname(session)
+    (systems,
+     network_parameters,
+     ntp_instances,
+     dns_instances,
+     hostnames) = gather(session,
+                         show.system,
+                         show.network_parameters,
+                         show.ntp_status,
+                         show.dns,
+                         show.dns_management_hostname)
 
     rc = CheckResult.OK
     for system in systems:
@@ -136,8 +144,9 @@ def network(args, session):
 
 def notifications(args, session):
 
-    systems = show.system(session)
-    email_params = show.email_parameters(session)
+    systems, email_params = gather(session,
+                                   show.system,
+                                   show.email_parameters)
 
     rc = CheckResult.OK
     for system in systems:
@@ -156,8 +165,24 @@ def notifications(args, session):
 
 def storage(args, session):
 
-    systems = show.system(session)
-    disk_groups = show.disk_groups(session, detail=True)
+    if args.detailed:
+        # Fetch all volumes and disks up front, rather than once per disk
+        # group, and index them by the name of the disk group they belong to
+        systems, disk_groups, all_volumes, all_disks = gather(session,
+                                                              show.system,
+                                                              partial(show.disk_groups, detail=True),
+                                                              show.volumes,
+                                                              show.disks)
+        volumes_by_disk_group = defaultdict(list)
+        for volume in all_volumes:
+            volumes_by_disk_group[volume.virtual_disk_name].append(volume)
+        disks_by_disk_group = defaultdict(list)
+        for disk in all_disks:
+            disks_by_disk_group[disk.disk_group].append(disk)
+    else:
+        systems, disk_groups = gather(session,
+                                      show.system,
+                                      partial(show.disk_groups, detail=True))
 
     for system in systems:
         print(f"{Fore.WHITE}{Style.BRIGHT}System: {system.system_name}{Style.RESET_ALL}")
@@ -175,7 +200,7 @@ def storage(args, session):
             #######################################
             # PRINT Table of Volumes
             print(f"\n{Fore.WHITE}{Style.BRIGHT}Volumes:{Style.RESET_ALL}")
-            volumes = show.volumes(session, disk_groups=[dg.name])
+            volumes = volumes_by_disk_group[dg.name]
             # List of columns to print, as a tuple of attribute name,
             # and column title
             columns = [('volume_name','Name'),
@@ -211,7 +236,7 @@ def storage(args, session):
             #######################################
             # PRINT Table of DISKs
             print(f"\n{Fore.WHITE}{Style.BRIGHT}Disks:{Style.RESET_ALL}")
-            disks = show.disks(session, disk_groups=[dg.name])
+            disks = disks_by_disk_group[dg.name]
 
             # List of columns to print, as a tuple of attribute name,
             # and column title
@@ -283,13 +308,6 @@ def storage(args, session):
 
 def disks(args, session):
 
-    systems = show.system(session)
-    disks = show.disks(session)
-
-    for system in systems:
-        print(f"{Fore.WHITE}{Style.BRIGHT}System: {system.system_name}{Style.RESET_ALL}")
-
-
     # List of columns to print, as a tuple of attribute name,
     # and column title
     columns = [('location','Location'),
@@ -306,22 +324,33 @@ def disks(args, session):
                ('rpm','RPM'),
                ('ssd_life_left','SSD Life %'),
                ]
+
+    def disk_rows(session):
+        # Disks are parsed from the response one at a time, so only the
+        # table rows are kept in memory, rather than every Disk object
+        table_rows = []
+        for disk in show.iter_disks(session):
+            row = []
+            for attribute, title in columns:
+                try:
+                    row.append(getattr(disk,attribute))
+                except AttributeError as err:
+                    raise ApiError("No attribute '{}' in disk "
+                                   "definition:\n{}".format(
+                                        attribute,
+                                        pformat(disk),
+                                        ))
+
+            table_rows.append(row)
+        return table_rows
+
+    systems, table_rows = gather(session, show.system, disk_rows)
+
+    for system in systems:
+        print(f"{Fore.WHITE}{Style.BRIGHT}System: {system.system_name}{Style.RESET_ALL}")
+
     # Extract titles for table header
     table_header = [x[1] for x in columns]
-    table_rows = []
-    for disk in disks:
-        row = []
-        for attribute, title in columns:
-            try:
-                row.append(getattr(disk,attribute))
-            except AttributeError as err:
-                raise ApiError("No attribute '{}' in disk "
-                               "definition:\n{}".format(
-                                    attribute,
-                                    pformat(disk),
-                                    ))
-
-        table_rows.append(row)
 
     # Print table
     tables.display_table(table_header, table_rows, style='bordered')
@@ -332,10 +361,10 @@ def disks(args, session):
 
 def hosts(args, session):
 
-    systems = show.system(session)
-
-    host_groups = show.host_groups(session)
-    initiators = show.initiators(session)
+    systems, host_groups, initiators = gather(session,
+                                              show.system,
+                                              show.host_groups,
+                                              show.initiators)
 
     for system in systems:
         print(f"{Fore.WHITE}{Style.BRIGHT}System: {system.system_name}{Style.RESET_ALL}")
@@ -413,9 +442,9 @@ def hosts(args, session):
 
 def mappings(args, session):
 
-    systems = show.system(session)
-
-    host_group_views = show.host_group_mappings(session)
+    systems, host_group_views = gather(session,
+                                       show.system,
+                                       show.host_group_mappings)
 
     for system in systems:
         print(f"{Fore.WHITE}{Style.BRIGHT}System: {system.system_name}{Style.RESET_ALL}")
@@ -488,9 +517,7 @@ def mappings(args, session):
 
 def versions(args, session):
 
-    systems = show.system(session)
-
-    versions = show.versions(session)
+    systems, versions = gather(session, show.system, show.versions)
 
     for system in systems:
         print(f"{Fore.WHITE}{Style.BRIGHT}System: {system.system_name}{Style.RESET_ALL}")
@@ -546,8 +573,10 @@ def versions(args, session):
     return rc.value
 
 def certificates(args, session):
-    system = next(iter(show.system(session)))
-    certificates = show.certificate(session, controller='both')
+    systems, certificates = gather(session,
+                                  show.system,
+                                  partial(show.certificate, controller='both'))
+    system = next(iter(systems))
 
     print(formatters.format_certificates(system, certificates, args.detailed))
 
@@ -556,12 +585,15 @@ def certificates(args, session):
 
 def configuration(args, session):
 
-    system = next(iter(show.system(session)))
-    service_tags = show.service_tag_info(session)
+    systems, service_tags, advanced_settings_list = gather(session,
+                                                           show.system,
+                                                           show.service_tag_info,
+                                                           show.advanced_settings)
+    system = next(iter(systems))
 
     print(formatters.format_system(system, service_tags))
 
-    advanced_settings = next(iter(show.advanced_settings(session)))
+    advanced_settings = next(iter(advanced_settings_list))
 
     print(formatters.format_advanced_settings(advanced_settings))
 
@@ -9,11 +9,9 @@ import time
 import re
 import tempfile
 from zipfile import ZipFile
-import pysftp
 
 from fuzzywuzzy import fuzz
 
-from me4storage.api.session import Session
 from me4storage.common.exceptions import ApiError
 from me4storage.common.nsca import CheckResult
 import me4storage.common.util as util
@@ -21,7 +19,8 @@ import me4storage.common.tables as tables
 import me4storage.common.formatters
 import me4storage.formatters as formatters
 
-from me4storage.api import show, check, restart
+from me4storage.api import show, check, restart, ready
+import me4storage.api.sftp as sftp
 import me4storage.common.tables as tables
 
 logger = logging.getLogger(__name__)
@@ -107,19 +106,21 @@ def firmware(args, session):
             bundle_version = match.group('bundle_version')
 
             logger.info(f"Uploading firmware version: {bundle_version}")
-            cnopts = pysftp.CnOpts(knownhosts=os.path.expanduser(os.path.join('~','.ssh','known_hosts')))
-            cnopts.hostkeys = None
-            with pysftp.Connection(args.api_host,
-                              port=int(args.sftp_port),
-                              username=args.api_username,
-                              password=args.api_password,
-                              cnopts=cnopts,
-                              ) as sftp:
-                sftp.put(firmware_path, remotepath="/flash", confirm=False)
+            if session.plan is not None:
+                session.plan.record('SFTP PUT', f"sftp://{args.api_host}:{args.sftp_port}/flash",
+                                    firmware_file)
+            else:
+                with sftp.ConnectionPool(args.sftp_port, args.api_username, args.api_password) as pool:
+                    pool.put(args.api_host, firmware_path, "/flash")
 
             logger.info("Upload complete. Firmware update happens asynchronously in the background. "
                         "Update can take from 10-20 minutes to complete.")
 
+    if args.wait:
+        # Track the update until both controllers run the new bundle, so
+        # the next array is only started once this one is done
+        ready.wait_for_firmware(session, bundle_version, deadline=args.wait_timeout).close()
+
     return CheckResult.OK.value
 
 def disk_firmware(args, session):
@@ -250,23 +251,23 @@ def disk_firmware(args, session):
                     return CheckResult.OK.value
 
             logger.info(f"Updating all disks with new firmware versions...")
-            for entry in updateable_firmware_files:
-                logger.info(f"Extracting firmware file to {tmpdirname}/{entry.get('firmware_file')}")
-                firmware_path = zipobj.extract(entry.get('firmware_file'), path=tmpdirname)
-
-                logger.info(f"Uploading firmware version: {entry.get('new_version')}")
-                cnopts = pysftp.CnOpts(knownhosts=os.path.expanduser(os.path.join('~','.ssh','known_hosts')))
-                cnopts.hostkeys = None
-                with pysftp.Connection(args.api_host,
-                                  port=int(args.sftp_port),
-                                  username=args.api_username,
-                                  password=args.api_password,
-                                  cnopts=cnopts,
-                                  ) as sftp:
-                    sftp.put(firmware_path, remotepath="/disk", confirm=False)
-
-                logger.info("Upload complete. Firmware update happens asynchronously in the background. "
-                            "Update can take a number of minutes to complete.")
+            # The controller applies each disk firmware file as it is
+            # uploaded, so files are uploaded one at a time, but over a
+            # single connection
+            with sftp.ConnectionPool(args.sftp_port, args.api_username, args.api_password) as pool:
+                for entry in updateable_firmware_files:
+                    logger.info(f"Extracting firmware file to {tmpdirname}/{entry.get('firmware_file')}")
+                    firmware_path = zipobj.extract(entry.get('firmware_file'), path=tmpdirname)
+
+                    logger.info(f"Uploading firmware version: {entry.get('new_version')}")
+                    if session.plan is not None:
+                        session.plan.record('SFTP PUT', f"sftp://{args.api_host}:{args.sftp_port}/disk",
+                                            entry.get('firmware_file'))
+                        continue
+                    pool.put(args.api_host, firmware_path, "/disk")
+
+                    logger.info("Upload complete. Firmware update happens asynchronously in the background. "
+                                "Update can take a number of minutes to complete.")
 
     return CheckResult.OK.value
 
@@ -295,38 +296,28 @@ def certificate(args, session):
         controller_b = next(iter(network for network in network_parameters if network.controller == 'B'))
         controller_ips = [controller_a.ip_address, controller_b.ip_address]
 
-    cnopts = pysftp.CnOpts(knownhosts=os.path.expanduser(os.path.join('~','.ssh','known_hosts')))
-    cnopts.hostkeys = None
+    # Upload the certificate and key to both controllers in parallel, over
+    # a single connection to each
+    uploads = []
     for ip in controller_ips:
-        logger.info(f"Connecting to: {ip} for certificate upload...")
-        with pysftp.Connection(ip,
-                          port=int(args.sftp_port),
-                          username=args.api_username,
-                          password=args.api_password,
-                          cnopts=cnopts,
-                          ) as sftp:
-            logger.info(f"Uploading tls cert: {cert_file}")
-            sftp.put(cert_file, remotepath="/cert-file", confirm=False)
-            logger.info(f"Uploading tls key: {key_file}")
-            sftp.put(key_file, remotepath="/cert-key-file", confirm=False)
+        uploads.append((ip, cert_file, "/cert-file"))
+        uploads.append((ip, key_file, "/cert-key-file"))
+
+    if session.plan is not None:
+        for ip, path, remotepath in uploads:
+            session.plan.record('SFTP PUT', f"sftp://{ip}:{args.sftp_port}{remotepath}", path)
+    else:
+        with sftp.ConnectionPool(args.sftp_port, args.api_username, args.api_password) as pool:
+            pool.put_parallel(uploads)
 
     logger.info("Uploads complete. Restarting both management controllers to take effect...")
     restart.mc(session, controller='both')
 
-    # Wait 5 minutes before attempting to start new connections
-    time.sleep(300)
-    # Establish a new session here, since we have restarted the management
-    # ports. Boost the number of retries to catch indeterminate time until it's online
-    session = Session(host = args.api_host,
-                      port = args.api_port,
-                      username = args.api_username,
-                      password = args.api_password,
-                      verify = False if args.api_disable_tls_verification else True,
-                      retries=10,
-                      )
-
-    system = next(iter(show.system(session)))
-    certificates = show.certificate(session, controller='both')
+    # Poll until both management controllers are back, then continue with a
+    # new session, since our session key did not survive the restart
+    with ready.wait_for_ready(session, deadline=args.wait_timeout) as session:
+        system = next(iter(show.system(session)))
+        certificates = show.certificate(session, controller='both')
     print(formatters.format_certificates(system, certificates))
 
     return CheckResult.OK.value
@@ -32,3 +32,11 @@ class IncompleteResponseError(ApiError):
             f"the response ({msg}). Possibly the API has changed it's "
             f"response format."
         )
+
+class MissingFieldError(IncompleteResponseError, AttributeError):
+    """ Raised when a model attribute is missing from the API response
+
+    Also an AttributeError, so that hasattr() and getattr() with a default
+    treat the attribute as absent
+    """
+    pass
@@ -0,0 +1,125 @@
+import logging
+import json
+import codecs
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = ' \t\n\r'
+
+class _Stream:
+    ''' Text buffer over an iterable of byte chunks, decoding JSON values
+        from it as soon as enough data has arrived
+    '''
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def _read(self):
+        """ Append the next chunk to the buffer. Returns False at end of stream """
+
+        if self.exhausted:
+            return False
+        # Drop what has already been consumed, so the buffer only ever
+        # holds roughly one value at a time
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.buffer += self.decoder.decode(b'', final=True)
+            self.exhausted = True
+            return True
+        if isinstance(chunk, bytes):
+            chunk = self.decoder.decode(chunk)
+        self.buffer += chunk
+        return True
+
+    def peek(self):
+        """ Return the next non-whitespace character, without consuming it """
+
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read():
+                raise json.JSONDecodeError("Unexpected end of stream", self.buffer, self.pos)
+
+    def expect(self, chars):
+        char = self.peek()
+        if char not in chars:
+            raise json.JSONDecodeError(f"Expected one of '{chars}', found '{char}'",
+                                       self.buffer, self.pos)
+        self.pos += 1
+        return char
+
+    def value(self):
+        """ Decode and consume the next complete JSON value """
+
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.pos)
+                # A value ending exactly at the end of the buffer may be a
+                # truncated number, so only accept it once we know more
+                # data follows, or that there is none
+                if end < len(self.buffer) or self.exhausted:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            self._read()
+
+def iter_array(chunks, key, members=None):
+    """ Incrementally parse a JSON object, yielding the items of one of its
+    array members as each is decoded
+
+    API responses are a single object with a member containing the list of
+    requested objects, alongside the 'status' member, eg:
+
+        {"drives": [{...}, {...}, ...], "status": [{...}]}
+
+    Parsing these incrementally means the whole response never needs to be
+    held in memory at once, and the first items are available before the
+    rest of the response has been received.
+
+    Args:
+        chunks: iterable of bytes (or str) making up the JSON document,
+            eg: requests.Response.iter_content()
+        key (string): name of the member whose items are yielded
+        members (dict): if given, all other members of the object are
+            stored in this dict once decoded
+
+    Yields:
+        each item of the 'key' array in turn
+    """
+
+    stream = _Stream(chunks)
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+
+    while True:
+        name = stream.value()
+        stream.expect(':')
+        if name == key and stream.peek() == '[':
+            stream.expect('[')
+            if stream.peek() != ']':
+                while True:
+                    yield stream.value()
+                    if stream.expect(',]') == ']':
+                        break
+            else:
+                stream.expect(']')
+        else:
+            value = stream.value()
+            if members is not None:
+                members[name] = value
+        if stream.expect(',}') == '}':
+            break
@@ -2,11 +2,13 @@
 
 from __future__ import print_function
 import argparse
+import base64
 import logging
 import sys
 import os
 import re
 import smtplib
+import uuid
 from email.mime.text import MIMEText
 from email.mime.application import MIMEApplication
 from email.mime.multipart import MIMEMultipart
@@ -74,7 +76,25 @@ def configure_logging(log, level=None, verbose=False, colour=True):
     log.addHandler(handler)
     return log
 
+# Bytes of an attachment base64 encoded at a time when sending email. A
+# multiple of 57, so every chunk encodes to whole 76 character lines.
+ATTACHMENT_CHUNK_SIZE = 57 * 16 * 1024
+
+# SMTP server email is sent through
+SMTP_HOST = 'ppsw.cam.ac.uk'
+SMTP_PORT = 25
+
+# Seconds to wait for the SMTP server to respond
+SMTP_TIMEOUT = 60
+
 def send_email(from_addr, to_addr, subject, body, reply_addr=None, bcc_addrs=None, attachments=[]):
+    """ Send an email, streaming attachments to the SMTP server
+
+    Attachments (eg: log bundles of several hundred MB) are base64 encoded
+    and sent a chunk at a time as they are read, rather than building the
+    whole message in memory first.
+    """
+
     msg = MIMEMultipart()
     msg['Subject'] = subject
     msg['From'] = from_addr
@@ -90,15 +110,54 @@ def send_email(from_addr, to_addr, subject, body, reply_addr=None, bcc_addrs=Non
     body_text = MIMEText(body)
     msg.attach(body_text)
 
-    # If attachment defined, add to email
+    # Each attachment is given a unique placeholder payload, which is
+    # replaced by the encoded file as the message is sent
+    placeholders = {}
     for attachment in attachments:
-        with open(attachment, "rb") as attachment_file:
-            msg_attachment = MIMEApplication(attachment_file.read(),Name=os.path.basename(attachment))
-            msg_attachment.add_header('Content-Disposition','attachment',filename=os.path.basename(attachment))
-            msg.attach(msg_attachment)
-
-    server = smtplib.SMTP(host='ppsw.cam.ac.uk', port=25)
-    server.sendmail(from_addr, to_addrs, msg.as_string())
+        placeholder = f"ATTACHMENT-{uuid.uuid4().hex}"
+        placeholders[placeholder] = attachment
+        msg_attachment = MIMEApplication(b'', Name=os.path.basename(attachment))
+        msg_attachment.set_payload(placeholder)
+        msg_attachment.add_header('Content-Disposition','attachment',filename=os.path.basename(attachment))
+        msg.attach(msg_attachment)
+
+    server = smtplib.SMTP(host=SMTP_HOST, port=SMTP_PORT, timeout=SMTP_TIMEOUT)
+    try:
+        server.ehlo_or_helo_if_needed()
+        server.mail(from_addr)
+        for addr in to_addrs:
+            code, resp = server.rcpt(addr)
+            if code not in (250, 251):
+                raise smtplib.SMTPRecipientsRefused({addr: (code, resp)})
+        code, resp = server.docmd('DATA')
+        if code != 354:
+            raise smtplib.SMTPDataError(code, resp)
+
+        text = msg.as_string()
+        parts = re.split(f"({'|'.join(placeholders)})", text) if placeholders else [text]
+        for part in parts:
+            if part in placeholders:
+                with open(placeholders[part], 'rb') as attachment_file:
+                    separator = b''
+                    for chunk in iter(lambda: attachment_file.read(ATTACHMENT_CHUNK_SIZE), b''):
+                        # The base64 alphabet has no '.', so lines never
+                        # need dot-stuffing
+                        encoded = base64.encodebytes(chunk).rstrip(b'\n')
+                        server.send(separator + encoded.replace(b'\n', b'\r\n'))
+                        separator = b'\r\n'
+            else:
+                part = part.replace('\r\n', '\n').replace('\n', '\r\n')
+                server.send(re.sub(r'(?m)^\.', '..', part).encode('utf-8'))
+
+        server.send(b'.\r\n' if text.endswith('\n') else b'\r\n.\r\n')
+        code, resp = server.getreply()
+        if code != 250:
+            raise smtplib.SMTPDataError(code, resp)
+    except Exception:
+        # We may have failed part way through sending the message, when
+        # the server would take QUIT as part of it, so just disconnect
+        server.close()
+        raise
     server.quit()
 
 def strip_ansi_escape(input_string):
@@ -0,0 +1,311 @@
+import argparse
+import io
+import logging
+import sys
+import threading
+import traceback
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from colorama import Fore, Style
+
+from me4storage.api.gather import register_context
+from me4storage.api.session import Session
+from me4storage.api.token_cache import TokenCache
+from me4storage.api.cache import ResponseCache
+from me4storage.api.tracing import Tracer
+from me4storage.api.stats import CallStats
+from me4storage.api.transport import FixtureStore, RecordingAdapter, ReplayAdapter
+from me4storage.api.plan import Plan
+from me4storage.api.latency import LatencyStore
+from me4storage.common.exceptions import UsageError
+from me4storage.common.nsca import CheckResult
+import me4storage.common.tables as tables
+
+logger = logging.getLogger(__name__)
+
+# Per-thread context, used to route output and log messages for each
+# array to the correct place while commands run concurrently
+_context = threading.local()
+
+def _capture_context():
+    """ Carry the array context over to threads started by gather() """
+
+    host = getattr(_context, 'host', None)
+    buffer = getattr(_context, 'buffer', None)
+
+    def restore():
+        _context.host = host
+        _context.buffer = buffer
+    return restore
+
+register_context(_capture_context)
+
+class _ThreadLocalStdout(io.TextIOBase):
+    """ Proxy for sys.stdout which writes to a per-thread buffer if the
+    current thread has one, and otherwise to the original stream.
+
+    All commands print their output directly to stdout, so this is what
+    lets us capture the output of each array separately without having to
+    change every command.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        buffer = getattr(_context, 'buffer', None)
+        if buffer is not None:
+            return buffer.write(text)
+        return self.stream.write(text)
+
+    def flush(self):
+        if getattr(_context, 'buffer', None) is None:
+            self.stream.flush()
+
+class _ArrayLogFilter(logging.Filter):
+    """ Prefix log messages with the name of the array they relate to """
+
+    def filter(self, record):
+        host = getattr(_context, 'host', None)
+        if host is not None and not getattr(record, 'fleet_prefixed', False):
+            record.msg = f"{host}: {record.msg}"
+            record.fleet_prefixed = True
+        return True
+
+def read_inventory(path):
+    """ Read an inventory file of arrays to run against
+
+    The inventory is a plain text file with one array per line. Each line
+    contains the primary controller hostname/IP, optionally followed by the
+    secondary controller hostname/IP. Blank lines and lines starting
+    with '#' are ignored.
+
+    Returns:
+        list of (host, secondary_host) tuples
+    """
+
+    arrays = []
+    with open(path, 'r') as inventory:
+        for line in inventory:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            fields = line.split()
+            if len(fields) > 2:
+                raise UsageError(f"Invalid inventory line in {path}: '{line}'. "
+                                 f"Expected '<host> [<secondary-host>]'")
+            host = fields[0]
+            secondary_host = fields[1] if len(fields) > 1 else None
+            arrays.append((host, secondary_host))
+
+    return arrays
+
+def resolve_arrays(args):
+    """ Determine the list of arrays the command should run against
+
+    Arrays are taken from any '--api-host' arguments, followed by any
+    arrays listed in the '--inventory' file. If neither are given we fall
+    back to the 'api_host' configuration file value, or 'localhost'.
+
+    Returns:
+        list of (host, secondary_host) tuples
+    """
+
+    api_hosts = getattr(args, 'api_hosts', None) or []
+    secondary_host = getattr(args, 'secondary_host', None)
+    if len(api_hosts) > 1 and secondary_host:
+        raise UsageError("--secondary-host cannot be used with multiple "
+                         "--api-host arguments. Use an --inventory file instead")
+
+    arrays = []
+    for host in api_hosts:
+        arrays.append((host, secondary_host))
+
+    inventory = getattr(args, 'inventory', None)
+    if inventory:
+        arrays.extend(read_inventory(inventory))
+
+    if not arrays:
+        arrays.append((getattr(args, 'api_host', None) or 'localhost',
+                       secondary_host))
+
+    # Remove duplicates, whilst preserving order
+    unique_arrays = []
+    for array in arrays:
+        if array not in unique_arrays:
+            unique_arrays.append(array)
+
+    return unique_arrays
+
+def array_args(args, host, secondary_host=None):
+    """ Return a copy of the parsed arguments targeting a single array """
+
+    array_args = argparse.Namespace(**vars(args))
+    array_args.api_host = host
+    array_args.secondary_host = secondary_host
+    return array_args
+
+def _transport(args):
+    """ Return the transport adapter factory selected by the arguments """
+
+    record_dir = getattr(args, 'api_record', None)
+    replay_dir = getattr(args, 'api_replay', None)
+    if record_dir and replay_dir:
+        raise UsageError("--api-record and --api-replay cannot be used together")
+    if record_dir:
+        return partial(RecordingAdapter, FixtureStore(record_dir))
+    if replay_dir:
+        latency = args.api_replay_latency
+        if latency != 'recorded':
+            try:
+                latency = float(latency)
+            except ValueError:
+                raise UsageError(f"Invalid --api-replay-latency '{latency}'. "
+                                 f"Expected a number of seconds, or 'recorded'")
+        return partial(ReplayAdapter, FixtureStore(replay_dir), latency=latency)
+    return None
+
+def create_session(args):
+    """ Create a Session for the array described by the parsed arguments """
+
+    token_cache = None
+    if getattr(args, 'api_token_cache', False):
+        token_cache = TokenCache(cache_dir=args.api_token_cache_dir,
+                                 ttl=args.api_token_cache_ttl)
+
+    hedge = getattr(args, 'api_hedge', False)
+    latency = None
+    if hedge or getattr(args, 'api_adaptive_timeouts', False):
+        latency = LatencyStore()
+
+    return Session(host = args.api_host,
+                   secondary_host = getattr(args, 'secondary_host', None),
+                   port = args.api_port,
+                   username = args.api_username,
+                   password = args.api_password,
+                   verify = False if args.api_disable_tls_verification else True,
+                   token_cache = token_cache,
+                   cache = ResponseCache() if getattr(args, 'api_cache', False) else None,
+                   tracer = Tracer(dump_dir=getattr(args, 'api_trace_dir', None),
+                                   stats=CallStats() if getattr(args, 'stats', False) else None),
+                   transport = _transport(args),
+                   plan = Plan() if getattr(args, 'plan', False) else None,
+                   latency = latency,
+                   hedge = hedge)
+
+def run_command(args, session):
+    """ Run the selected subcommand, printing the plan afterwards if
+    the session is planning, saving any response times recorded, and
+    printing the API call summary if requested
+    """
+
+    try:
+        rc = args.func(args, session)
+    finally:
+        if session.latency is not None:
+            session.latency.save()
+        if session.tracer.stats is not None:
+            # When running against many arrays, print with the array's
+            # output rather than interleaved with the other arrays on stderr
+            session.tracer.stats.display(f"API calls to {session.host}",
+                                         file=getattr(_context, 'buffer', None))
+    if session.plan is not None:
+        session.plan.display()
+    return rc
+
+def _run_array(args, debug=False):
+    """ Run the selected subcommand against a single array, capturing its
+    output. Any exception is logged and reported as a CRITICAL result
+    """
+
+    _context.host = args.api_host
+    _context.buffer = io.StringIO()
+    try:
+        with create_session(args) as session:
+            rc = run_command(args, session)
+    except Exception as e:
+        if debug:
+            logger.error(traceback.format_exc())
+        logger.error("Exception {}: {}".format(e.__class__.__name__, e))
+        rc = CheckResult.CRITICAL.value
+    finally:
+        output = _context.buffer.getvalue()
+        _context.buffer = None
+        _context.host = None
+
+    if rc is None:
+        rc = CheckResult.OK.value
+    elif isinstance(rc, CheckResult):
+        rc = rc.value
+    elif rc not in {result.value for result in CheckResult}:
+        logger.warning(f"{args.api_host}: unexpected return code {rc}, reporting UNKNOWN")
+        rc = CheckResult.UNKNOWN.value
+
+    return rc, output
+
+def _array_name(host, secondary_host=None):
+    """ Name of an array for display, which includes the secondary
+    controller, as the same primary may be given with different ones """
+
+    if secondary_host:
+        return f"{host} ({secondary_host})"
+    return host
+
+def run(args, arrays, workers=8):
+    """ Run the selected subcommand against many arrays concurrently
+
+    Each array is handled in its own worker thread, with at most 'workers'
+    arrays in flight at once, so the total run time is bounded by the
+    slowest array rather than the sum of all of them.
+
+    The output of each array is collected and printed as a single group
+    once that array has finished, and log messages are prefixed with the
+    array name.
+
+    Return codes which aren't a CheckResult are reported as UNKNOWN.
+
+    Returns:
+        The aggregate return code, which is the worst return code of all
+        arrays
+    """
+
+    root_logger = logging.getLogger()
+    log_filter = _ArrayLogFilter()
+    for handler in root_logger.handlers:
+        handler.addFilter(log_filter)
+
+    original_stdout = sys.stdout
+    sys.stdout = _ThreadLocalStdout(original_stdout)
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, int(workers))) as executor:
+            futures = {
+                executor.submit(_run_array,
+                                array_args(args, host, secondary_host),
+                                args.debug): (host, secondary_host)
+                for host, secondary_host in arrays
+            }
+            for future in as_completed(futures):
+                array = futures[future]
+                rc, output = future.result()
+                results[array] = rc
+
+                print(f"{Fore.WHITE}{Style.BRIGHT}==> {_array_name(*array)} <=={Style.RESET_ALL}")
+                if output:
+                    print(output.rstrip('\n'))
+                print("")
+    finally:
+        sys.stdout = original_stdout
+        for handler in root_logger.handlers:
+            handler.removeFilter(log_filter)
+
+    # Print summary of results for each array, in the order they were given
+    table_header = ['Array', 'Result']
+    table_rows = []
+    for array in arrays:
+        table_rows.append([_array_name(*array), CheckResult(results[array]).name])
+    tables.display_table(table_header, table_rows, style='bordered')
+
+    return max(results.values())
@@ -25,10 +25,30 @@ class Model:
                 will document which formatter is to be used with a certain
                 field, and the _formatters dict is used to find the function
                 for this.
+
+            strict (bool): Attributes are resolved lazily from the decoded
+                JSON dict when first accessed, so a key missing from the API
+                response is only reported when that attribute is used. When
+                'strict' is set, every key in '_attrs' is checked when the
+                object is created instead, and IncompleteResponseError is
+                raised if any are missing. This is useful when checking our
+                models against a new firmware release.
+
+            build_timer (callable): If set, called when each object is
+                created, returning a context manager which times the
+                creation, eg: me4storage.api.stats.build_timer for --stats
     '''
 
     _attrs = {}
 
+    # Mapping of python attribute name to API key, built for each
+    # sub-class from its _attrs dict by __init_subclass__
+    _fields = {}
+
+    strict = False
+
+    build_timer = None
+
     _formatters = {
         'string': lambda x: x,
         'boolean': lambda x: 'yes' if x else 'no',
@@ -44,20 +64,63 @@ class Model:
         'epoch': formatters.epoch_formatter,
         }
 
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._fields = {key.replace('-','_').lower(): key for key in cls._attrs}
+
     def __init__(self, json_dict):
         """Initialize our basic object.
 
         All resources will pass in decoded JSON
         """
 
-        logger.debug(f"Initialised: {type(self).__name__}")
-        self.raw = json_dict.copy()
+        self.raw = json_dict
 
+        build_timer = Model.build_timer
+        if build_timer is None:
+            self._build(json_dict)
+        else:
+            with build_timer():
+                self._build(json_dict)
+
+    def _build(self, json_dict):
         try:
             self._update_attributes(json_dict)
+        except exceptions.IncompleteResponseError:
+            raise
         except Exception as err:
             raise exceptions.IncompleteResponseError(str(err))
 
+    def __getattr__(self, name):
+        """ Resolve attributes named in _attrs from the decoded JSON dict
+
+        This is only called if normal attribute lookup fails, so attributes
+        set explicitly (eg: nested models) and attributes already resolved
+        are returned directly.
+
+        Raises:
+            MissingFieldError, an AttributeError, if the key is missing
+            from the API response
+        """
+
+        fields = type(self)._fields
+        if name not in fields or 'raw' not in self.__dict__:
+            if isinstance(getattr(type(self), name, None), property):
+                # The property raised AttributeError, eg: a field it uses
+                # is missing from the response, which brought us here.
+                # Evaluate it again to raise that error, rather than hide it
+                return getattr(type(self), name).fget(self)
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+        try:
+            value = self.raw[fields[name]]
+        except KeyError as e:
+            raise exceptions.MissingFieldError(str(e))
+
+        # Cache the value so later lookups don't come back here
+        self.__dict__[name] = value
+        return value
+
     def _update_attributes(self, json_dict):
         """ Commmon function to extract all attributes from decoded JSON dict
 
@@ -65,30 +128,34 @@ class Model:
         at the end of each sub-class of Model's own _update_attributes
         method. The sub-class should focus on handling/extracting any special
         attributes, (eg: such as attributes that represent another model), and
-        then call this base-class version of _update_attributes to extract
-        all remaining attributes.
+        then call this base-class version of _update_attributes.
 
-        We simply iterate over all keys in the Model's _attrs dictionary
-        and lookup this key in json_dict to extract the value. Every key
-        will be created as an attribute of this object, with the same name
-        as the key.
+        Attributes listed in the Model's _attrs dictionary are not extracted
+        here, but looked up from the decoded JSON dict when first accessed.
+        In strict mode, we check here that every key is present.
 
         Args:
             json_dict (dict): the decoded JSON dictionary returned by the API
         """
 
-        # All other attrs we gather from this model's _attrs definition
-        for key, _ in self._attrs.items():
-            # otherwise, do an explicit key lookup for all non-optional
-            # keys - this will throw a KeyError exception if the key
-            # is not present, which will indicate to us that the
-            # the api response has changed, or we've made an error in
-            # our model
-            try:
-                setattr(self, key.replace('-','_').lower(), json_dict[key])
-            except KeyError as e:
-                logger.debug(f"Failed to find key: {key} in dict:\n{pformat(json_dict)}")
-                raise e
+        if self.strict:
+            self.validate()
+
+    def validate(self):
+        """ Check that every key in the Model's _attrs is present in the
+        API response
+
+        A missing key indicates to us that the api response has changed,
+        or we've made an error in our model
+
+        Raises:
+            IncompleteResponseError
+        """
+
+        for key in self._attrs:
+            if key not in self.raw:
+                logger.debug(f"Failed to find key: {key} in dict:\n{pformat(self.raw)}")
+                raise exceptions.IncompleteResponseError(repr(key))
 
     def format_attribute(self, attr_name):
         """ For a given attribute, return a human-friendly representation
@@ -111,8 +178,10 @@ class Model:
         return formatter(getattr(self, attr_name))
 
     def __repr__(self):
+        attrs = {name for name, key in self._fields.items() if key in self.raw}
+        attrs.update(name for name in self.__dict__ if name != 'raw')
         output = []
-        for attr in sorted(self.__dict__):
+        for attr in sorted(attrs):
             value = self.format_attribute(attr)
             output.append(f"{attr}: {value}")
         return "\n".join(output)
@@ -28,6 +28,7 @@ class Disk(Model):
         'revision': '',
         'secondary-channel': '',
         'container-index': '',
+        'disk-group': '',
         'member-index': '',
         'description': '',
         'description-numeric': '',
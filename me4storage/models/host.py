@@ -3,6 +3,7 @@ import re
 from datetime import datetime
 
 from me4storage.models.basemodel import Model
+from me4storage.models.initiator import Initiator
 import me4storage.common.formatters as formatters
 
 logger = logging.getLogger(__name__)
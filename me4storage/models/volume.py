@@ -18,6 +18,7 @@ class Volume(Model):
         'storage-pool-name': '',
 #        'storage-pools-url': '',
         'volume-name': '',
+        'blocksize': '',
         'size': '',
         'size-numeric': '',
         'total-size': '',
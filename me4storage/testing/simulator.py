@@ -0,0 +1,938 @@
+""" Local simulator of the ME4 management controller HTTPS API
+
+The simulator holds the configuration of a single array in memory, and
+implements the login, show, set, create, add, delete, map and unmap
+endpoints used by me4storage.api, so that Session, the fleet runner and
+the configure workflows can be exercised at scale without hardware, eg:
+
+    $ python -m me4storage.testing.simulator --port 9446 --latency 0.2 --error-rate 0.05
+    $ me4cli show disks -H localhost --api-port 9446 -u manage -p '!manage' --api-disable-tls-verification
+
+or from python:
+
+    with Simulator(SimulatedArray(enclosures=2), Profile(latency=0.1)) as simulator:
+        session = Session('127.0.0.1', simulator.port, 'manage', '!manage', verify=False)
+
+Like the real API, parameters are encoded in the URL path, as either a
+parameter name followed by a quoted value, or a bare word (eg: a flag such
+as 'detail', or the name of the object being operated on). Failed commands
+return HTTP 200 with an error status object.
+"""
+
+import argparse
+import copy
+import datetime
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import secrets
+import shutil
+import socketserver
+import ssl
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+try:
+    from cryptography import x509
+    from cryptography.hazmat.backends import default_backend
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import NameOID
+except ImportError:
+    x509 = None
+
+from me4storage.testing import synthetic
+from me4storage.testing.synthetic import model_dict
+from me4storage.models.network_parameters import NetworkParameters
+from me4storage.models.dns_parameters import DNSParameters
+from me4storage.models.mgmt_hostnames import MGMTHostnames
+from me4storage.models.ntp_status import NTPStatus
+from me4storage.models.email_parameters import EmailParameters
+from me4storage.models.license import License
+from me4storage.models.advanced_settings_table import AdvancedSettingsTable
+from me4storage.models.certificate_status import CertificateStatus
+from me4storage.models.unwritable_cache import UnwritableCache
+from me4storage.models.code_load_readiness import CodeLoadReadiness
+from me4storage.models.user import User
+from me4storage.models.initiator import Initiator
+from me4storage.models.host import Host
+from me4storage.models.host_group import HostGroup
+from me4storage.models.host_group_view import HostGroupView, HostViewMapping
+from me4storage.models.volume_view import VolumeView, VolumeViewMapping
+
+logger = logging.getLogger(__name__)
+
+# Return code of the status object for a failed command
+ERROR_RETURN_CODE = -10000
+
+class CommandError(Exception):
+    """ Raised by command handlers, and returned as an error status """
+    pass
+
+class SessionError(CommandError):
+    pass
+
+def error_status(message, return_code=ERROR_RETURN_CODE):
+    return [{
+        'object-name': 'status',
+        'meta': '/meta/status',
+        'response-type': 'Error',
+        'response-type-numeric': 1,
+        'response': message,
+        'return-code': return_code,
+        'component-id': '',
+        'time-stamp': '2021-01-01 12:00:00',
+        'time-stamp-numeric': 1609502400,
+        }]
+
+def parse_path(path):
+    """ Split an API request path into its endpoint and parameters
+
+    eg: '/api/create/volume/v1/vdisk/"dg01"/size/"10GB"' is parsed as
+    ('create/volume', [('v1', None), ('vdisk', 'dg01'), ('size', '10GB')])
+
+    Returns:
+        tuple of (endpoint, list of (name, value) tuples). Bare words have
+        a value of None.
+    """
+
+    path = urllib.parse.unquote(path)
+    if path.startswith('/api/'):
+        path = path[len('/api/'):]
+
+    # Quoted values may contain '/', so tokenise rather than split
+    tokens = re.findall(r'"[^"]*"|[^/]+', path)
+    endpoint = '/'.join(tokens[:2])
+
+    params = []
+    index = 2
+    while index < len(tokens):
+        name = tokens[index]
+        if index + 1 < len(tokens) and tokens[index + 1].startswith('"'):
+            params.append((name, tokens[index + 1].strip('"')))
+            index += 2
+        else:
+            params.append((name.strip('"'), None))
+            index += 1
+
+    return endpoint, params
+
+def expand_disks(spec):
+    """ Expand a disk list, eg: '0.0-2,1.5' to ['0.0', '0.1', '0.2', '1.5']
+
+    RAID10 sub-groups, separated by ':', are flattened into a single list.
+    """
+
+    disks = []
+    for item in re.split(r'[,:]', spec):
+        match = re.match(r'^(\d+)\.(\d+)-(\d+)$', item.strip())
+        if match:
+            enclosure, first, last = (int(group) for group in match.groups())
+            disks.extend(f'{enclosure}.{slot}' for slot in range(first, last + 1))
+        elif item.strip():
+            disks.append(item.strip())
+    return disks
+
+class Profile:
+    ''' Performance profile of the simulated management controller
+
+        Attributes:
+            latency (float): Seconds taken to process each request
+            jitter (float): Maximum additional random seconds per request
+            error_rate (float): Probability of answering a request with
+                HTTP 503 Service Unavailable
+            concurrency (int): Number of requests processed at once. Further
+                requests queue, as on a real controller.
+            session_timeout (int): Seconds a session key is valid for
+    '''
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, concurrency=4, session_timeout=1800):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.concurrency = concurrency
+        self.session_timeout = session_timeout
+
+class SimulatedArray:
+    ''' In-memory configuration and state of a simulated array
+
+        Attributes:
+            enclosures (int): Number of 84-drive enclosures
+            provisioned (bool): If True, start with linear RAID6 disk groups
+                and volumes on all drives, otherwise with no disk groups
+            users (dict): Mapping of username to password of users able to
+                login
+            restart_time (float): Seconds a management controller is
+                unavailable for after 'restart mc'. The other controller
+                is reported as not operational for as long again.
+    '''
+
+    def __init__(self, enclosures=1, name='me4-simulator', provisioned=True, users=None,
+                 restart_time=0.0):
+        self.lock = threading.RLock()
+        self.users = dict(users) if users is not None else {'manage': '!manage'}
+        self.sessions = {}
+        self.restart_time = restart_time
+        self.restarted_at = None
+
+        self.system = synthetic.system(name)
+        self.service_tags = synthetic.service_tags(enclosures)
+        self.versions = synthetic.versions()
+        self.disks = [synthetic.disk(enclosure, slot)
+                      for enclosure in range(enclosures)
+                      for slot in range(synthetic.DRIVES_PER_ENCLOSURE)]
+        self.disk_groups = []
+        self.pools = []
+        self.volumes = []
+        self.initiators = [model_dict(Initiator,
+                                      durable_id=f'I{index}',
+                                      id=f'500605b00db8c{index:03d}',
+                                      nickname='',
+                                      discovered='Yes',
+                                      mapped='No',
+                                      profile='Standard',
+                                      host_bus_type='SAS',
+                                      host_id='NOHOST',
+                                      host_key='')
+                           for index in range(8)]
+        self.hosts = []
+        self.host_groups = []
+        self.mappings = []
+        self.network = [model_dict(NetworkParameters,
+                                   durable_id=f'mgmtport_{controller}',
+                                   ip_address=f'10.0.0.{2 + index}',
+                                   gateway='10.0.0.1',
+                                   subnet_mask='255.255.255.0',
+                                   addressing_mode='Manual')
+                        for index, controller in enumerate('ab')]
+        self.dns = [model_dict(DNSParameters, controller=controller.upper(),
+                               name_servers='', search_domains='')
+                    for controller in 'ab']
+        self.hostnames = [model_dict(MGMTHostnames, controller=controller.upper(),
+                                     mgmt_hostname=f'{name}-{controller}', domain_name='')
+                          for controller in 'ab']
+        self.ntp = model_dict(NTPStatus, ntp_status='deactivated',
+                              ntp_server_address='0.0.0.0',
+                              ntp_contact_time='N/A')
+        self.email = model_dict(EmailParameters, email_notification='Disabled',
+                                email_notify_address_1='', email_notify_address_2='',
+                                email_notify_address_3='', email_notify_address_4='')
+        self.advanced_settings = model_dict(AdvancedSettingsTable)
+        self.certificates = [model_dict(CertificateStatus, controller=controller.upper(),
+                                        certificate_status='System Generated',
+                                        certificate_time='2021-01-01 12:00:00',
+                                        certificate_signature=secrets.token_hex(20),
+                                        certificate_text='')
+                             for controller in 'ab']
+
+        if provisioned:
+            groups = synthetic.disk_groups_count(enclosures)
+            for index in range(groups):
+                name = synthetic.disk_group_name(index)
+                disks = [disk['location'] for disk in self.disks[index * synthetic.DRIVES_PER_DISK_GROUP:
+                                                                 (index + 1) * synthetic.DRIVES_PER_DISK_GROUP]]
+                self._add_disk_group(name, disks, 'RAID6', 'A' if index % 2 == 0 else 'B')
+                self.volumes.append(synthetic.volume(index))
+
+    #
+    # Sessions
+    #
+
+    def login(self, auth_hash, timeout):
+        with self.lock:
+            for username, password in self.users.items():
+                expected = hashlib.sha256(f'{username}_{password}'.encode('utf-8')).hexdigest()
+                if secrets.compare_digest(expected, auth_hash):
+                    session_key = secrets.token_hex(16)
+                    self.sessions[session_key] = time.monotonic() + timeout
+                    status = synthetic.status(session_key)
+                    status[0]['return-code'] = 1
+                    return {'status': status}
+        return {'status': error_status('Authentication Unsuccessful', return_code=2)}
+
+    def check_session(self, session_key):
+        with self.lock:
+            expires = self.sessions.get(session_key)
+            if expires is None or expires <= time.monotonic():
+                self.sessions.pop(session_key, None)
+                raise SessionError('Invalid sessionkey')
+
+    def logout(self, session_key):
+        with self.lock:
+            if self.sessions.pop(session_key, None) is None:
+                raise SessionError('Invalid sessionkey')
+
+    def restarting(self):
+        """ True while the management controller is restarting """
+
+        with self.lock:
+            return (self.restarted_at is not None and
+                    time.monotonic() < self.restarted_at + self.restart_time)
+
+    def _other_mc_status(self):
+        if (self.restarted_at is not None and
+                time.monotonic() < self.restarted_at + 2 * self.restart_time):
+            return 'Not Operational'
+        return 'Operational'
+
+    #
+    # Commands
+    #
+
+    def handle(self, endpoint, params):
+        """ Run a command and return the response body """
+
+        handler = getattr(self, 'cmd_' + endpoint.replace('/', '_').replace('-', '_'), None)
+        if handler is None:
+            return {'status': error_status(f"The command is not recognized: {endpoint}")}
+
+        with self.lock:
+            try:
+                body = handler(params)
+            except CommandError as e:
+                return {'status': error_status(str(e))}
+
+        # Hand out copies, as clients may be served concurrently
+        body = copy.deepcopy(body) if body else {}
+        body.setdefault('status', synthetic.status())
+        return body
+
+    @staticmethod
+    def _flags(params, ignore=()):
+        return [name for name, value in params if value is None and name not in ignore]
+
+    @staticmethod
+    def _values(params):
+        return {name: value for name, value in params if value is not None}
+
+    def _name(self, params, ignore=()):
+        flags = self._flags(params, ignore)
+        if not flags:
+            raise CommandError("A required parameter is missing: name")
+        return flags[0]
+
+    def _find(self, collection, key, name):
+        for item in collection:
+            if item[key] == name:
+                return item
+        raise CommandError(f"The specified name was not found: {name}")
+
+    # show
+
+    def cmd_show_system(self, params):
+        status = self._other_mc_status()
+        system = dict(self.system, **{'other-MC-status': status})
+        system['redundancy'] = [dict(redundancy, **{'other-MC-status': status})
+                                for redundancy in self.system.get('redundancy', [])]
+        return {'system': [system]}
+
+    def cmd_show_service_tag_info(self, params):
+        return {'service-tag-info': self.service_tags}
+
+    def cmd_show_license(self, params):
+        return {'license': [model_dict(License, license_key='simulated')]}
+
+    def cmd_show_versions(self, params):
+        return {'versions': self.versions}
+
+    def cmd_show_users(self, params):
+        users = [model_dict(User, username=username, roles='manage,monitor',
+                            user_type='Standard', timeout=1800)
+                 for username in self.users]
+        names = self._flags(params)
+        if names:
+            users = [user for user in users if user['username'] in names]
+        return {'users': users}
+
+    def cmd_show_ntp_status(self, params):
+        return {'ntp-status': [self.ntp]}
+
+    def cmd_show_dns_parameters(self, params):
+        return {'dns-parameters': self.dns}
+
+    def cmd_show_dns_management_hostname(self, params):
+        return {'mgmt-hostnames': self.hostnames}
+
+    def cmd_show_network_parameters(self, params):
+        return {'network-parameters': self.network}
+
+    def cmd_show_email_parameters(self, params):
+        return {'email-parameters': [self.email]}
+
+    def cmd_show_advanced_settings(self, params):
+        return {'advanced-settings-table': [self.advanced_settings]}
+
+    def cmd_show_certificate(self, params):
+        return {'certificate-status': self.certificates}
+
+    def cmd_show_unwritable_cache(self, params):
+        return {'unwritable-cache': [model_dict(UnwritableCache,
+                                                unwritable_a_percentage=0,
+                                                unwritable_b_percentage=0)]}
+
+    def cmd_show_disks(self, params):
+        disks = self.disks
+        values = self._values(params)
+        if 'disk-group' in values:
+            names = values['disk-group'].split(',')
+            disks = [disk for disk in disks if disk['disk-group'] in names]
+        return {'drives': disks}
+
+    def cmd_show_disk_groups(self, params):
+        disk_groups = self.disk_groups
+        values = self._values(params)
+        if 'pool' in values:
+            disk_groups = [dg for dg in disk_groups if dg['pool'] == values['pool']]
+        names = self._flags(params, ignore=('detail',))
+        if names:
+            names = names[0].split(',')
+            disk_groups = [dg for dg in disk_groups if dg['name'] in names]
+        return {'disk-groups': disk_groups}
+
+    def cmd_show_pools(self, params):
+        return {'pools': self.pools}
+
+    def cmd_show_volumes(self, params):
+        volumes = self.volumes
+        values = self._values(params)
+        if 'vdisk' in values:
+            names = values['vdisk'].split(',')
+            volumes = [volume for volume in volumes if volume['virtual-disk-name'] in names]
+        names = self._flags(params, ignore=('detail', 'pool'))
+        if names:
+            names = names[0].split(',')
+            volumes = [volume for volume in volumes if volume['volume-name'] in names]
+        return {'volumes': volumes}
+
+    def cmd_show_initiators(self, params):
+        return {'initiator': self.initiators}
+
+    def _host_dict(self, host):
+        _dict = model_dict(Host, durable_id=host['durable-id'], name=host['name'],
+                           serial_number=host['serial-number'],
+                           member_count=len(host['initiators']),
+                           host_group=host['host-group'])
+        _dict['initiator'] = [initiator for initiator in self.initiators
+                              if initiator['id'] in host['initiators']]
+        return _dict
+
+    def cmd_show_host_groups(self, params):
+        host_groups = []
+        for host_group in self.host_groups:
+            hosts = [host for host in self.hosts if host['host-group'] == host_group['name']]
+            _dict = model_dict(HostGroup, durable_id=host_group['durable-id'],
+                               name=host_group['name'],
+                               serial_number=host_group['serial-number'],
+                               member_count=len(hosts))
+            _dict['hosts'] = [self._host_dict(host) for host in hosts]
+            host_groups.append(_dict)
+        # As on a real array, hosts not in a host group are listed as the
+        # members of a pseudo host group
+        ungrouped = [host for host in self.hosts if host['host-group'] == '-']
+        if ungrouped:
+            _dict = model_dict(HostGroup, durable_id='HGU', name='-ungrouped-',
+                               serial_number='UNGROUPEDHOSTS',
+                               member_count=len(ungrouped))
+            _dict['hosts'] = [self._host_dict(host) for host in ungrouped]
+            host_groups.append(_dict)
+        return {'host-group': host_groups}
+
+    def cmd_show_maps(self, params):
+        if 'initiator' in self._flags(params):
+            views = []
+            for host_group in self.host_groups:
+                spec = f"{host_group['name']}.*.*"
+                _dict = model_dict(HostGroupView, durable_id=host_group['durable-id'],
+                                   serial_number=host_group['serial-number'],
+                                   group_name=spec)
+                _dict['host-view-mappings'] = [
+                    model_dict(HostViewMapping, volume=mapping['volume'],
+                               volume_serial=self._find(self.volumes, 'volume-name',
+                                                        mapping['volume'])['serial-number'],
+                               lun=mapping['lun'], access=mapping['access'], ports='A0,A1,B0,B1')
+                    for mapping in self.mappings if mapping['initiator'] == spec]
+                views.append(_dict)
+            return {'host-group-view': views}
+
+        views = []
+        for volume in self.volumes:
+            _dict = model_dict(VolumeView, durable_id=volume['durable-id'],
+                               volume_serial=volume['serial-number'],
+                               volume_name=volume['volume-name'])
+            _dict['volume-view-mappings'] = [
+                model_dict(VolumeViewMapping, durable_id=volume['durable-id'],
+                           parent_id=volume['durable-id'], mapped_id=mapping['initiator'],
+                           ports='A0,A1,B0,B1', lun=mapping['lun'], access=mapping['access'],
+                           identifier=mapping['initiator'], nickname=mapping['initiator'])
+                for mapping in self.mappings if mapping['volume'] == volume['volume-name']]
+            views.append(_dict)
+        return {'volume-view': views}
+
+    # check, restart
+
+    def cmd_check_firmware_upgrade_health(self, params):
+        readiness = model_dict(CodeLoadReadiness, overall_health='Pass', overall_health_numeric=0)
+        readiness['code-load-readiness-reasons'] = []
+        return {'code-load-readiness': [readiness]}
+
+    def cmd_restart_mc(self, params):
+        # Restarts end every session, and for simplicity restart both
+        # controllers whichever is given
+        self.sessions.clear()
+        self.restarted_at = time.monotonic()
+        return {}
+
+    def cmd_restart_sc(self, params):
+        return {}
+
+    # set
+
+    def _update(self, record, values, mapping):
+        for param, key in mapping.items():
+            if param in values:
+                record[key] = values[param]
+
+    def _controllers(self, values, records):
+        controller = values.get('controller', 'both').upper()
+        if controller == 'BOTH':
+            return records
+        return [records[0 if controller == 'A' else 1]]
+
+    def cmd_set_system(self, params):
+        self._update(self.system, self._values(params), {
+            'name': 'system-name',
+            'contact': 'system-contact',
+            'info': 'system-information',
+            'location': 'system-location',
+            })
+
+    def cmd_set_ntp_parameters(self, params):
+        values = self._values(params)
+        if 'ntp' in values:
+            self.ntp['ntp-status'] = 'activated' if values['ntp'] == 'enabled' else 'deactivated'
+        self._update(self.ntp, values, {'ntpaddress': 'ntp-server-address'})
+
+    def cmd_set_dns_parameters(self, params):
+        values = self._values(params)
+        for record in self._controllers(values, self.dns):
+            self._update(record, values, {'nameservers': 'name-servers',
+                                          'search-domains': 'search-domains'})
+
+    def cmd_set_dns_management_hostname(self, params):
+        values = self._values(params)
+        for record in self._controllers(values, self.hostnames):
+            self._update(record, values, {'name': 'mgmt-hostname'})
+
+    def cmd_set_network_parameters(self, params):
+        values = self._values(params)
+        for record in self._controllers(values, self.network):
+            self._update(record, values, {'ip': 'ip-address',
+                                          'gateway': 'gateway',
+                                          'netmask': 'subnet-mask'})
+            if 'dhcp' in self._flags(params):
+                record['addressing-mode'] = 'DHCP'
+
+    def cmd_set_email_parameters(self, params):
+        values = self._values(params)
+        if 'email-list' in values:
+            for index, address in enumerate((values['email-list'].split(',') + [''] * 4)[:4]):
+                self.email[f'email-notify-address-{index + 1}'] = address
+        self._update(self.email, values, {
+            'domain': 'email-domain',
+            'server': 'email-server',
+            'sender': 'email-sender',
+            'port': 'email-smtp-port',
+            'notification-level': 'email-notification-filter',
+            'security-protocol': 'email-security-protocol',
+            })
+
+    def cmd_set_user(self, params):
+        name = self._name(params)
+        if name not in self.users:
+            raise CommandError(f"The specified user was not found: {name}")
+        values = self._values(params)
+        if 'password' in values:
+            self.users[name] = values['password']
+
+    def cmd_set_initiator(self, params):
+        values = self._values(params)
+        initiator = self._find(self.initiators, 'id', values.get('id', ''))
+        initiator['nickname'] = values.get('nickname', '')
+
+    def cmd_set_pool(self, params):
+        self._find(self.pools, 'name', self._name(params))
+
+    def cmd_set_advanced_settings(self, params):
+        for name, value in self._values(params).items():
+            if name in self.advanced_settings:
+                self.advanced_settings[name] = value
+
+    def cmd_set_support_assist(self, params):
+        return {}
+
+    # create, add
+
+    def _add_disk_group(self, name, disks, level, owner, pool=None):
+        for location in disks:
+            disk = self._find(self.disks, 'location', location)
+            if disk['disk-group']:
+                raise CommandError(f"The specified disk is already in use: {location}")
+
+        index = len(self.disk_groups)
+        disk_group = synthetic.disk_group(index)
+        disk_group.update(name=name, pool=pool or name, raidtype=level.upper(),
+                          diskcount=len(disks), owner=owner)
+        disk_group['serial-number'] = secrets.token_hex(16)
+        self.disk_groups.append(disk_group)
+
+        for location in disks:
+            disk = self._find(self.disks, 'location', location)
+            disk['disk-group'] = name
+            disk['usage'] = 'LINEAR POOL' if pool is None else 'VIRTUAL POOL'
+
+        if pool is None or not any(existing['name'] == pool for existing in self.pools):
+            _pool = synthetic.pool(index)
+            _pool.update(name=pool or name)
+            _pool['serial-number'] = disk_group['serial-number']
+            _pool['disk-groups'] = [copy.deepcopy(disk_group)]
+            self.pools.append(_pool)
+
+    def cmd_add_disk_group(self, params):
+        values = self._values(params)
+        name = self._name(params)
+        if any(dg['name'] == name for dg in self.disk_groups):
+            raise CommandError(f"The name is already in use: {name}")
+        owner = values.get('assigned-to', 'auto').upper()
+        if owner not in ('A', 'B'):
+            owner = 'A' if len(self.disk_groups) % 2 == 0 else 'B'
+        pool = values.get('pool') if values.get('type') == 'virtual' else None
+        self._add_disk_group(name, expand_disks(values.get('disks', '')),
+                             values.get('level', 'raid6'), owner, pool)
+
+    def cmd_create_volume(self, params):
+        values = self._values(params)
+        name = self._name(params)
+        if any(volume['volume-name'] == name for volume in self.volumes):
+            raise CommandError(f"The name is already in use: {name}")
+        container = values.get('vdisk') or values.get('pool')
+        disk_group = self._find(self.disk_groups, 'name', container) if 'vdisk' in values \
+            else self._find(self.pools, 'name', container)
+
+        volume = synthetic.volume(len(self.volumes))
+        volume.update({'volume-name': name,
+                       'virtual-disk-name': container,
+                       'storage-pool-name': disk_group.get('pool', container),
+                       'size': values.get('size', ''),
+                       'serial-number': secrets.token_hex(16)})
+        self.volumes.append(volume)
+
+    def cmd_create_host(self, params):
+        values = self._values(params)
+        name = self._name(params)
+        if any(host['name'] == name for host in self.hosts):
+            raise CommandError(f"The name is already in use: {name}")
+        initiators = values.get('initiators', '')
+        self.hosts.append({'durable-id': f'H{len(self.hosts)}',
+                           'name': name,
+                           'serial-number': secrets.token_hex(16),
+                           'host-group': values.get('host_group', values.get('host-group', '-')),
+                           'initiators': initiators.split(',') if initiators else []})
+
+    def cmd_create_host_group(self, params):
+        values = self._values(params)
+        name = self._name(params)
+        if any(host_group['name'] == name for host_group in self.host_groups):
+            raise CommandError(f"The name is already in use: {name}")
+        self.host_groups.append({'durable-id': f'HG{len(self.host_groups)}',
+                                 'name': name,
+                                 'serial-number': secrets.token_hex(16)})
+        self._add_hosts(name, values.get('hosts', ''))
+
+    def _add_hosts(self, host_group, hosts):
+        for host_name in filter(None, hosts.split(',')):
+            self._find(self.hosts, 'name', host_name)['host-group'] = host_group
+
+    def cmd_add_host_group_members(self, params):
+        name = self._name(params)
+        self._find(self.host_groups, 'name', name)
+        self._add_hosts(name, self._values(params).get('hosts', ''))
+
+    def cmd_create_user(self, params):
+        name = self._name(params)
+        if name in self.users:
+            raise CommandError(f"The name is already in use: {name}")
+        self.users[name] = self._values(params).get('password', '')
+
+    def cmd_map_volume(self, params):
+        values = self._values(params)
+        volumes = self._name(params).split(',')
+        initiator = values.get('initiator', 'all')
+        access = values.get('access', 'read-write')
+        lun = int(values.get('lun', 0))
+
+        # As on the real array, when mapping several volumes the LUN is
+        # assigned to the first volume, and incremented for each following
+        for offset, volume in enumerate(volumes):
+            self._find(self.volumes, 'volume-name', volume)
+            for mapping in self.mappings:
+                if mapping['initiator'] == initiator and mapping['lun'] == str(lun + offset) \
+                        and mapping['volume'] != volume:
+                    raise CommandError(f"The LUN is already in use: {lun + offset}")
+
+        for offset, volume in enumerate(volumes):
+            self.mappings = [mapping for mapping in self.mappings
+                             if not (mapping['volume'] == volume and mapping['initiator'] == initiator)]
+            self.mappings.append({'volume': volume,
+                                  'initiator': initiator,
+                                  'lun': str(lun + offset),
+                                  'access': access})
+
+    # delete
+
+    def cmd_unmap_volume(self, params):
+        values = self._values(params)
+        volumes = self._name(params).split(',')
+        initiator = values.get('initiator')
+        self.mappings = [mapping for mapping in self.mappings
+                         if not (mapping['volume'] in volumes
+                                 and (initiator is None or mapping['initiator'] in initiator.split(',')))]
+
+    def cmd_delete_pools(self, params):
+        names = self._name(params, ignore=('prompt',)).split(',')
+        for name in names:
+            self._find(self.pools, 'name', name)
+        disk_groups = [dg['name'] for dg in self.disk_groups if dg['pool'] in names]
+        volumes = [volume['volume-name'] for volume in self.volumes
+                   if volume['storage-pool-name'] in names or volume['virtual-disk-name'] in disk_groups]
+
+        self.pools = [pool for pool in self.pools if pool['name'] not in names]
+        self.disk_groups = [dg for dg in self.disk_groups if dg['name'] not in disk_groups]
+        self.volumes = [volume for volume in self.volumes if volume['volume-name'] not in volumes]
+        self.mappings = [mapping for mapping in self.mappings if mapping['volume'] not in volumes]
+        for disk in self.disks:
+            if disk['disk-group'] in disk_groups:
+                disk['disk-group'] = ''
+                disk['usage'] = 'AVAIL'
+
+    def cmd_delete_host_groups(self, params):
+        delete_hosts = 'delete-hosts' in self._flags(params)
+        names = self._name(params, ignore=('delete-hosts',)).split(',')
+        for name in names:
+            self._find(self.host_groups, 'name', name)
+        self.host_groups = [hg for hg in self.host_groups if hg['name'] not in names]
+        if delete_hosts:
+            self.hosts = [host for host in self.hosts if host['host-group'] not in names]
+        else:
+            for host in self.hosts:
+                if host['host-group'] in names:
+                    host['host-group'] = '-'
+
+    def cmd_delete_initiator_nickname(self, params):
+        initiator = self._name(params)
+        for record in self.initiators:
+            if initiator in (record['id'], record['nickname']):
+                record['nickname'] = ''
+
+class _RequestHandler(BaseHTTPRequestHandler):
+
+    simulator = None
+
+    def do_GET(self):
+        simulator = self.simulator
+        profile = simulator.profile
+
+        with simulator.slots:
+            delay = profile.latency + random.uniform(0, profile.jitter)
+            if delay > 0:
+                time.sleep(delay)
+            if profile.error_rate and random.random() < profile.error_rate:
+                simulator.count('503')
+                return self._send(503, b'Service Unavailable\n', 'text/plain')
+            if simulator.array.restarting():
+                simulator.count('503')
+                return self._send(503, b'Service Unavailable\n', 'text/plain')
+
+            endpoint, params = parse_path(urllib.parse.urlsplit(self.path).path)
+            if endpoint.startswith('login/'):
+                simulator.count('login')
+                body = simulator.array.login(endpoint.split('/', 1)[1], profile.session_timeout)
+            elif endpoint == 'exit':
+                simulator.count('exit')
+                try:
+                    simulator.array.logout(self.headers.get('sessionKey'))
+                    body = {'status': synthetic.status()}
+                except SessionError as e:
+                    body = {'status': error_status(str(e))}
+            else:
+                simulator.count(endpoint)
+                try:
+                    simulator.array.check_session(self.headers.get('sessionKey'))
+                    body = simulator.array.handle(endpoint, params)
+                except SessionError as e:
+                    body = {'status': error_status(str(e))}
+
+        self._send(200, simulator.encode(body), 'application/json')
+
+    def _send(self, status, body, content_type):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+class _ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+def _self_signed_certificate(directory, hostname='localhost'):
+    """ Write a self-signed certificate and key to directory, as the
+    controller uses by default. Returns (certificate path, key path)
+    """
+
+    if x509 is None:
+        raise ImportError("The simulator requires the 'cryptography' package. "
+                          "Install it with: pip install me4storage[testing]")
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048, backend=default_backend())
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, hostname)])
+    now = datetime.datetime.utcnow()
+    certificate = (x509.CertificateBuilder()
+                   .subject_name(name)
+                   .issuer_name(name)
+                   .public_key(key.public_key())
+                   .serial_number(x509.random_serial_number())
+                   .not_valid_before(now - datetime.timedelta(days=1))
+                   .not_valid_after(now + datetime.timedelta(days=365))
+                   .sign(key, hashes.SHA256(), default_backend()))
+
+    cert_path = os.path.join(directory, 'simulator.crt')
+    key_path = os.path.join(directory, 'simulator.key')
+    with open(cert_path, 'wb') as cert_file:
+        cert_file.write(certificate.public_bytes(serialization.Encoding.PEM))
+    with open(key_path, 'wb') as key_file:
+        key_file.write(key.private_bytes(serialization.Encoding.PEM,
+                                         serialization.PrivateFormat.TraditionalOpenSSL,
+                                         serialization.NoEncryption()))
+    return cert_path, key_path
+
+class Simulator:
+    ''' HTTPS server simulating the management controller of an array
+
+        Runs in a background thread, and can be used as a context manager.
+        A port of 0 picks a free port, available as 'port' once started.
+
+        Attributes:
+            array (SimulatedArray): state of the simulated array
+            profile (Profile): performance profile of the controller
+            requests (dict): number of requests received per endpoint
+    '''
+
+    def __init__(self, array=None, profile=None, host='127.0.0.1', port=0):
+        self.array = array if array is not None else SimulatedArray()
+        self.profile = profile if profile is not None else Profile()
+        self.host = host
+        self.port = port
+        self.requests = {}
+        self.slots = threading.BoundedSemaphore(max(1, self.profile.concurrency))
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        self._cert_dir = None
+
+    def count(self, endpoint):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+
+    @staticmethod
+    def encode(body):
+        return json.dumps(body).encode('utf-8')
+
+    def start(self):
+        self._cert_dir = tempfile.mkdtemp(prefix='me4-simulator-')
+        cert_path, key_path = _self_signed_certificate(self._cert_dir, self.host)
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, key_path)
+
+        handler = type('RequestHandler', (_RequestHandler,), {'simulator': self})
+        self._server = _ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.socket = context.wrap_socket(self._server.socket, server_side=True)
+        self.port = self._server.server_address[1]
+
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='me4-simulator', daemon=True)
+        self._thread.start()
+        logger.info(f"Simulating array on https://{self.host}:{self.port}/api/")
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if self._cert_dir is not None:
+            shutil.rmtree(self._cert_dir, ignore_errors=True)
+            self._cert_dir = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate the ME4 HTTPS API of an array')
+    parser.add_argument('--listen-address', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9446)
+    parser.add_argument('--enclosures', type=int, default=1,
+                        help='Number of 84-drive enclosures (default: %(default)s)')
+    parser.add_argument('--unprovisioned', action='store_true',
+                        help='Start with no disk groups, pools or volumes')
+    parser.add_argument('--username', default='manage')
+    parser.add_argument('--password', default='!manage')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='Seconds taken to answer each request (default: %(default)s)')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help='Maximum additional random seconds per request (default: %(default)s)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fraction of requests answered with HTTP 503 (default: %(default)s)')
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='Number of requests processed at once (default: %(default)s)')
+    parser.add_argument('--session-timeout', type=int, default=1800,
+                        help='Seconds session keys are valid for (default: %(default)s)')
+    parser.add_argument('--restart-time', type=float, default=30.0,
+                        help='Seconds a management controller restart takes (default: %(default)s)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(message)s')
+
+    array = SimulatedArray(enclosures=args.enclosures,
+                           provisioned=not args.unprovisioned,
+                           users={args.username: args.password},
+                           restart_time=args.restart_time)
+    profile = Profile(latency=args.latency,
+                      jitter=args.jitter,
+                      error_rate=args.error_rate,
+                      concurrency=args.concurrency,
+                      session_timeout=args.session_timeout)
+    simulator = Simulator(array, profile, host=args.listen_address, port=args.port)
+    simulator.start()
+    try:
+        simulator._thread.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+        logger.info(f"Requests served: {simulator.requests}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+""" Synthetic ME4 API responses, for testing and benchmarking without an array
+
+Responses are generated from the '_attrs' of each model, so every attribute
+a model can be asked for is present, with values shaped like those of a real
+array: an ME4084 enclosure of 84 drives, optionally with further expansion
+enclosures, linear RAID6 disk groups of 10 drives and one volume per disk
+group.
+"""
+
+import logging
+import urllib.parse
+from functools import partial
+
+from me4storage.api.session import Session
+from me4storage.api.transport import ReplayAdapter
+from me4storage.models.system import System
+from me4storage.models.redundancy import Redundancy
+from me4storage.models.service_tag_info import ServiceTagInfo
+from me4storage.models.disk import Disk
+from me4storage.models.disk_group import DiskGroup
+from me4storage.models.pool import Pool
+from me4storage.models.tier import Tier
+from me4storage.models.volume import Volume
+from me4storage.models.version import Version
+
+logger = logging.getLogger(__name__)
+
+DRIVES_PER_ENCLOSURE = 84
+DRIVES_PER_DISK_GROUP = 10
+BLOCKSIZE = 512
+
+SESSION_KEY = 'synthetic-session-key'
+
+def status(response='Command completed successfully.'):
+    return [{
+        'object-name': 'status',
+        'meta': '/meta/status',
+        'response-type': 'Success',
+        'response-type-numeric': 0,
+        'response': response,
+        'return-code': 0,
+        'component-id': '',
+        'time-stamp': '2021-01-01 12:00:00',
+        'time-stamp-numeric': 1609502400,
+        }]
+
+def model_dict(model_class, **values):
+    """ Build a response dict for a model, containing every key in its
+    _attrs. Keyword arguments override the default values, with
+    underscores in argument names standing for dashes in API keys.
+    """
+
+    _dict = {}
+    for key in model_class._attrs:
+        if key.endswith('-numeric'):
+            _dict[key] = 0
+        elif key in ('health', 'status'):
+            _dict[key] = 'OK'
+        else:
+            _dict[key] = 'N/A'
+    for key, value in values.items():
+        _dict[key.replace('_', '-')] = value
+    return _dict
+
+def system(name='me4-synthetic'):
+    _dict = model_dict(System,
+                       system_name=name,
+                       system_contact='storage@example.com',
+                       system_location='Data Centre',
+                       system_information='Synthetic array',
+                       product_id='ME4084',
+                       vendor_name='DELL EMC',
+                       midplane_serial_number='00C0FF000000')
+    _dict['other-MC-status'] = 'Operational'
+    _dict['redundancy'] = [model_dict(Redundancy,
+                                      redundancy_mode='Active-Active ULP',
+                                      redundancy_status='Redundant',
+                                      controller_a_status='Operational',
+                                      controller_b_status='Operational')]
+    _dict['redundancy'][0]['other-MC-status'] = 'Operational'
+    _dict['unhealthy-component'] = []
+    return _dict
+
+def service_tags(enclosures=1):
+    return [model_dict(ServiceTagInfo, service_tag=f'SVC{index:04d}', enclosure_id=index)
+            for index in range(enclosures)]
+
+def disk(enclosure, slot, disk_group=''):
+    size_blocks = 23437770752
+    return model_dict(Disk,
+                      durable_id=f'disk_{enclosure:02d}.{slot:02d}',
+                      location=f'{enclosure}.{slot}',
+                      enclosure_id=enclosure,
+                      slot=slot,
+                      blocksize=BLOCKSIZE,
+                      serial_number=f'ZA{enclosure:02d}{slot:04d}',
+                      vendor='SEAGATE',
+                      model='ST12000NM0027',
+                      revision='E004',
+                      interface='SAS',
+                      architecture='HDD',
+                      rpm=7,
+                      size='12.0TB',
+                      size_numeric=size_blocks,
+                      status='Up',
+                      extended_status=0,
+                      health='OK',
+                      ssd_life_left='N/A',
+                      ssd_life_left_numeric=255,
+                      temperature='30 C',
+                      temperature_numeric=30,
+                      power_on_hours=10000 + slot,
+                      disk_group=disk_group,
+                      usage='LINEAR POOL' if disk_group else 'AVAIL')
+
+def disk_group_name(index):
+    return f'dg{index + 1:02d}'
+
+def disk_groups_count(enclosures=1):
+    return (enclosures * DRIVES_PER_ENCLOSURE) // DRIVES_PER_DISK_GROUP
+
+def disks(enclosures=1):
+    _disks = []
+    for enclosure in range(enclosures):
+        for slot in range(DRIVES_PER_ENCLOSURE):
+            index = enclosure * DRIVES_PER_ENCLOSURE + slot
+            group = index // DRIVES_PER_DISK_GROUP
+            name = disk_group_name(group) if group < disk_groups_count(enclosures) else ''
+            _disks.append(disk(enclosure, slot, name))
+    return _disks
+
+def disk_group(index):
+    size_blocks = 23437770752 * (DRIVES_PER_DISK_GROUP - 2)
+    _dict = model_dict(DiskGroup,
+                       name=disk_group_name(index),
+                       pool=disk_group_name(index),
+                       blocksize=BLOCKSIZE,
+                       size='96.0TB',
+                       size_numeric=size_blocks,
+                       freespace='0B',
+                       freespace_numeric=0,
+                       raidtype='RAID6',
+                       diskcount=DRIVES_PER_DISK_GROUP,
+                       owner='A' if index % 2 == 0 else 'B',
+                       health='OK')
+    _dict['unhealthy-component'] = []
+    return _dict
+
+def tier(pool):
+    return model_dict(Tier, pool=pool, tier='Archive', diskcount=DRIVES_PER_DISK_GROUP)
+
+def pool(index):
+    name = disk_group_name(index)
+    size_blocks = 23437770752 * (DRIVES_PER_DISK_GROUP - 2)
+    _dict = model_dict(Pool,
+                       name=name,
+                       serial_number=f'00c0ff{index:06d}',
+                       storage_type='Linear',
+                       blocksize=BLOCKSIZE,
+                       total_size='96.0TB',
+                       total_size_numeric=size_blocks,
+                       total_avail='0B',
+                       total_avail_numeric=0,
+                       volumes=1)
+    _dict['disk-groups'] = [disk_group(index)]
+    _dict['tiers'] = [tier(name)]
+    _dict['unhealthy-component'] = []
+    return _dict
+
+def volume(index):
+    size_blocks = 23437770752 * (DRIVES_PER_DISK_GROUP - 2)
+    return model_dict(Volume,
+                      durable_id=f'V{index}',
+                      volume_name=f'v{index + 1:02d}',
+                      virtual_disk_name=disk_group_name(index),
+                      storage_pool_name=disk_group_name(index),
+                      blocksize=BLOCKSIZE,
+                      size='96.0TB',
+                      size_numeric=size_blocks,
+                      allocated_size='96.0TB',
+                      allocated_size_numeric=size_blocks,
+                      serial_number=f'00c0ff{index:06d}0000000000000000',
+                      health='OK')
+
+def versions():
+    return [model_dict(Version, object_name=f'controller-{controller}-versions',
+                       bundle_version='GT280R008-01')
+            for controller in ('a', 'b')]
+
+class SyntheticArray:
+    ''' Stand-in for an array, serving synthetic responses
+
+        This has the same interface as me4storage.api.transport.FixtureStore,
+        so can be served to a Session with a ReplayAdapter, eg:
+
+            array = SyntheticArray(enclosures=4)
+            session = array.session()
+
+        Requests are matched on their endpoint alone, so any parameters
+        (eg: 'detail') are ignored.
+
+        Attributes:
+            enclosures (int): Number of 84-drive enclosures
+    '''
+
+    def __init__(self, enclosures=1, name='me4-synthetic'):
+        self.enclosures = enclosures
+        groups = disk_groups_count(enclosures)
+        self.responses = {
+            'show/system': {'system': [system(name)]},
+            'show/service-tag-info': {'service-tag-info': service_tags(enclosures)},
+            'show/disks': {'drives': disks(enclosures)},
+            'show/disk-groups': {'disk-groups': [disk_group(index) for index in range(groups)]},
+            'show/pools': {'pools': [pool(index) for index in range(groups)]},
+            'show/volumes': {'volumes': [volume(index) for index in range(groups)]},
+            'show/versions': {'versions': versions()},
+            }
+
+    def __str__(self):
+        return f"synthetic array of {self.enclosures} enclosure(s)"
+
+    def response(self, endpoint):
+        """ Return a new response body for endpoint, eg: 'show/disks' """
+
+        if endpoint.startswith('login/'):
+            return {'status': status(SESSION_KEY)}
+        for known_endpoint, body in self.responses.items():
+            if endpoint == known_endpoint or endpoint.startswith(known_endpoint + '/'):
+                return dict(body, status=status())
+        return None
+
+    def get(self, url):
+        path = urllib.parse.unquote(urllib.parse.urlsplit(url).path)
+        body = self.response(path.split('/api/', 1)[-1])
+        if body is None:
+            return None
+        return {'status_code': 200, 'json': body}
+
+    def session(self, latency=0, **kwargs):
+        """ Create a Session against this array """
+
+        return Session(host='me4-synthetic',
+                       port=443,
+                       username='manage',
+                       password='!manage',
+                       verify=False,
+                       transport=partial(ReplayAdapter, self, latency=latency),
+                       **kwargs)
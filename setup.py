@@ -57,7 +57,7 @@ setup(
     author_email=EMAIL,
     url=URL,
     license='MIT',
-    packages=find_packages(exclude=('tests', 'docs')),
+    packages=find_packages(exclude=('tests', 'docs', 'benchmarks')),
     # If your package is a single module, use this instead of 'packages':
     # py_modules=['mypackage'],
     entry_points={
@@ -68,6 +68,9 @@ setup(
     install_requires=REQUIRED,
     extras_require={
         'levenshtein': ['python-Levenshtein'],
+        'async': ['aiohttp'],
+        'yaml': ['pyyaml'],
+        'testing': ['cryptography'],
     },
     include_package_data=True,
 )
@@ -0,0 +1,62 @@
+import argparse
+import json
+
+import urllib3
+
+from me4storage.api import create, show
+from me4storage.api.plan import Plan
+from me4storage.api.session import Session
+from me4storage.commands import apply
+from me4storage.testing.simulator import Simulator, SimulatedArray
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+SPEC = {
+    'system': {'name': 'me4-test'},
+    'disk_groups': [{'name': 'dg1', 'disks': '0.0-9', 'chunk_size': 128}],
+    'volumes': [{'name': 'v1', 'disk_group': 'dg1', 'size': '10TB'}],
+    'hosts': [{'name': 'oss1', 'initiators': ['0x500605b00db8c000']}],
+    'host_groups': [{'name': 'hg1', 'hosts': ['oss1']}],
+    'mappings': [{'host_group': 'hg1', 'volume': 'v1', 'lun': 2}],
+    }
+
+def test_apply_is_idempotent(tmp_path):
+    spec_path = tmp_path / 'spec.json'
+    spec_path.write_text(json.dumps(SPEC))
+    args = argparse.Namespace(spec=str(spec_path), prune=False)
+
+    with Simulator(SimulatedArray(provisioned=False)) as simulator:
+        session = Session('127.0.0.1', simulator.port, 'manage', '!manage', verify=False)
+        spec = apply.load_spec(str(spec_path))
+
+        changes = apply.plan(spec, apply.fetch_state(session, spec))
+        assert [change.stage for change in changes] == [
+            'settings', 'disk-groups', 'volumes', 'initiators', 'hosts', 'host-groups', 'mappings']
+
+        assert apply.apply(args, session) == 0
+        assert apply.plan(spec, apply.fetch_state(session, spec)) == []
+        assert simulator.requests['map/volume'] == 1
+
+def test_prune_keeps_ungrouped_hosts(tmp_path):
+    spec_path = tmp_path / 'spec.json'
+    spec_path.write_text(json.dumps({'host_groups': [{'name': 'hg1', 'hosts': ['oss1']}]}))
+    args = argparse.Namespace(spec=str(spec_path), prune=True)
+
+    with Simulator(SimulatedArray(provisioned=False)) as simulator:
+        session = Session('127.0.0.1', simulator.port, 'manage', '!manage', verify=False)
+        create.host(session, 'oss1', initiators=['500605b00db8c000'])
+        create.host(session, 'oss2', initiators=['500605b00db8c001'])
+        create.host(session, 'oss9', initiators=['500605b00db8c009'])
+        create.host_group(session, 'hg1', hosts=['oss1'])
+        create.host_group(session, 'hg-old', hosts=['oss2'])
+        assert '-ungrouped-' in [host_group.name for host_group in show.host_groups(session)]
+
+        planning = session.clone(plan=Plan())
+        assert apply.apply(args, planning) == 1
+        assert [target for method, target, _ in planning.plan.steps if method == 'GET'] == [
+            f'https://127.0.0.1:{simulator.port}/api/delete/host-groups/delete-hosts/hg-old']
+
+        assert apply.apply(args, session) == 0
+        hosts = {host.name: host_group.name for host_group in show.host_groups(session)
+                 for host in host_group.hosts}
+        assert hosts == {'oss1': 'hg1', 'oss9': '-ungrouped-'}
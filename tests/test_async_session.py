@@ -0,0 +1,47 @@
+import asyncio
+
+import pytest
+
+from me4storage.api.session import open_sessions
+from me4storage.api.token_cache import TokenCache
+from me4storage.testing.simulator import Simulator, SimulatedArray
+
+aiohttp = pytest.importorskip('aiohttp')
+
+from me4storage.api.async_session import AsyncSession
+from me4storage.api import async_show
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+def test_async_session(tmp_path):
+    array = SimulatedArray()
+    with Simulator(array) as simulator:
+        open_before = open_sessions()
+
+        async def poll(**kwargs):
+            async with AsyncSession('127.0.0.1', simulator.port, 'manage', '!manage',
+                                    verify=False, **kwargs) as session:
+                assert len(array.sessions) == 1
+                assert open_sessions() == open_before + 1
+                systems, disks = await asyncio.gather(async_show.system(session),
+                                                      async_show.disks(session))
+                return systems, disks
+
+        systems, disks = run(poll())
+        assert systems[0].system_name
+        assert len(disks) > 0
+        # Closing logs out of the management controller
+        assert simulator.requests['exit'] == 1
+        assert array.sessions == {}
+        assert open_sessions() == open_before
+
+        # Cached session keys are left open for the next invocation
+        token_cache = TokenCache(cache_dir=str(tmp_path))
+        run(poll(token_cache=token_cache))
+        assert simulator.requests['exit'] == 1
+        assert len(array.sessions) == 1
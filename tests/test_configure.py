@@ -0,0 +1,35 @@
+import argparse
+
+import urllib3
+
+from me4storage.api.plan import Plan
+from me4storage.api.session import Session
+from me4storage.common.nsca import CheckResult
+from me4storage.testing.simulator import Simulator, SimulatedArray
+import me4storage.commands.configure as configure
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+def _plan_session(simulator):
+    return Session('127.0.0.1', simulator.port, 'manage', '!manage', verify=False,
+                   plan=Plan())
+
+def test_plan_mapping():
+    with Simulator(SimulatedArray()) as simulator:
+        with _plan_session(simulator) as session:
+            rc = configure.mapping(argparse.Namespace(all_initiators=True), session)
+            assert rc == CheckResult.OK.value
+            targets = [target.split('/api/', 1)[-1] for _, target, _ in session.plan.steps]
+        assert targets and all(target.startswith('map/volume') for target in targets)
+        assert not any(endpoint.startswith('map/') for endpoint in simulator.requests)
+
+def test_plan_disk_layout():
+    with Simulator(SimulatedArray(provisioned=False)) as simulator:
+        with _plan_session(simulator) as session:
+            rc = configure.disk_layout_me4084_linear_raid6(argparse.Namespace(), session)
+            assert rc == CheckResult.OK.value
+            endpoints = [target.split('/api/', 1)[-1].split('/')[:2]
+                         for _, target, _ in session.plan.steps]
+        # The volumes are planned on the disk groups which would be created
+        assert endpoints.count(['add', 'disk-group']) == 8
+        assert endpoints.count(['create', 'volume']) == 8
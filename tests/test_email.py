@@ -0,0 +1,91 @@
+import email
+import socketserver
+import threading
+
+import pytest
+
+from me4storage.common import util
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """ Minimal SMTP server, recording the commands and message received """
+
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self.reply('220 fake ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii').strip()
+            self.server.commands.append(command.split(' ', 1)[0].upper())
+            if command.upper().startswith('EHLO'):
+                self.reply('250 fake')
+            elif command.upper() == 'DATA':
+                self.reply('354 go ahead')
+                lines = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line:
+                        return
+                    if line == b'.\r\n':
+                        break
+                    lines.append(line)
+                self.server.messages.append(b''.join(lines))
+                self.reply('250 queued')
+            elif command.upper() == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 ok')
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), FakeSMTPHandler)
+        self.commands = []
+        self.messages = []
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    server = FakeSMTPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(util, 'SMTP_HOST', '127.0.0.1')
+    monkeypatch.setattr(util, 'SMTP_PORT', server.server_address[1])
+    monkeypatch.setattr(util, 'SMTP_TIMEOUT', 5)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_send_email(tmp_path, smtp_server, monkeypatch):
+    # Several chunks, the last of them partial
+    monkeypatch.setattr(util, 'ATTACHMENT_CHUNK_SIZE', 57 * 4)
+    attachment = tmp_path / 'logs.zip'
+    data = bytes(range(256)) * 10
+    attachment.write_bytes(data)
+    body = 'Logs attached\n.\n..dotted\nend'
+
+    util.send_email('me4@example.com', 'support@example.com', 'Logs', body,
+                    bcc_addrs=['team@example.com'], attachments=[str(attachment)])
+
+    assert smtp_server.commands == ['EHLO', 'MAIL', 'RCPT', 'RCPT', 'DATA', 'QUIT']
+    # Undo the dot-stuffing of lines starting with '.'
+    received = b''.join(line[1:] if line.startswith(b'.') else line
+                        for line in smtp_server.messages[0].splitlines(True))
+    message = email.message_from_bytes(received)
+    text, logs = message.get_payload()
+    assert text.get_payload().replace('\r\n', '\n') == body
+    assert logs.get_filename() == 'logs.zip'
+    assert logs.get_payload(decode=True) == data
+
+def test_send_email_error(tmp_path, smtp_server):
+    with pytest.raises(FileNotFoundError):
+        util.send_email('me4@example.com', 'support@example.com', 'Logs', 'body',
+                        attachments=[str(tmp_path / 'missing.zip')])
+    # We disconnect part way through the message, rather than sending QUIT
+    # which the server would take as part of it
+    assert 'QUIT' not in smtp_server.commands
+    assert smtp_server.messages == []
@@ -0,0 +1,21 @@
+import urllib3
+
+from me4storage.api.session import Session
+from me4storage.commands.exporter import Exporter
+from me4storage.testing.simulator import Simulator, SimulatedArray
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+def test_pollers():
+    with Simulator(SimulatedArray()) as simulator:
+        with Session('127.0.0.1', simulator.port, 'manage', '!manage', verify=False) as session:
+            exporter = Exporter(session, intervals={})
+            pollers = [name for name in dir(exporter) if name.startswith('poll_')]
+            assert 'poll_volumes' in pollers
+            for name in pollers:
+                samples = getattr(exporter, name)()
+                assert samples, name
+
+            metrics = {metric for metric, labels, value in exporter.poll_volumes()}
+            assert metrics == {'me4_volume_health', 'me4_volume_size_bytes',
+                               'me4_volume_allocated_size_bytes'}
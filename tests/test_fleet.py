@@ -0,0 +1,89 @@
+import argparse
+import logging
+
+import urllib3
+
+from me4storage import fleet
+from me4storage.api import show
+from me4storage.api.gather import gather
+from me4storage.common.nsca import CheckResult
+from me4storage.testing.simulator import Simulator, SimulatedArray
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+def test_run_same_primary(capsys):
+    array = SimulatedArray()
+    with Simulator(array) as simulator:
+        def command(args, session):
+            # An unexpected return code for one of the pairs
+            return 7 if args.secondary_host else CheckResult.WARNING
+
+        args = argparse.Namespace(api_port=simulator.port,
+                                  api_username='manage',
+                                  api_password='!manage',
+                                  api_disable_tls_verification=True,
+                                  debug=False,
+                                  func=command)
+        arrays = [('127.0.0.1', '127.0.0.2'), ('127.0.0.1', None)]
+        assert fleet.run(args, arrays) == CheckResult.UNKNOWN.value
+
+    output = capsys.readouterr().out
+    assert '==> 127.0.0.1 (127.0.0.2) <==' in output
+    # Each pair of controllers has its own result in the summary
+    summary = output.split('Result', 1)[1]
+    assert summary.index('127.0.0.1 (127.0.0.2)') < summary.index('UNKNOWN')
+    assert summary.index('UNKNOWN') < summary.index('WARNING')
+
+def test_run_stats(capsys):
+    array = SimulatedArray()
+    with Simulator(array) as simulator:
+        def command(args, session):
+            show.system(session)
+
+        args = argparse.Namespace(api_port=simulator.port,
+                                  api_username='manage',
+                                  api_password='!manage',
+                                  api_disable_tls_verification=True,
+                                  debug=False,
+                                  stats=True,
+                                  func=command)
+        arrays = [('127.0.0.1', None), ('localhost', None)]
+        assert fleet.run(args, arrays) == CheckResult.OK.value
+
+    captured = capsys.readouterr()
+    assert 'API calls' not in captured.err
+    # Each array's stats are printed in its own block of output
+    blocks = captured.out.split('==> ')[1:]
+    assert sorted(block.split(' ', 1)[0] for block in blocks) == ['127.0.0.1', 'localhost']
+    for block in blocks:
+        host = block.split(' ', 1)[0]
+        assert f'API calls to {host}:' in block
+        assert 'show/system' in block
+
+def test_run_gather_context(capsys, caplog):
+    array = SimulatedArray()
+    with Simulator(array) as simulator:
+        def system_name(session):
+            system = show.system(session)[0]
+            print(f"System: {system.system_name}")
+            logging.getLogger(__name__).warning("Gathered")
+
+        def command(args, session):
+            gather(session, system_name, system_name)
+
+        args = argparse.Namespace(api_port=simulator.port,
+                                  api_username='manage',
+                                  api_password='!manage',
+                                  api_disable_tls_verification=True,
+                                  debug=False,
+                                  func=command)
+        arrays = [('127.0.0.1', None), ('localhost', None)]
+        with caplog.at_level(logging.WARNING):
+            assert fleet.run(args, arrays) == CheckResult.OK.value
+
+    # Output of the gathered calls is printed in each array's block
+    blocks = capsys.readouterr().out.split('==> ')[1:]
+    for block in blocks:
+        assert block.count('System: ') == 2
+    assert sorted(record.getMessage() for record in caplog.records) == [
+        '127.0.0.1: Gathered', '127.0.0.1: Gathered', 'localhost: Gathered', 'localhost: Gathered']
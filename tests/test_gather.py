@@ -0,0 +1,52 @@
+import threading
+import time
+from functools import partial
+
+import pytest
+
+from me4storage.api.gather import gather, MAX_WORKERS
+
+def test_gather_order():
+    def call(delay, value, session):
+        time.sleep(delay)
+        return (session, value)
+
+    # Results are in the order of the calls, not of completion
+    results = gather('session', *[partial(call, 0.05 * (3 - i), i) for i in range(3)])
+    assert results == [('session', 0), ('session', 1), ('session', 2)]
+    assert gather('session') == []
+
+def test_gather_exceptions():
+    finished = []
+
+    def call(delay, error, session):
+        time.sleep(delay)
+        finished.append(error)
+        if error is not None:
+            raise error
+
+    first, second = KeyError('first'), ValueError('second')
+    with pytest.raises(KeyError):
+        gather(None, partial(call, 0.1, first), partial(call, 0, second), partial(call, 0.2, None))
+    # The first exception in order of the calls is raised, once all calls
+    # have finished
+    assert len(finished) == 3
+
+def test_gather_max_workers():
+    lock = threading.Lock()
+    running = [0]
+    peak = [0]
+
+    def call(session):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+
+    gather(None, *[call] * (MAX_WORKERS * 3))
+    assert peak[0] == MAX_WORKERS
+    peak[0] = 0
+    gather(None, *[call] * 10, max_workers=2)
+    assert peak[0] == 2
@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+from me4storage.common import jsonstream
+
+def chunked(document, size):
+    data = json.dumps(document).encode('utf-8')
+    return [data[i:i+size] for i in range(0, len(data), size)]
+
+@pytest.mark.parametrize('size', [1, 3, 7, 64, 100000])
+def test_iter_array_yields_items_and_collects_members(size):
+    document = {
+        'drives': [{'location': f'0.{i}', 'size-numeric': 1000 * i, 'name': 'café'} for i in range(20)],
+        'status': [{'return-code': 0, 'response': 'Command completed successfully.'}],
+        }
+    members = {}
+    items = list(jsonstream.iter_array(chunked(document, size), 'drives', members))
+
+    assert items == document['drives']
+    assert members == {'status': document['status']}
+
+def test_iter_array_missing_and_empty_key():
+    members = {}
+    assert list(jsonstream.iter_array(chunked({'status': [], 'x': 12}, 2), 'drives', members)) == []
+    assert members == {'status': [], 'x': 12}
+    assert list(jsonstream.iter_array(chunked({'drives': []}, 2), 'drives')) == []
+    assert list(jsonstream.iter_array([b'{}'], 'drives')) == []
+
+def test_iter_array_truncated_document():
+    with pytest.raises(json.JSONDecodeError):
+        list(jsonstream.iter_array([b'{"drives": [{"a": 1}, {"b"'], 'drives'))
@@ -0,0 +1,61 @@
+import time
+
+import urllib3
+
+from me4storage.api.latency import LatencyStore, percentile
+from me4storage.api.session import Session
+from me4storage.api import show
+from me4storage.testing.simulator import Simulator, SimulatedArray, Profile
+from me4storage.testing.synthetic import SyntheticArray
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+def test_latency_store(tmp_path):
+    path = str(tmp_path / 'latency.json')
+    store = LatencyStore(path)
+    assert store.timeout('me4-a', 'show/disks', 120) == 120
+
+    for index in range(100):
+        store.record('me4-a', 'show/disks', 5 + index / 10)
+    assert percentile([3, 1, 2, 4], 50) == 2
+    assert store.percentile('me4-a', 'show/disks', 99) == 14.8
+    assert store.timeout('me4-a', 'show/disks', 120) == 14.8 * 3
+    # Other arrays have their own response times
+    assert store.timeout('me4-b', 'show/disks', 120) == 120
+    store.save()
+
+    # Later invocations add to the saved response times
+    other = LatencyStore(path)
+    other.record('me4-b', 'show/system', 0.1)
+    other.save()
+    reloaded = LatencyStore(path)
+    assert len(reloaded._samples['me4-a show/disks']) == 100
+    assert reloaded._samples['me4-b show/system'] == [0.1]
+
+def test_adaptive_timeouts_only_for_reads(tmp_path):
+    latency = LatencyStore(str(tmp_path / 'latency.json'))
+    for endpoint in ('show/system', 'create/host'):
+        for _ in range(20):
+            latency.record('me4-a', endpoint, 1)
+    session = SyntheticArray().session()
+    session.latency = latency
+    assert session._timeout('me4-a', 'show/system') == 10
+    # Modifying requests may be retried after a timeout, so keep the
+    # fixed timeout
+    assert session._timeout('me4-a', 'create/host') == session.timeout
+
+def test_hedged_request(tmp_path):
+    array = SimulatedArray()
+    with Simulator(array, Profile(latency=1.0), host='127.0.0.1') as slow, \
+         Simulator(array, host='127.0.0.2', port=slow.port) as fast:
+        latency = LatencyStore(str(tmp_path / 'latency.json'))
+        for _ in range(20):
+            latency.record('127.0.0.1', 'show/system', 0.05)
+        session = Session('127.0.0.1', slow.port, 'manage', '!manage', verify=False,
+                          retries=0, secondary_host='127.0.0.2', latency=latency, hedge=True)
+
+        for _ in range(2):
+            start = time.monotonic()
+            assert show.system(session)[0].system_name == 'me4-simulator'
+            assert time.monotonic() - start < 0.8
+        assert fast.requests['show/system'] == 2
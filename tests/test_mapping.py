@@ -0,0 +1,10 @@
+from me4storage.api.create import mapping_batches
+
+def test_mapping_batches_consecutive_luns():
+    assignments = [('v1', 2), ('v2', 3), ('v3', 4)]
+    assert mapping_batches(assignments) == [(['v1', 'v2', 'v3'], 2)]
+
+def test_mapping_batches_gaps_and_limit():
+    assignments = [('v1', 2), ('v2', 3), ('v4', 10), ('v3', '4')]
+    assert mapping_batches(assignments, max_volumes=2) == [
+        (['v1', 'v2'], 2), (['v3'], 4), (['v4'], 10)]
@@ -0,0 +1,42 @@
+import copy
+import pickle
+
+import pytest
+
+from me4storage.common.exceptions import IncompleteResponseError
+from me4storage.models.basemodel import Model
+from me4storage.models.unwritable_cache import UnwritableCache
+
+def test_lazy_attributes():
+    cache = UnwritableCache({'unwritable-a-percentage': 0, 'unwritable-b-percentage': 5})
+    assert 'unwritable_b_percentage' not in cache.__dict__
+    assert cache.unwritable_b_percentage == 5
+    # Resolved once, then cached on the object
+    assert cache.__dict__['unwritable_b_percentage'] == 5
+    assert cache.has_unwritable_data
+
+def test_missing_attribute():
+    cache = UnwritableCache({'unwritable-a-percentage': 0})
+    with pytest.raises(IncompleteResponseError):
+        cache.unwritable_b_percentage
+    assert not hasattr(cache, 'unwritable_b_percentage')
+    assert getattr(cache, 'unwritable_b_percentage', None) is None
+    # Properties using a missing attribute report it, not themselves
+    with pytest.raises(IncompleteResponseError):
+        cache.has_unwritable_data
+    with pytest.raises(AttributeError, match='no attribute'):
+        cache.no_such_attribute
+
+    assert copy.copy(cache).raw == cache.raw
+    assert pickle.loads(pickle.dumps(cache)).unwritable_a_percentage == 0
+
+def test_strict(monkeypatch):
+    response = {'unwritable-a-percentage': 0}
+    with pytest.raises(IncompleteResponseError):
+        UnwritableCache(response).validate()
+
+    monkeypatch.setattr(Model, 'strict', True)
+    with pytest.raises(IncompleteResponseError, match='unwritable-b-percentage'):
+        UnwritableCache(response)
+    response['unwritable-b-percentage'] = 0
+    assert not UnwritableCache(response).has_unwritable_data
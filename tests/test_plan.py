@@ -0,0 +1,23 @@
+import argparse
+
+from me4storage.api.plan import Plan
+from me4storage.api import modify, show
+from me4storage.testing.synthetic import SyntheticArray
+import me4storage.commands.restart
+
+def test_plan_records_changes_without_sending():
+    session = SyntheticArray().session(plan=Plan())
+
+    # Reads are still served by the array
+    assert show.system(session)[0].system_name == 'me4-synthetic'
+
+    # SyntheticArray has no response for these, so would fail if sent
+    modify.system_info(session, name='me4-renamed', contact='storage@example.com')
+    me4storage.commands.restart.management_controllers(
+        argparse.Namespace(controller=None, wait=True, wait_timeout=600), session)
+
+    assert [(method, target.split('/api/', 1)[-1]) for method, target, _ in session.plan.steps] == [
+        ('GET', 'set/system/contact/"storage@example.com"/name/"me4-renamed"'),
+        ('GET', 'restart/mc/both'),
+        ('WAIT', '<= 600s'),
+        ]
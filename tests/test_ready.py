@@ -0,0 +1,63 @@
+import argparse
+import threading
+import time
+
+import urllib3
+import pytest
+
+from me4storage.api.session import Session
+from me4storage.api import show, restart, ready
+from me4storage.api.plan import Plan
+from me4storage.common.exceptions import ApiError
+from me4storage.testing.simulator import Simulator, SimulatedArray
+from me4storage.testing.synthetic import SyntheticArray
+import me4storage.commands.restart
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+def test_wait_for_ready():
+    array = SimulatedArray(restart_time=0.5)
+    with Simulator(array) as simulator:
+        session = Session('127.0.0.1', simulator.port, 'manage', '!manage', verify=False, retries=0)
+        restart.mc(session, controller='both')
+
+        start = time.monotonic()
+        with pytest.raises(ApiError):
+            ready.wait_for_ready(session, deadline=0.5, settle=0, min_interval=0.1)
+
+        session = ready.wait_for_ready(session, deadline=10, settle=0,
+                                       min_interval=0.1, max_interval=0.2)
+        # Ready once the other controller is operational again
+        assert time.monotonic() - start >= 1.0
+        assert show.system(session)[0].other_mc_status == 'Operational'
+        # The sessions used to poll have been logged out of
+        assert len(array.sessions) == 1
+
+def test_wait_for_firmware():
+    array = SimulatedArray(restart_time=0.3)
+    with Simulator(array) as simulator:
+        session = Session('127.0.0.1', simulator.port, 'manage', '!manage', verify=False, retries=0)
+
+        def update(index):
+            with array.lock:
+                array.versions[index]['bundle-version'] = 'GT280R010-01'
+                array.sessions.clear()
+                array.restarted_at = time.monotonic()
+
+        timers = [threading.Timer(0.2, update, (0,)), threading.Timer(0.8, update, (1,))]
+        for timer in timers:
+            timer.start()
+        session = ready.wait_for_firmware(session, 'GT280R010-01', deadline=10, settle=0,
+                                          min_interval=0.1, max_interval=0.2)
+        assert [version.bundle_version for version in show.versions(session)] == ['GT280R010-01'] * 2
+
+def test_wait_when_planning():
+    session = SyntheticArray().session(plan=Plan())
+    args = argparse.Namespace(controller=None, wait=True, wait_timeout=10)
+    me4storage.commands.restart.management_controllers(args, session)
+    ready.wait_for_firmware(session, 'GT280R010-01').close()
+
+    # The planning session is still open for the rest of the command
+    assert not session.closed
+    assert show.system(session)
+    assert [method for method, _, _ in session.plan.steps] == ['GET', 'WAIT', 'WAIT']
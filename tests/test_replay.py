@@ -0,0 +1,57 @@
+import os
+import argparse
+from functools import partial
+
+import pytest
+
+from me4storage.api.session import Session
+from me4storage.api.transport import FixtureStore, ReplayAdapter
+from me4storage.api import show
+from me4storage.common.exceptions import NotFoundError
+import me4storage.commands.show
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+@pytest.fixture
+def session():
+    return Session(host='me4-test',
+                   port=443,
+                   username='manage',
+                   password='!manage',
+                   verify=False,
+                   transport=partial(ReplayAdapter, FixtureStore(FIXTURES)))
+
+def test_replay_login(session):
+    assert session.session_token == 'replay-session-key'
+
+def test_replay_show_functions(session):
+    system = next(iter(show.system(session)))
+    assert system.system_name == 'me4-test'
+    assert system.redundancy[0].controller_a_status == 'Operational'
+
+    disks = show.disks(session)
+    assert len(disks) == 6
+    assert [disk.location for disk in show.iter_disks(session)] == [disk.location for disk in disks]
+
+def test_replay_command(session, capsys):
+    rc = me4storage.commands.show.disks(argparse.Namespace(), session)
+    output = capsys.readouterr().out
+
+    assert rc == 0
+    assert 'System: me4-test' in output
+    assert 'ZA000005' in output
+
+def test_replay_missing_fixture(session):
+    with pytest.raises(NotFoundError):
+        show.pools(session)
+
+def test_fixture_store_redacts_credentials(tmp_path):
+    store = FixtureStore(str(tmp_path))
+    url = 'https://me4-test:443/api/create/user/bob/password/"secret"/interfaces/"wbi"'
+    store.set(url, 200, 'Success: Command completed successfully.', 0.1)
+
+    fixture = store.get(url)
+    assert 'secret' not in fixture['url']
+    assert fixture['text'].startswith('Success:')
+    for path in tmp_path.rglob('*.json'):
+        assert 'secret' not in path.read_text()
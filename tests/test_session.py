@@ -0,0 +1,120 @@
+import argparse
+
+import urllib3
+
+from me4storage.api.session import Session, open_sessions
+from me4storage.api.token_cache import TokenCache
+from me4storage.api.cache import ResponseCache
+from me4storage.api.plan import Plan
+from me4storage.common.nsca import CheckResult
+from me4storage.testing.synthetic import SyntheticArray
+import me4storage.commands.modify
+from me4storage.api import show, create, modify
+from me4storage.testing.simulator import Simulator, SimulatedArray
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+def test_dual_controller_session():
+    # The two management controllers of one array
+    array = SimulatedArray()
+    with Simulator(array, host='127.0.0.1') as controller_a, \
+         Simulator(array, host='127.0.0.2', port=controller_a.port) as controller_b:
+        session = Session('127.0.0.1', controller_a.port, 'manage', '!manage', verify=False,
+                          retries=0, secondary_host='127.0.0.2')
+        # We only login to the secondary once it is used
+        assert controller_b.requests == {}
+
+        for _ in range(4):
+            show.system(session)
+        assert controller_a.requests['show/system'] == 2
+        assert controller_b.requests['show/system'] == 2
+
+        # Modifying requests stay on one controller
+        create.host(session, 'oss01', initiators=['500605b00db8c000'])
+        create.host(session, 'oss02', initiators=['500605b00db8c001'])
+        assert controller_a.requests['create/host'] == 2
+        assert 'create/host' not in controller_b.requests
+
+        # Fail over to controller B when A can't be reached
+        controller_a.stop()
+        assert len(list(show.iter_disks(session))) == 84
+        assert show.system(session)[0].system_name == 'me4-simulator'
+        create.host_group(session, 'hg01', hosts=['oss01', 'oss02'])
+        assert controller_b.requests['create/host-group'] == 1
+
+def test_session_close(tmp_path):
+    array = SimulatedArray()
+    with Simulator(array) as simulator:
+        open_before = open_sessions()
+        with Session('127.0.0.1', simulator.port, 'manage', '!manage', verify=False) as session:
+            show.system(session)
+            assert len(array.sessions) == 1
+            assert open_sessions() == open_before + 1
+        # Closing logs out of the management controller
+        assert simulator.requests['exit'] == 1
+        assert array.sessions == {}
+        assert open_sessions() == open_before
+        session.close()
+        assert simulator.requests['exit'] == 1
+
+        # Cached session keys are left open for the next invocation
+        token_cache = TokenCache(cache_dir=str(tmp_path))
+        with Session('127.0.0.1', simulator.port, 'manage', '!manage', verify=False,
+                     token_cache=token_cache):
+            pass
+        assert len(array.sessions) == 1
+        assert simulator.requests['exit'] == 1
+
+        # Once our key is no longer cached, it is logged out of
+        array.sessions.clear()
+        token_cache.invalidate('127.0.0.1', simulator.port, 'manage')
+        with Session('127.0.0.1', simulator.port, 'manage', '!manage', verify=False,
+                     token_cache=token_cache) as session:
+            show.system(session)
+            token_cache.invalidate('127.0.0.1', simulator.port, 'manage')
+        assert simulator.requests['exit'] == 2
+        assert array.sessions == {}
+
+def test_response_cache():
+    array = SimulatedArray()
+    with Simulator(array) as simulator:
+        with Session('127.0.0.1', simulator.port, 'manage', '!manage', verify=False,
+                     cache=ResponseCache()) as session:
+            system = show.system(session)[0]
+            # Objects handed out are copies, so changing them leaves the
+            # cached response as it was
+            system.raw['system-name'] = 'changed'
+            system.system_name = 'changed'
+            assert show.system(session)[0].system_name == 'me4-simulator'
+            assert simulator.requests['show/system'] == 1
+
+            # Changes made through the session clear the cache
+            modify.system_info(session, name='me4-renamed')
+            assert show.system(session)[0].system_name == 'me4-renamed'
+            assert simulator.requests['show/system'] == 2
+
+def test_network_change_moves_both_controllers():
+    # Controllers move from 'localhost' and an old address for B, to
+    # 127.0.0.1 and 127.0.0.2
+    array = SimulatedArray()
+    with Simulator(array, host='127.0.0.1') as controller_a, \
+         Simulator(array, host='127.0.0.2', port=controller_a.port) as controller_b:
+        session = Session('localhost', controller_a.port, 'manage', '!manage', verify=False,
+                          retries=0, secondary_host='127.0.0.3')
+        args = argparse.Namespace(controller_a_ip='127.0.0.1', controller_b_ip='127.0.0.2',
+                                  gateway='127.0.0.254', netmask='255.255.255.0')
+        assert me4storage.commands.modify.network(args, session) == CheckResult.OK.value
+        # Reads after the change are shared with controller B at its new address
+        assert any(endpoint.startswith('show/') for endpoint in controller_b.requests)
+        # Both the session before the change and the one after are logged out of
+        assert controller_a.requests['exit'] == 2
+        assert controller_b.requests['exit'] == 1
+        assert array.sessions == {}
+
+def test_clone_hosts_when_planning():
+    session = SyntheticArray().session(secondary_host='me4-b', plan=Plan())
+    clone = session.clone(host='10.0.0.1', secondary_host='10.0.0.2')
+    # The addresses have not really changed, so we stay on the old ones
+    assert clone.hosts == ['me4-synthetic', 'me4-b']
+    assert [target for method, target, _ in session.plan.steps if method == 'CONNECT'] == [
+        'https://10.0.0.1:443/api/', 'https://10.0.0.2:443/api/']
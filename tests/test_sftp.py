@@ -0,0 +1,155 @@
+import hashlib
+import os
+
+import pytest
+
+from me4storage.api import sftp
+
+class FakeRemoteFile:
+    """ Remote file of a FakeConnection, which can drop the connection
+    part way through being read """
+
+    def __init__(self, data, drop_after=None):
+        self.data = data
+        self.position = 0
+        self.drop_after = drop_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def stat(self):
+        return os.stat_result((0o100644, 0, 0, 1, 0, 0, len(self.data), 0, 0, 0))
+
+    def prefetch(self, size):
+        pass
+
+    def read(self, size):
+        if self.drop_after is not None and self.position >= self.drop_after:
+            raise EOFError("Connection dropped")
+        chunk = self.data[self.position:self.position + size]
+        self.position += len(chunk)
+        return chunk
+
+class FakeConnection:
+    """ Stand-in for a pysftp.Connection to a controller """
+
+    def __init__(self, host, files, drop_after=None, fail_puts=False):
+        self.host = host
+        self.files = files
+        self.drop_after = drop_after
+        self.fail_puts = fail_puts
+        self.uploads = []
+        self.closed = False
+
+    def open(self, remotepath, mode):
+        return FakeRemoteFile(self.files[remotepath], self.drop_after)
+
+    def put(self, path, remotepath, callback, confirm):
+        if self.fail_puts:
+            raise IOError(f"Upload to {self.host} failed")
+        size = os.path.getsize(path)
+        callback(size, size)
+        self.uploads.append((path, remotepath))
+
+    def get(self, remotepath, localpath, callback):
+        data = self.files[remotepath]
+        with open(localpath, 'wb') as local_file:
+            local_file.write(data)
+        callback(len(data), len(data))
+
+    def close(self):
+        self.closed = True
+
+class FakeControllers:
+    """ Opens FakeConnections in place of sftp.connect
+
+        Attributes:
+            connections (list): every connection opened
+            drops (list): offsets at which to drop each following
+                connection part way through a download
+            failing (set): hosts which fail uploads
+    """
+
+    def __init__(self):
+        self.connections = []
+        self.drops = []
+        self.failing = set()
+        self.data = bytes(range(256)) * 4096 * 3
+
+    def connect(self, host, port, username, password):
+        drop_after = self.drops.pop(0) if self.drops else None
+        connection = FakeConnection(host, {'/logs': self.data}, drop_after=drop_after,
+                                    fail_puts=host in self.failing)
+        self.connections.append(connection)
+        return connection
+
+@pytest.fixture
+def controllers(monkeypatch):
+    controllers = FakeControllers()
+    monkeypatch.setattr(sftp, 'connect', controllers.connect)
+    monkeypatch.setattr(sftp, 'DOWNLOAD_CHUNK_SIZE', 64 * 1024)
+    return controllers
+
+def test_download_restarts(tmp_path, controllers):
+    path = str(tmp_path / 'logs.zip')
+    # Drop the first two connections at different points
+    controllers.drops.extend([200 * 1024, 1024 * 1024])
+    with sftp.ConnectionPool(22, 'manage', '!manage') as pool:
+        stats = pool.download('me4-a', '/logs', path)
+
+    # The whole file is downloaded again from a new connection each time
+    assert len(controllers.connections) == 3
+    assert controllers.connections[0].closed and controllers.connections[1].closed
+    with open(path, 'rb') as local_file:
+        assert local_file.read() == controllers.data
+    assert stats.size == len(controllers.data)
+    assert stats.sha256 == hashlib.sha256(controllers.data).hexdigest()
+    assert not os.path.exists(path + '.part')
+
+def test_download_fails(tmp_path, controllers):
+    path = str(tmp_path / 'logs.zip')
+    controllers.drops.extend([1024] * 3)
+    with sftp.ConnectionPool(22, 'manage', '!manage') as pool:
+        with pytest.raises(EOFError):
+            pool.download('me4-a', '/logs', path, retries=2)
+    assert len(controllers.connections) == 3
+    # No partial download is left behind
+    assert os.listdir(str(tmp_path)) == []
+
+def test_pool_reuse(tmp_path, controllers):
+    firmware = tmp_path / 'firmware.bin'
+    firmware.write_bytes(b'\0' * 1024)
+    with sftp.ConnectionPool(22, 'manage', '!manage') as pool:
+        pool.put('me4-a', str(firmware), '/disk')
+        pool.put('me4-a', str(firmware), '/disk')
+        stats = pool.get('me4-a', '/logs', str(tmp_path / 'logs.zip'))
+        pool.put('me4-b', str(firmware), '/disk')
+
+    # One connection per controller, closed with the pool
+    assert [connection.host for connection in controllers.connections] == ['me4-a', 'me4-b']
+    assert len(controllers.connections[0].uploads) == 2
+    assert stats.size == len(controllers.data)
+    assert all(connection.closed for connection in controllers.connections)
+
+def test_put_parallel(tmp_path, controllers):
+    firmware = tmp_path / 'firmware.bin'
+    firmware.write_bytes(b'\0' * 1024)
+    uploads = [('me4-a', str(firmware), '/disk'),
+               ('me4-b', str(firmware), '/disk'),
+               ('me4-a', str(firmware), '/disk')]
+    with sftp.ConnectionPool(22, 'manage', '!manage') as pool:
+        results = pool.put_parallel(uploads)
+    assert [stats.host for stats in results] == ['me4-a', 'me4-b', 'me4-a']
+
+    # An upload failing to one controller is raised once the uploads to
+    # the others have finished
+    controllers.connections = []
+    controllers.failing.add('me4-a')
+    with sftp.ConnectionPool(22, 'manage', '!manage') as pool:
+        with pytest.raises(IOError, match='me4-a'):
+            pool.put_parallel(uploads)
+    uploaded = {connection.host: len(connection.uploads) for connection in controllers.connections}
+    assert uploaded == {'me4-a': 0, 'me4-b': 1}
@@ -0,0 +1,53 @@
+import urllib3
+import pytest
+
+from me4storage.api.session import Session
+from me4storage.api import show, create
+from me4storage.common.exceptions import ApiStatusError
+from me4storage.testing.simulator import Simulator, SimulatedArray, parse_path, expand_disks
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+@pytest.fixture(scope='module')
+def simulator():
+    with Simulator(SimulatedArray(enclosures=1)) as simulator:
+        yield simulator
+
+def session(simulator, password='!manage'):
+    return Session('127.0.0.1', simulator.port, 'manage', password, verify=False, retries=0)
+
+def test_parse_path():
+    assert parse_path('/api/create/volume/v1/vdisk/"dg01"/size/"10GB"') == (
+        'create/volume', [('v1', None), ('vdisk', 'dg01'), ('size', '10GB')])
+    assert parse_path('/api/set/system/info/"a/b"') == ('set/system', [('info', 'a/b')])
+
+def test_expand_disks():
+    assert expand_disks('0.0-2,1.5') == ['0.0', '0.1', '0.2', '1.5']
+    assert expand_disks('0.0-1:0.2-3') == ['0.0', '0.1', '0.2', '0.3']
+
+def test_show(simulator):
+    _session = session(simulator)
+    assert show.system(_session)[0].system_name == 'me4-simulator'
+    assert len(show.disks(_session)) == 84
+    assert len(show.disk_groups(_session)) == 8
+
+def test_create_and_map(simulator):
+    _session = session(simulator)
+    create.host(_session, 'oss01', initiators=['500605b00db8c000'])
+    create.host_group(_session, 'hg01', hosts=['oss01'])
+    create.mapping(_session, volumes=['v01', 'v02'], initiators=['hg01.*.*'], lun='2')
+
+    host_groups = show.host_groups(_session)
+    assert [host.name for host in host_groups[0].hosts] == ['oss01']
+
+    mappings = show.host_group_mappings(_session)
+    assert [(mapping.volume, mapping.lun) for mapping in mappings[0].host_view_mappings] == [
+        ('v01', '2'), ('v02', '3')]
+
+    with pytest.raises(ApiStatusError):
+        create.mapping(_session, volumes=['v03'], initiators=['hg01.*.*'], lun='3')
+
+def test_relogin_on_expired_session(simulator):
+    _session = session(simulator)
+    simulator.array.sessions.clear()
+    assert show.system(_session)[0].system_name == 'me4-simulator'
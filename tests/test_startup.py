@@ -0,0 +1,52 @@
+import argparse
+import os
+import subprocess
+import sys
+
+from me4storage import cli
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+# Modules which only some subcommands need, and which are slow to import
+HEAVY_MODULES = {'pysftp', 'paramiko', 'jira', 'fuzzywuzzy', 'yaml'}
+
+def test_monitoring_command_imports():
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'me4storage.cli',
+                             'show', 'disks', '-H', 'me4-test', '-p', '!manage',
+                             '--api-replay', FIXTURES],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                            universal_newlines=True)
+    assert result.returncode == 0, result.stderr
+
+    # Lines of the form 'import time: <self us> | <cumulative us> | <module>'
+    imported = {line.rsplit('|', 1)[1].strip().split('.')[0]
+                for line in result.stderr.splitlines()
+                if line.startswith('import time:') and '|' in line}
+    assert 'me4storage' in imported
+    assert not imported & HEAVY_MODULES
+
+def test_all_subcommands_resolve():
+    parser = argparse.ArgumentParser()
+    subcommands = parser.add_subparsers()
+    subparsers = []
+    common = cli._common_parsers(subparsers)
+    for name, (help_text, parent_names, build) in cli.SUBCOMMANDS.items():
+        subcommand_p = subcommands.add_parser(name, help=help_text,
+                                              parents=[common[parent] for parent in parent_names])
+        build(subcommand_p, subparsers, **common)
+
+    funcs = [subparser.get_default('func') for subparser in subparsers]
+    funcs = [func for func in funcs if func is not None]
+    assert len(funcs) > 30
+    for func in funcs:
+        assert callable(func.resolve())
+
+def test_exporter_single_array():
+    for options in (['exporter', '-H', 'me4-a', '-H', 'me4-b'],
+                    ['--stats', 'exporter', '-H', 'me4-a']):
+        result = subprocess.run([sys.executable, '-m', 'me4storage.cli'] + options +
+                                ['-p', '!manage', '--api-replay', FIXTURES],
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                universal_newlines=True, timeout=60)
+        assert result.returncode == 2
+        assert 'UsageError' in result.stderr
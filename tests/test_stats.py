@@ -0,0 +1,50 @@
+import argparse
+import io
+
+from me4storage.api import show
+from me4storage.api.stats import CallStats, build_timer, url_template
+from me4storage.api.tracing import Tracer
+from me4storage.models.basemodel import Model
+from me4storage.testing.synthetic import SyntheticArray
+import me4storage.commands.show
+
+def test_url_template():
+    assert url_template('show/disks') == 'show/disks'
+    assert (url_template('create/user', {'JSmith': None, 'password': 'Abc#1379'}) ==
+            'create/user/<arg>/password/<value>')
+
+def test_call_stats(monkeypatch):
+    monkeypatch.setattr(Model, 'build_timer', build_timer)
+    stats = CallStats()
+    session = SyntheticArray(enclosures=2).session(tracer=Tracer(stats=stats))
+    for _ in range(3):
+        show.system(session)
+    assert len(show.disks(session)) == 168
+
+    summary = dict(stats.summary())
+    assert sorted(summary) == ['login', 'show/disks', 'show/system']
+    assert len(summary['show/system']) == 3
+    disks = summary['show/disks'][0]
+    assert disks.status_code == 200
+    assert disks.size > 0
+    assert disks.build > 0
+
+    output = io.StringIO()
+    stats.display('API calls to me4-synthetic', file=output)
+    lines = output.getvalue().splitlines()
+    assert lines[0] == 'API calls to me4-synthetic:'
+    assert lines[1].split()[:3] == ['Endpoint', 'Calls', 'Status']
+    assert lines[-1].startswith('Total ')
+
+def test_show_storage_requests(capsys):
+    # One request per object type, however many disk groups there are,
+    # rather than one for each disk group's volumes and disks
+    for enclosures in (1, 4):
+        stats = CallStats()
+        session = SyntheticArray(enclosures=enclosures).session(tracer=Tracer(stats=stats))
+        args = argparse.Namespace(detailed=True)
+        assert me4storage.commands.show.storage(args, session) == 0
+        summary = {template: len(calls) for template, calls in stats.summary()}
+        assert summary == {'login': 1, 'show/system': 1, 'show/disk-groups/<arg>': 1,
+                           'show/volumes': 1, 'show/disks': 1}
+    assert 'Disk Group:' in capsys.readouterr().out
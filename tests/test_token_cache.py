@@ -0,0 +1,65 @@
+import os
+import stat
+import time
+
+import urllib3
+
+from me4storage.api import show
+from me4storage.api.session import Session
+from me4storage.api.token_cache import TokenCache
+from me4storage.testing.simulator import Simulator, SimulatedArray
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+def test_permissions(tmp_path):
+    cache_dir = str(tmp_path / 'tokens')
+    token_cache = TokenCache(cache_dir=cache_dir)
+    token_cache.set('me4-a', 443, 'manage', 'abc123')
+
+    assert stat.S_IMODE(os.stat(cache_dir).st_mode) == 0o700
+    [name] = os.listdir(cache_dir)
+    path = os.path.join(cache_dir, name)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert token_cache.get('me4-a', 443, 'manage') == 'abc123'
+    assert token_cache.get('me4-a', 443, 'monitor') is None
+
+    # Token files readable by other users are ignored
+    os.chmod(path, 0o640)
+    assert token_cache.get('me4-a', 443, 'manage') is None
+
+def test_expiry(tmp_path, monkeypatch):
+    token_cache = TokenCache(cache_dir=str(tmp_path), ttl=60)
+    token_cache.set('me4-a', 443, 'manage', 'abc123')
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 59)
+    assert token_cache.get('me4-a', 443, 'manage') == 'abc123'
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+    assert token_cache.get('me4-a', 443, 'manage') is None
+
+def test_session_reuse(tmp_path):
+    array = SimulatedArray()
+    token_cache = TokenCache(cache_dir=str(tmp_path))
+    with Simulator(array) as simulator:
+        def session():
+            return Session('127.0.0.1', simulator.port, 'manage', '!manage', verify=False,
+                           token_cache=token_cache)
+
+        with session() as first:
+            show.system(first)
+        token = token_cache.get('127.0.0.1', simulator.port, 'manage')
+        # Closing leaves the cached session open, for the next session to use
+        assert simulator.requests.get('exit', 0) == 0
+        with session() as second:
+            show.system(second)
+        assert simulator.requests['login'] == 1
+
+        # The controller ends the session, so the cached token is rejected,
+        # and replaced by that of a new login
+        array.sessions.clear()
+        with session() as third:
+            show.system(third)
+            new_token = third.session_token
+        assert new_token != token
+        assert simulator.requests['login'] == 2
+        assert token_cache.get('127.0.0.1', simulator.port, 'manage') == new_token
+        assert simulator.requests.get('exit', 0) == 0
@@ -0,0 +1,59 @@
+import os
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+from me4storage.api import show
+from me4storage.api.session import Session
+from me4storage.api.tracing import Tracer, redact_url
+from me4storage.testing.simulator import Simulator, SimulatedArray
+from me4storage.testing.synthetic import SyntheticArray
+
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+class CountingResponse(requests.Response):
+    """ Response counting the times its text is decoded """
+
+    text_reads = 0
+
+    @property
+    def text(self):
+        CountingResponse.text_reads += 1
+        return super().text
+
+class CountingAdapter(HTTPAdapter):
+
+    def build_response(self, request, response):
+        response = super().build_response(request, response)
+        response.__class__ = CountingResponse
+        return response
+
+def test_redact_url():
+    assert (redact_url('https://me4/api/login/0123abcd') ==
+            'https://me4/api/login/<redacted>')
+    assert (redact_url('https://me4/api/create/user/JSmith/password/Abc#1379/roles/manage') ==
+            'https://me4/api/create/user/JSmith/password/"<redacted>"/roles/manage')
+    assert (redact_url('https://me4/api/set/password/"a/b"/new-password/"x"') ==
+            'https://me4/api/set/password/"<redacted>"/new-password/"<redacted>"')
+
+def test_dump_dir(tmp_path):
+    session = SyntheticArray().session(tracer=Tracer(dump_dir=str(tmp_path)))
+    show.system(session)
+    names = sorted(os.listdir(str(tmp_path)))
+    # Login responses contain the session key, so are never dumped
+    assert len(names) == 1
+    assert names[0].startswith('me4-synthetic_443_show_system-')
+    with open(os.path.join(str(tmp_path), names[0])) as dump_file:
+        assert '"system"' in dump_file.read()
+
+def test_text_decoded_once():
+    array = SimulatedArray()
+    with Simulator(array) as simulator:
+        CountingResponse.text_reads = 0
+        with Session('127.0.0.1', simulator.port, 'manage', '!manage', verify=False,
+                     transport=CountingAdapter) as session:
+            show.system(session)
+            show.disks(session)
+        # Each response is only decoded to parse it, not for tracing
+        assert CountingResponse.text_reads == sum(simulator.requests.values())